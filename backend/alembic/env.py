@@ -12,7 +12,7 @@ from alembic import context
 # Importar settings y Base desde app
 from app.core.config import settings
 from app.core.database import Base
-from app.models import user, customer, conversation, message, setting
+from app.models import user, customer, conversation, message, setting, stats
 
 # this is the Alembic Config object, which provides access to the values within the .ini file
 config = context.config
@@ -1,30 +0,0 @@
-"""add last_activity_at to conversations
-
-Revision ID: 26e67a2f0236
-Revises: 06b31e51f9be
-Create Date: 2026-02-25 19:10:45.620746
-
-"""
-from typing import Sequence, Union
-
-from alembic import op
-import sqlalchemy as sa
-
-
-# revision identifiers, used by Alembic.
-revision: str = '26e67a2f0236'
-down_revision: Union[str, None] = '06b31e51f9be'
-branch_labels: Union[str, Sequence[str], None] = None
-depends_on: Union[str, Sequence[str], None] = None
-
-
-def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
-
-
-def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
@@ -0,0 +1,71 @@
+"""add last message and counters to conversations
+
+Revision ID: 3f1a7c2b9e04
+Revises: d185cb705a09
+Create Date: 2026-10-18 10:30:12.184311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a7c2b9e04'
+down_revision: Union[str, None] = 'd185cb705a09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('last_message_preview', sa.String(length=200), nullable=True))
+    op.add_column('conversations', sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('conversations', sa.Column('message_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('conversations', sa.Column('unread_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill a partir de los mensajes existentes
+    op.execute("""
+        UPDATE conversations AS c
+        SET message_count = s.total,
+            last_message_at = s.last_at
+        FROM (
+            SELECT conversation_id, count(*) AS total, max(created_at) AS last_at
+            FROM messages
+            GROUP BY conversation_id
+        ) AS s
+        WHERE s.conversation_id = c.id
+    """)
+    op.execute("""
+        UPDATE conversations AS c
+        SET last_message_preview = left(m.content, 200)
+        FROM (
+            SELECT DISTINCT ON (conversation_id) conversation_id, content
+            FROM messages
+            ORDER BY conversation_id, created_at DESC, id DESC
+        ) AS m
+        WHERE m.conversation_id = c.id
+    """)
+    # No leídos: mensajes del cliente posteriores a la última respuesta de un agente
+    op.execute("""
+        UPDATE conversations AS c
+        SET unread_count = s.total
+        FROM (
+            SELECT m.conversation_id, count(*) AS total
+            FROM messages AS m
+            WHERE m.sender = 'CUSTOMER'
+              AND m.created_at > COALESCE(
+                  (SELECT max(h.created_at) FROM messages AS h
+                   WHERE h.conversation_id = m.conversation_id AND h.sender = 'HUMAN'),
+                  '-infinity'::timestamptz)
+            GROUP BY m.conversation_id
+        ) AS s
+        WHERE s.conversation_id = c.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'unread_count')
+    op.drop_column('conversations', 'message_count')
+    op.drop_column('conversations', 'last_message_at')
+    op.drop_column('conversations', 'last_message_preview')
@@ -0,0 +1,44 @@
+"""add delivery status to messages
+
+Revision ID: 5c8e1f3a7d20
+Revises: 7b2e4d91c6a3
+Create Date: 2026-10-18 12:14:05.417290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c8e1f3a7d20'
+down_revision: Union[str, None] = '7b2e4d91c6a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+delivery_status = sa.Enum('QUEUED', 'SENT', 'DELIVERED', 'FAILED', name='deliverystatus')
+
+
+def upgrade() -> None:
+    delivery_status.create(op.get_bind(), checkfirst=True)
+    op.add_column('messages', sa.Column('delivery_status', delivery_status, nullable=True))
+    op.add_column('messages', sa.Column('delivery_attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('messages', sa.Column('delivery_error', sa.String(length=255), nullable=True))
+    op.add_column('messages', sa.Column('twilio_sid', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_messages_twilio_sid', 'messages', ['twilio_sid'])
+    # Reencolado de entregas pendientes
+    op.create_index(
+        'ix_messages_queued_created_at', 'messages', ['created_at'],
+        postgresql_where=sa.text("delivery_status = 'QUEUED'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_messages_queued_created_at', table_name='messages')
+    op.drop_constraint('uq_messages_twilio_sid', 'messages', type_='unique')
+    op.drop_column('messages', 'twilio_sid')
+    op.drop_column('messages', 'delivery_error')
+    op.drop_column('messages', 'delivery_attempts')
+    op.drop_column('messages', 'delivery_status')
+    delivery_status.drop(op.get_bind(), checkfirst=True)
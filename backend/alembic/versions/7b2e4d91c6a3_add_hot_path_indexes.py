@@ -0,0 +1,56 @@
+"""add hot path indexes
+
+Revision ID: 7b2e4d91c6a3
+Revises: 3f1a7c2b9e04
+Create Date: 2026-10-18 11:02:47.903215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2e4d91c6a3'
+down_revision: Union[str, None] = '3f1a7c2b9e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY no puede ir dentro de una transacción y evita bloquear escrituras
+    with op.get_context().autocommit_block():
+        # Historial de una conversación / último mensaje
+        op.create_index(
+            'ix_messages_conversation_id_created_at', 'messages',
+            ['conversation_id', sa.text('created_at DESC')],
+            postgresql_concurrently=True,
+        )
+        # Conversación activa de un cliente (worker)
+        op.create_index(
+            'ix_conversations_customer_id_status_created_at', 'conversations',
+            ['customer_id', 'status', sa.text('created_at DESC')],
+            postgresql_concurrently=True,
+        )
+        # Barrido de inactividad: solo conversaciones activas
+        op.create_index(
+            'ix_conversations_active_last_activity_at', 'conversations',
+            ['last_activity_at'],
+            postgresql_where=sa.text("status IN ('BOT', 'HUMAN')"),
+            postgresql_concurrently=True,
+        )
+        # Orden de la bandeja de entrada (ver list_conversations)
+        op.create_index(
+            'ix_conversations_inbox_order', 'conversations',
+            [sa.text('coalesce(updated_at, created_at) DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_conversations_inbox_order', table_name='conversations', postgresql_concurrently=True)
+        op.drop_index('ix_conversations_active_last_activity_at', table_name='conversations', postgresql_concurrently=True)
+        op.drop_index('ix_conversations_customer_id_status_created_at', table_name='conversations', postgresql_concurrently=True)
+        op.drop_index('ix_messages_conversation_id_created_at', table_name='messages', postgresql_concurrently=True)
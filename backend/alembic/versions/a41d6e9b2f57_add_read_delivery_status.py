@@ -0,0 +1,29 @@
+"""add read delivery status
+
+Revision ID: a41d6e9b2f57
+Revises: 5c8e1f3a7d20
+Create Date: 2026-10-18 12:48:31.662904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41d6e9b2f57'
+down_revision: Union[str, None] = '5c8e1f3a7d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE no puede ir dentro de una transacción en Postgres < 12
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE deliverystatus ADD VALUE IF NOT EXISTS 'READ' AFTER 'DELIVERED'")
+
+
+def downgrade() -> None:
+    # Postgres no permite quitar valores de un enum; los mensajes leídos pasan a entregados
+    op.execute("UPDATE messages SET delivery_status = 'DELIVERED' WHERE delivery_status = 'READ'")
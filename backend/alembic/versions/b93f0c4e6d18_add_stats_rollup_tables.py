@@ -0,0 +1,39 @@
+"""add stats rollup tables
+
+Revision ID: b93f0c4e6d18
+Revises: e2b7c5d81a94
+Create Date: 2026-10-18 13:55:42.271836
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b93f0c4e6d18'
+down_revision: Union[str, None] = 'e2b7c5d81a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stats_hourly',
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('metric', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket_start', 'metric')
+    )
+    op.create_table('stats_rollup_state',
+    sa.Column('source', sa.String(length=32), nullable=False),
+    sa.Column('last_id', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+    # Empiezan en 0: la primera ejecución de refresh_stats_rollups agrega el histórico por tramos
+    op.execute("INSERT INTO stats_rollup_state (source, last_id) VALUES ('messages', 0), ('conversations', 0)")
+
+
+def downgrade() -> None:
+    op.drop_table('stats_rollup_state')
+    op.drop_table('stats_hourly')
@@ -0,0 +1,28 @@
+"""add message channels rollup source
+
+Revision ID: c7a2e9f40b31
+Revises: b93f0c4e6d18
+Create Date: 2026-10-18 14:37:16.094552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a2e9f40b31'
+down_revision: Union[str, None] = 'b93f0c4e6d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Mensajes por canal: empieza en 0 y refresh_stats_rollups agrega el histórico
+    op.execute("INSERT INTO stats_rollup_state (source, last_id) VALUES ('message_channels', 0)")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM stats_hourly WHERE metric LIKE 'messages_channel_%'")
+    op.execute("DELETE FROM stats_rollup_state WHERE source = 'message_channels'")
@@ -1,7 +1,12 @@
 """add last_activity_at to conversations
 
+Consolida las revisiones 09dcbe4d052c, e5465a7f14ea, c9cfe3e19441,
+06b31e51f9be y 26e67a2f0236 (columna temporal last_activity y varios
+autogenerados vacíos). Se conserva el ID de la última para que las bases
+ya migradas sigan en head.
+
 Revision ID: d185cb705a09
-Revises: 26e67a2f0236
+Revises: 9d15effb5e6b
 Create Date: 2026-02-25 19:11:21.569346
 
 """
@@ -13,18 +18,14 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = 'd185cb705a09'
-down_revision: Union[str, None] = '26e67a2f0236'
+down_revision: Union[str, None] = '9d15effb5e6b'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.add_column('conversations', sa.Column('last_activity_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True))
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_column('conversations', 'last_activity_at')
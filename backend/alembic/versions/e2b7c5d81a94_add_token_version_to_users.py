@@ -0,0 +1,26 @@
+"""add token version to users
+
+Revision ID: e2b7c5d81a94
+Revises: a41d6e9b2f57
+Create Date: 2026-10-18 13:21:09.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b7c5d81a94'
+down_revision: Union[str, None] = 'a41d6e9b2f57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,30 @@
+"""add stats flushes
+
+Revision ID: f6c3a8d2e517
+Revises: d4f8b2a6c913
+Create Date: 2026-10-18 17:20:05.418273
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6c3a8d2e517'
+down_revision: Union[str, None] = 'd4f8b2a6c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('stats_flushes',
+    sa.Column('flush_id', sa.String(length=32), nullable=False),
+    sa.Column('flushed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('flush_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('stats_flushes')
@@ -0,0 +1,41 @@
+"""
+Tareas de administración desde la línea de comandos.
+
+Uso:
+    python -m app.admin deactivate-user <username>
+"""
+import argparse
+import logging
+import sys
+from app.core.database import SessionLocal
+from app.models.user import User
+from app.services.user_service import deactivate_user
+
+logger = logging.getLogger(__name__)
+
+def _deactivate(username: str) -> int:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.username == username).first()
+        if user is None:
+            logger.error(f"🔴 Usuario no encontrado: {username}")
+            return 1
+        deactivate_user(db, user)
+        logger.info(f"✅ Usuario {username} desactivado; sus tokens dejan de aceptarse")
+        return 0
+    finally:
+        db.close()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.admin")
+    commands = parser.add_subparsers(dest="command", required=True)
+    deactivate = commands.add_parser("deactivate-user", help="Desactiva un usuario e invalida sus tokens")
+    deactivate.add_argument("username")
+    args = parser.parse_args(argv)
+    if args.command == "deactivate-user":
+        return _deactivate(args.username)
+    return 2
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -3,9 +3,10 @@ from datetime import timedelta
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.security import verify_password, get_password_hash, create_access_token
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.core.security import verify_password_async, get_password_hash_async, create_access_token
 from app.models.user import User
 from app.schemas.user import UserCreate, UserInDB, Token
 from app.core.config import settings
@@ -13,31 +14,31 @@ from app.core.config import settings
 router = APIRouter()
 
 @router.post("/register", response_model=UserInDB)
-def register(user: UserCreate, db: Annotated[Session, Depends(get_db)]):
+async def register(user: UserCreate, db: Annotated[AsyncSession, Depends(get_async_db)]):
     # Verificar si usuario ya existe
-    db_user = db.query(User).filter(
+    db_user = (await db.execute(select(User).where(
         (User.username == user.username) | (User.email == user.email)
-    ).first()
+    ))).scalars().first()
     if db_user:
         raise HTTPException(status_code=400, detail="Username or email already registered")
     
-    # Crear nuevo usuario
-    hashed_password = get_password_hash(user.password)
+    # Crear nuevo usuario (bcrypt en su propio pool de hilos)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @router.post("/login", response_model=Token)
-def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Annotated[Session, Depends(get_db)]):
+async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Annotated[AsyncSession, Depends(get_async_db)]):
     # Buscar usuario por username
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = (await db.execute(select(User).where(User.username == form_data.username))).scalars().first()
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -46,6 +47,7 @@ def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Annota
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id, "ver": user.token_version},
+        expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,15 +1,23 @@
 from typing import List, Annotated, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
-from app.core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select, tuple_
+from app.core.database import get_db, get_async_db
 from app.api.deps import get_current_active_user
+from app.api.pagination import encode_cursor, decode_cursor
+from app.api.http_cache import json_with_etag
 from app.models.user import User
 from app.models.conversation import Conversation, ConversationStatus
 from app.models.message import Message, SenderType
 from app.models.customer import Customer
-from app.schemas.conversation import ConversationInDB, ConversationListItem, MessageCreate, MessageInDB
-from app.services.twilio_service import send_whatsapp_message
+from app.schemas.conversation import ConversationHeader, ConversationListItem, MessageCreate, MessageInDB
+from app.services.conversation_service import append_message, mark_as_read
+from app.services.context_builder import forget_conversation
+from app.services.conversation_expiry import schedule_expiry, cancel_expiry
+from app.services.notifier import notify_new_message_sync, notify_status_change_sync
+from app.services.outbound import enqueue_delivery
+from app.services.analytics import record_agent_message, record_handoff
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,49 +25,147 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/", response_model=List[ConversationListItem])
-def list_conversations(
-    db: Annotated[Session, Depends(get_db)],
+async def list_conversations(
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
     current_user: Annotated[User, Depends(get_current_active_user)],
     status: Optional[ConversationStatus] = Query(None, description="Filtrar por estado"),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en X-Next-Cursor por la página anterior")
 ):
     """
     Lista conversaciones con información del último mensaje.
+
+    El último mensaje y los contadores vienen de las columnas desnormalizadas de
+    la conversación, así que basta una sola consulta (con el cliente). La
+    paginación es por cursor sobre (updated_at, id): el cursor de la página
+    siguiente se devuelve en la cabecera X-Next-Cursor.
     """
-    query = db.query(Conversation)
+    # Las conversaciones nuevas aún no tienen updated_at; usamos created_at en su lugar
+    sort_key = func.coalesce(Conversation.updated_at, Conversation.created_at)
+
+    query = (
+        select(
+            Conversation.id,
+            Conversation.customer_id,
+            Conversation.status,
+            Conversation.last_message_preview,
+            Conversation.last_message_at,
+            Conversation.message_count,
+            Conversation.unread_count,
+            Customer.phone_number,
+            sort_key.label("sort_key"),
+        )
+        .outerjoin(Customer, Customer.id == Conversation.customer_id)
+    )
     if status:
-        query = query.filter(Conversation.status == status)
-    
-    query = query.order_by(desc(Conversation.updated_at)).offset(offset).limit(limit)
-    conversations = query.all()
-    
-    result = []
-    for conv in conversations:
-        last_msg = db.query(Message).filter(Message.conversation_id == conv.id).order_by(desc(Message.created_at)).first()
-        customer_phone = conv.customer.phone_number if conv.customer else None
-        
-        result.append(ConversationListItem(
-            id=conv.id,
-            customer_id=conv.customer_id,
-            customer_phone=customer_phone,
-            status=conv.status,
-            last_message=last_msg.content if last_msg else None,
-            last_message_time=last_msg.created_at if last_msg else None,
-            unread_count=0
-        ))
-    return result
-
-@router.get("/{conversation_id}", response_model=ConversationInDB)
+        query = query.where(Conversation.status == status)
+    if cursor:
+        cursor_value, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(sort_key, Conversation.id) < tuple_(cursor_value, cursor_id))
+
+    rows = (await db.execute(query.order_by(desc(sort_key), desc(Conversation.id)).limit(limit))).all()
+
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.sort_key, last.id)
+
+    return [
+        ConversationListItem(
+            id=row.id,
+            customer_id=row.customer_id,
+            customer_phone=row.phone_number,
+            status=row.status,
+            last_message=row.last_message_preview,
+            last_message_time=row.last_message_at,
+            message_count=row.message_count,
+            unread_count=row.unread_count
+        )
+        for row in rows
+    ]
+
+@router.get("/{conversation_id}", response_model=ConversationHeader)
 def get_conversation(
+    conversation_id: int,
+    request: Request,
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Cabecera de la conversación (sin mensajes; ver GET /{conversation_id}/messages).
+    Admite If-None-Match: si nada cambió responde 304. No marca como leída:
+    para eso está POST /{conversation_id}/read.
+    """
+    row = (
+        db.query(Conversation, Customer.phone_number)
+        .outerjoin(Customer, Customer.id == Conversation.customer_id)
+        .filter(Conversation.id == conversation_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail="Conversación no encontrada")
+    conversation, phone_number = row
+    header = ConversationHeader(
+        id=conversation.id,
+        customer_id=conversation.customer_id,
+        customer_phone=phone_number,
+        status=conversation.status,
+        created_at=conversation.created_at,
+        updated_at=conversation.updated_at,
+        last_message_at=conversation.last_message_at,
+        message_count=conversation.message_count,
+        unread_count=conversation.unread_count
+    )
+    return json_with_etag(request, header)
+
+@router.get("/{conversation_id}/messages", response_model=List[MessageInDB])
+async def list_messages(
+    conversation_id: int,
+    request: Request,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en X-Next-Cursor para cargar mensajes anteriores")
+):
+    """
+    Historial de mensajes, del más reciente al más antiguo, paginado por
+    (created_at, id). X-Next-Cursor trae el cursor de los mensajes anteriores.
+    Admite If-None-Match: si la página no cambió responde 304.
+    """
+    exists = (await db.execute(
+        select(Conversation.id).where(Conversation.id == conversation_id)
+    )).scalar()
+    if exists is None:
+        raise HTTPException(status_code=404, detail="Conversación no encontrada")
+
+    query = select(Message).where(Message.conversation_id == conversation_id)
+    if cursor:
+        cursor_value, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Message.created_at, Message.id) < tuple_(cursor_value, cursor_id))
+    messages = (await db.execute(
+        query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit)
+    )).scalars().all()
+
+    headers = {}
+    if len(messages) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(messages[-1].created_at, messages[-1].id)
+    return json_with_etag(request, [MessageInDB.model_validate(message) for message in messages], headers)
+
+@router.post("/{conversation_id}/read")
+def mark_conversation_as_read(
     conversation_id: int,
     db: Annotated[Session, Depends(get_db)],
     current_user: Annotated[User, Depends(get_current_active_user)]
 ):
+    """Un agente leyó la conversación: reinicia el contador de no leídos."""
     conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
-    return conversation
+
+    if conversation.unread_count:
+        mark_as_read(db, conversation)
+        db.commit()
+    return {"message": "Conversación leída", "conversation_id": conversation_id, "unread_count": 0}
 
 @router.post("/{conversation_id}/take-control")
 def take_control(
@@ -71,10 +177,15 @@ def take_control(
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
     
+    handed_off = conversation.status != ConversationStatus.HUMAN
     conversation.status = ConversationStatus.HUMAN
     conversation.updated_at = func.now()
     db.commit()
     db.refresh(conversation)
+    schedule_expiry(conversation_id)
+    if handed_off:
+        record_handoff(conversation_id)
+    notify_status_change_sync(conversation_id, conversation.status.value)
     return {"message": "Control tomado", "conversation_id": conversation_id, "status": conversation.status}
 
 @router.post("/{conversation_id}/close")
@@ -91,6 +202,8 @@ def close_conversation(
     conversation.updated_at = func.now()
     db.commit()
     db.refresh(conversation)
+    cancel_expiry(conversation_id)
+    notify_status_change_sync(conversation_id, conversation.status.value)
     return {"message": "Conversación cerrada", "conversation_id": conversation_id, "status": conversation.status}
 
 @router.post("/{conversation_id}/messages", response_model=MessageInDB)
@@ -102,38 +215,48 @@ def send_message_as_agent(
 ):
     """
     Envía un mensaje como agente humano a la conversación y lo reenvía por WhatsApp.
+
+    El mensaje se guarda y se devuelve de inmediato; la entrega a Twilio
+    (con reintentos y límite de ritmo) la hace la cola de salida
+    (services/outbound.py), que deja el estado en delivery_status.
     """
-    conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
-    if not conversation:
+    row = (
+        db.query(Conversation, Customer.phone_number)
+        .outerjoin(Customer, Customer.id == Conversation.customer_id)
+        .filter(Conversation.id == conversation_id)
+        .first()
+    )
+    if not row:
         raise HTTPException(status_code=404, detail="Conversación no encontrada")
+    conversation, phone_number = row
     
     # Asegurar que el mensaje se envía como humano
     if message.sender != SenderType.HUMAN:
         message.sender = SenderType.HUMAN
     
-    # Guardar mensaje en BD
-    db_message = Message(
-        conversation_id=conversation_id,
-        sender=message.sender,
-        content=message.content
-    )
-    db.add(db_message)
-    conversation.updated_at = func.now()
+    # Guardar mensaje en BD (actualiza también el resumen de la conversación)
+    db_message = append_message(db, conversation, message.sender, message.content,
+                                outbound=bool(phone_number), mark_read=True)
     db.commit()
+    forget_conversation(conversation_id)
+    schedule_expiry(conversation_id)
+    record_agent_message(conversation_id)
+    notify_new_message_sync(conversation_id, {
+        "id": db_message.id,
+        "conversation_id": conversation_id,
+        "sender": db_message.sender.value,
+        "content": db_message.content,
+    })
     db.refresh(db_message)
     
-    # Enviar mensaje por WhatsApp al cliente
-    try:
-        customer = db.query(Customer).filter(Customer.id == conversation.customer_id).first()
-        if customer and customer.phone_number:
-            result = send_whatsapp_message(customer.phone_number, message.content)
-            if not result.get("success"):
-                logger.warning(f"⚠️ No se pudo enviar mensaje WhatsApp: {result.get('message')}")
-                # No fallamos la petición, pero registramos
-        else:
-            logger.warning(f"⚠️ Cliente sin número de teléfono para conversación {conversation_id}")
-    except Exception as e:
-        logger.error(f"🔴 Error enviando mensaje WhatsApp: {e}", exc_info=True)
-        # No interrumpimos el flujo, el mensaje ya se guardó en BD
+    # Encolar el envío por WhatsApp al cliente
+    if phone_number:
+        try:
+            enqueue_delivery(db_message.id)
+        except Exception as e:
+            logger.error(f"🔴 Error encolando mensaje WhatsApp: {e}", exc_info=True)
+            # Queda en QUEUED: requeue_stale_deliveries lo volverá a encolar
+    else:
+        logger.warning(f"⚠️ Cliente sin número de teléfono para conversación {conversation_id}")
     
     return db_message
\ No newline at end of file
@@ -2,37 +2,54 @@ from typing import Optional, Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from app.core import auth_cache
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import AsyncSessionLocal
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)],
-    db: Annotated[Session, Depends(get_db)]
-) -> User:
+async def _load_user(user_id: Optional[int], username: str) -> Optional[User]:
+    async with AsyncSessionLocal() as db:
+        query = select(User).where(User.id == user_id) if user_id is not None else select(User).where(User.username == username)
+        return (await db.execute(query)).scalars().first()
+
+async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]) -> User:
+    """
+    Usuario del token. Solo consulta la BD si el usuario no está en la caché
+    (ver app/core/auth_cache.py); el objeto devuelto no está ligado a ninguna sesión.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+    payload = auth_cache.get_token_payload(token)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+        if payload.get("sub") is None:
+            raise credentials_exception
+        auth_cache.remember_token(token, payload)
+
+    # Los tokens antiguos no llevan uid/ver: se resuelven por username sin caché
+    user_id = payload.get("uid")
+    data = await auth_cache.get_user(user_id) if user_id is not None else None
+    if data is None:
+        user = await _load_user(user_id, payload["sub"])
+        if user is None:
+            raise credentials_exception
+        data = await auth_cache.remember_user(user)
+
+    if payload.get("ver", 0) != data["token_version"]:
         raise credentials_exception
-    return user
+    return User(**data)
 
 # Dependencia para obtener usuario activo (opcional)
 def get_current_active_user(current_user: Annotated[User, Depends(get_current_user)]) -> User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
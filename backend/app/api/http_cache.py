@@ -0,0 +1,23 @@
+import hashlib
+import json
+from typing import Any, Dict, Optional
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def json_with_etag(request: Request, content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Respuesta JSON con ETag (hash del cuerpo). Si el cliente manda el mismo
+    ETag en If-None-Match se responde 304 sin cuerpo. Con no-cache el navegador
+    revalida en cada petición, así que los sondeos del panel no necesitan
+    lógica propia.
+    """
+    body = json.dumps(jsonable_encoder(content), separators=(",", ":"), ensure_ascii=False).encode()
+    etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "private, no-cache"}
+    if _matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,55 +1,70 @@
+from typing import Any, Dict, Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List
 import json
 import logging
+from app.core import event_bus, ws_broker
+from app.core.socket_manager import emit_new_message, emit_conversation_updated, emit_message_delta
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# Almacenar conexiones activas por conversación
-active_connections: dict[int, List[WebSocket]] = {}
-
 @router.websocket("/ws/conversation/{conversation_id}")
-async def websocket_endpoint(websocket: WebSocket, conversation_id: int):
+async def websocket_endpoint(websocket: WebSocket, conversation_id: int, last_event_id: Optional[str] = None):
     await websocket.accept()
-    if conversation_id not in active_connections:
-        active_connections[conversation_id] = []
-    active_connections[conversation_id].append(websocket)
+    await ws_broker.connect(conversation_id, websocket)
     logger.info(f"Cliente conectado a conversación {conversation_id}")
-    
+
     try:
+        # Al reconectar, reenviar lo que se perdió desde el último evento recibido.
+        # Puede repetir alguno ya entregado en vivo: el cliente descarta por event_id.
+        if last_event_id:
+            client = ws_broker.active_connections[conversation_id][websocket]
+            for event in await event_bus.replay(conversation_id, last_event_id):
+                client.offer(json.dumps(event))
+
         while True:
             # Mantener la conexión viva (podríamos recibir mensajes del cliente si es necesario)
             await websocket.receive_text()
     except WebSocketDisconnect:
-        active_connections[conversation_id].remove(websocket)
         logger.info(f"Cliente desconectado de conversación {conversation_id}")
+    finally:
+        # También si la conexión se cae por otro error o se cancela la tarea
+        await ws_broker.disconnect(conversation_id, websocket)
 
-# Endpoints internos para que el worker notifique
+async def dispatch_event(event: Dict[str, Any]) -> None:
+    """Entrega un evento del bus a los WebSockets y a Socket.IO (en todas las réplicas)."""
+    if event["type"] == event_bus.STATUS_CHANGE_BATCH:
+        for conversation_id in event["conversation_ids"]:
+            await dispatch_event(event_bus.expand_batch(event, conversation_id))
+        return
+    conversation_id = event["conversation_id"]
+    await ws_broker.publish(conversation_id, event)
+    if event["type"] == event_bus.NEW_MESSAGE:
+        await emit_new_message(conversation_id, event)
+    elif event["type"] == event_bus.MESSAGE_DELTA:
+        await emit_message_delta(conversation_id, event)
+    elif event["type"] == event_bus.STATUS_CHANGE:
+        await emit_conversation_updated(conversation_id, event.get("status"))
+
+# Endpoints internos para notificar por HTTP (los workers publican directamente en el bus)
 @router.post("/internal/conversations/{conversation_id}/messages/notify")
 async def notify_new_message(conversation_id: int, message_data: dict):
-    """Recibe notificación del worker y la envía por WebSocket a los clientes."""
-    if conversation_id in active_connections:
-        for connection in active_connections[conversation_id]:
-            try:
-                await connection.send_json(message_data)
-            except:
-                # Si falla, probablemente la conexión está rota, la limpiamos después
-                pass
-    return {"ok": True}
+    """Publica un mensaje nuevo en el bus de eventos."""
+    event_id = await event_bus.publish_async(event_bus.NEW_MESSAGE, conversation_id, message_data)
+    return {"ok": True, "event_id": event_id}
+
+@router.post("/internal/conversations/{conversation_id}/messages/stream/notify")
+async def notify_message_delta(conversation_id: int, data: dict):
+    """Publica un fragmento de la respuesta de la IA mientras se genera."""
+    event_id = await event_bus.publish_async(event_bus.MESSAGE_DELTA, conversation_id, {
+        "stream_id": data.get("stream_id"),
+        "delta": data.get("delta", ""),
+        "done": data.get("done", False)
+    })
+    return {"ok": True, "event_id": event_id}
 
 @router.post("/internal/conversations/{conversation_id}/status/notify")
 async def notify_status_change(conversation_id: int, data: dict):
     """Notifica cambio de estado de conversación."""
-    if conversation_id in active_connections:
-        message = {
-            "type": "status_change",
-            "status": data.get("status"),
-            "conversation_id": conversation_id
-        }
-        for connection in active_connections[conversation_id]:
-            try:
-                await connection.send_json(message)
-            except:
-                pass
-    return {"ok": True}
\ No newline at end of file
+    event_id = await event_bus.publish_async(event_bus.STATUS_CHANGE, conversation_id, {"status": data.get("status")})
+    return {"ok": True, "event_id": event_id}
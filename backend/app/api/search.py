@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_db
+from app.api.deps import get_current_active_user
+from app.api.pagination import encode_cursor, decode_cursor
+from app.models.user import User
+from app.models.conversation import ConversationStatus
+from app.models.message import SenderType
+from app.schemas.conversation import MessageSearchResult
+from app.services.message_search import search_messages
+
+router = APIRouter()
+
+@router.get("/messages", response_model=List[MessageSearchResult])
+async def search_message_history(
+    response: Response,
+    db: Annotated[AsyncSession, Depends(get_async_db)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    q: str = Query(..., min_length=2, description="Texto a buscar (admite \"frases\", OR y -exclusiones)"),
+    status: Optional[ConversationStatus] = Query(None, description="Estado de la conversación"),
+    sender: Optional[SenderType] = Query(None, description="Emisor del mensaje"),
+    date_from: Optional[datetime] = Query(None, description="Desde (incluido)"),
+    date_to: Optional[datetime] = Query(None, description="Hasta (excluido)"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en X-Next-Cursor por la página anterior")
+):
+    """
+    Busca en el historial de mensajes, del más reciente al más antiguo, sin
+    distinguir acentos. El cursor de la página siguiente se devuelve en la
+    cabecera X-Next-Cursor.
+    """
+    rows = await search_messages(
+        db, q,
+        status=status,
+        sender=sender,
+        date_from=date_from,
+        date_to=date_to,
+        cursor=decode_cursor(cursor) if cursor else None,
+        limit=limit
+    )
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id)
+    return [MessageSearchResult(**row._mapping) for row in rows]
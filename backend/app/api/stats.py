@@ -1,13 +1,14 @@
-from typing import Annotated
-from fastapi import APIRouter, Depends
+from typing import Annotated, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from app.core.database import get_db
+from sqlalchemy import func
+from app.core import metrics
+from app.core.database import get_db, pool_metrics
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.models.conversation import Conversation, ConversationStatus
-from app.models.message import Message
-from datetime import datetime, timedelta
+from app.services import analytics, stats_rollup
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
 
@@ -18,30 +19,38 @@ def get_stats(
 ):
     """
     Devuelve estadísticas básicas del sistema.
+
+    Los totales salen de los contadores por hora (services/stats_rollup.py),
+    que van como mucho un par de minutos por detrás. Las conversaciones
+    activas se cuentan en vivo con el índice parcial de activas.
     """
-    # Total de conversaciones
-    total_conversations = db.query(Conversation).count()
-    
-    # Conversaciones por estado
+    now = datetime.now(timezone.utc)
+    counters = stats_rollup.totals(db, stats_rollup.METRICS, recent_since=now - timedelta(hours=24))
+
+    total_conversations = counters["conversations_created"]["total"]
+    active = dict(
+        db.query(Conversation.status, func.count())
+        .filter(Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]))
+        .group_by(Conversation.status)
+        .all()
+    )
+    bot = active.get(ConversationStatus.BOT, 0)
+    human = active.get(ConversationStatus.HUMAN, 0)
     conversations_by_status = {
-        "bot": db.query(Conversation).filter(Conversation.status == ConversationStatus.BOT).count(),
-        "human": db.query(Conversation).filter(Conversation.status == ConversationStatus.HUMAN).count(),
-        "ended": db.query(Conversation).filter(Conversation.status == ConversationStatus.ENDED).count(),
+        "bot": bot,
+        "human": human,
+        "ended": max(total_conversations - bot - human, 0),
     }
     
-    # Total de mensajes
-    total_messages = db.query(Message).count()
-    
-    # Mensajes por tipo de emisor
     messages_by_sender = {
-        "customer": db.query(Message).filter(Message.sender == "customer").count(),
-        "bot": db.query(Message).filter(Message.sender == "bot").count(),
-        "human": db.query(Message).filter(Message.sender == "human").count(),
+        "customer": counters["messages_customer"]["total"],
+        "bot": counters["messages_bot"]["total"],
+        "human": counters["messages_human"]["total"],
     }
+    total_messages = sum(messages_by_sender.values())
     
-    # Conversaciones en las últimas 24 horas
-    last_24h = datetime.utcnow() - timedelta(hours=24)
-    conversations_last_24h = db.query(Conversation).filter(Conversation.created_at >= last_24h).count()
+    # Conversaciones en las últimas 24 horas (por horas completas)
+    conversations_last_24h = counters["conversations_created"]["recent"]
     
     # Promedio de mensajes por conversación
     avg_messages_per_conversation = 0
@@ -55,4 +64,63 @@ def get_stats(
         "messages_by_sender": messages_by_sender,
         "conversations_last_24h": conversations_last_24h,
         "avg_messages_per_conversation": round(avg_messages_per_conversation, 2)
-    }
\ No newline at end of file
+    }
+
+@router.get("/series")
+def get_series(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    metric: str = Query(..., description="Métrica pre-agregada, p. ej. messages_customer"),
+    granularity: Literal["hour", "day"] = Query("hour"),
+    start: Optional[datetime] = Query(None, description="Inicio (por defecto: 24 h o 30 días atrás)"),
+    end: Optional[datetime] = Query(None, description="Fin, excluido (por defecto: ahora)")
+):
+    """
+    Serie temporal por hora o por día de una métrica, leída de los contadores
+    pre-agregados.
+    """
+    if metric not in stats_rollup.METRICS:
+        raise HTTPException(status_code=400, detail=f"Métrica desconocida: {metric}")
+    end = end or datetime.now(timezone.utc)
+    start = start or end - (timedelta(hours=24) if granularity == "hour" else timedelta(days=30))
+    return {
+        "metric": metric,
+        "granularity": granularity,
+        "points": stats_rollup.series(db, metric, start, end, granularity),
+    }
+
+@router.get("/analytics")
+def get_analytics(
+    db: Annotated[Session, Depends(get_db)],
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    granularity: Literal["hour", "day"] = Query("hour"),
+    start: Optional[datetime] = Query(None, description="Inicio (por defecto: 24 h o 30 días atrás)"),
+    end: Optional[datetime] = Query(None, description="Fin, excluido (por defecto: ahora)")
+):
+    """
+    Analítica operativa por hora o por día: percentiles de latencia de primera
+    respuesta del bot y de toma de control humana, tasa de derivación y
+    mensajes por canal.
+    """
+    end = end or datetime.now(timezone.utc)
+    start = start or end - (timedelta(hours=24) if granularity == "hour" else timedelta(days=30))
+    return analytics.analytics_series(db, start, end, granularity)
+
+@router.get("/pipeline")
+def get_pipeline_metrics(
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Contadores operativos del pipeline de mensajes (debounce, etc.).
+    """
+    return metrics.get_all()
+
+
+@router.get("/pool")
+def get_pool_metrics(
+    current_user: Annotated[User, Depends(get_current_active_user)]
+):
+    """
+    Estado del pool de conexiones a la BD del proceso que atiende la petición.
+    """
+    return pool_metrics()
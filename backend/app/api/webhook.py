@@ -1,40 +1,102 @@
+import asyncio
 import logging
 logging.basicConfig(level=logging.INFO)
 
-from fastapi import APIRouter, Request, Response
+from functools import lru_cache
+from fastapi import APIRouter, HTTPException, Request, Response
+from twilio.request_validator import RequestValidator
 from twilio.twiml.messaging_response import MessagingResponse
 import logging
+from app.core.config import settings
+from app.core.redis import get_async_redis
 from app.workers.tasks import process_whatsapp_message
+from app.workers.async_worker import enqueue_incoming_message
+from app.services.status_callbacks import buffer_callback
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# TwiML vacío: es siempre el mismo, se genera una sola vez
+EMPTY_TWIML = str(MessagingResponse())
+
+@lru_cache(maxsize=1)
+def _validator() -> RequestValidator:
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN)
+
+def _twiml() -> Response:
+    return Response(content=EMPTY_TWIML, media_type="application/xml")
+
+async def _verified_form(request: Request):
+    """Lee el formulario y comprueba la firma X-Twilio-Signature (403 si no es válida)."""
+    form = await request.form()
+    if settings.TWILIO_VALIDATE_SIGNATURE:
+        url = str(request.url)
+        if settings.TWILIO_WEBHOOK_BASE_URL:
+            # Detrás de un proxy Twilio firma la URL pública, no la interna
+            url = settings.TWILIO_WEBHOOK_BASE_URL.rstrip("/") + request.url.path
+            if request.url.query:
+                url += "?" + request.url.query
+        signature = request.headers.get("X-Twilio-Signature", "")
+        if not _validator().validate(url, dict(form), signature):
+            logger.warning(f"⚠️ WEBHOOK: Firma de Twilio inválida para {request.url.path}")
+            raise HTTPException(status_code=403, detail="Invalid Twilio signature")
+    return form
+
+async def _first_delivery(message_sid: str) -> bool:
+    """Marca el MessageSid como visto; False si Twilio ya lo había entregado (reintento)."""
+    return bool(await get_async_redis().set(
+        f"twilio:seen:{message_sid}", "1", nx=True, ex=settings.WEBHOOK_DEDUPE_TTL_SECONDS
+    ))
+
+async def _forget_delivery(message_sid: str) -> None:
+    await get_async_redis().delete(f"twilio:seen:{message_sid}")
+
 @router.post("/twilio")
 async def webhook_twilio(request: Request):
+    form = await _verified_form(request)
+    message_sid = form.get("MessageSid")
     try:
-        form = await request.form()
-        message_body = form.get("Body")
-        from_number = form.get("From")
-        
-        logger.info(f"🔵 WEBHOOK: Mensaje recibido: '{message_body}' de {from_number}")
-        
-        # Verificar que la tarea existe
-        logger.info(f"🔵 WEBHOOK: Intentando encolar tarea...")
-        
-        # Encolar tarea en Celery
-        result = process_whatsapp_message.delay({
-            "from": from_number,
-            "body": message_body
-        })
-        
-        logger.info(f"🔵 WEBHOOK: Tarea encolada con ID: {result.id}")
-        
-        # Responder inmediatamente con TwiML vacío
-        resp = MessagingResponse()
-        return Response(content=str(resp), media_type="application/xml")
+        if message_sid and not await _first_delivery(message_sid):
+            logger.info(f"🔵 WEBHOOK: Mensaje {message_sid} duplicado, ignorado")
+            return _twiml()
+
+        message_data = {
+            "from": form.get("From"),
+            "body": form.get("Body"),
+            "sid": message_sid
+        }
+        logger.info(f"🔵 WEBHOOK: Mensaje {message_sid} recibido de {message_data['from']}")
+
+        if settings.MESSAGE_PIPELINE == "async":
+            # Encolar para el worker asyncio
+            await enqueue_incoming_message(message_data)
+        else:
+            # Encolar tarea en Celery (el cliente de Celery es bloqueante: fuera del event loop)
+            await asyncio.to_thread(process_whatsapp_message.delay, message_data)
     
     except Exception as e:
         logger.error(f"🔴 WEBHOOK ERROR: {e}", exc_info=True)
-        # Incluso en error, responder con TwiML vacío
-        resp = MessagingResponse()
-        return Response(content=str(resp), media_type="application/xml")
\ No newline at end of file
+        # Permitir que el reintento de Twilio vuelva a encolarlo
+        if message_sid:
+            try:
+                await _forget_delivery(message_sid)
+            except Exception:
+                pass
+    
+    # Responder inmediatamente con TwiML vacío (incluso en error)
+    return _twiml()
+
+
+@router.post("/twilio/status")
+async def webhook_twilio_status(request: Request):
+    """
+    Callback de estado de entrega de Twilio. Solo se guarda en el buffer; los
+    mensajes se actualizan por lotes (ver services/status_callbacks.py).
+    """
+    form = await _verified_form(request)
+    try:
+        await buffer_callback(form)
+    except Exception as e:
+        # Twilio no reintenta los callbacks de estado: basta con registrarlo
+        logger.error(f"🔴 STATUS CALLBACK ERROR: {e}")
+    return Response(status_code=204)
@@ -0,0 +1,117 @@
+"""
+Cachés de autenticación para no consultar la BD en cada petición.
+
+- Tokens: el payload de un JWT ya verificado se guarda en memoria hasta que
+  caduca, así las peticiones siguientes con el mismo token no repiten la
+  verificación de la firma.
+- Usuarios: los datos necesarios para autorizar (id, username, email,
+  is_active, token_version) se cachean en memoria (TTL corto) y en Redis
+  (compartido entre réplicas), por ID de usuario.
+
+Al desactivar un usuario se incrementa su token_version y su entrada se
+reemplaza por los datos nuevos: los tokens emitidos con la versión anterior
+dejan de aceptarse. La escritura en Redis es un compare-and-set que nunca
+baja token_version, así una petición que leyó al usuario antes del cambio no
+puede volver a dejar en caché la versión anterior.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.core.redis import get_async_redis, get_redis
+
+logger = logging.getLogger(__name__)
+
+TOKEN_CACHE_MAX_ENTRIES = 10000
+USER_FIELDS = ("id", "username", "email", "is_active", "token_version")
+
+_lock = threading.Lock()
+_tokens: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_users: Dict[int, tuple] = {}
+
+# Guarda los datos del usuario salvo que la caché tenga un token_version mayor.
+# Hash con los datos en JSON y token_version aparte, para comparar sin decodificar.
+_SET_IF_NOT_OLDER = """
+local current = tonumber(redis.call('hget', KEYS[1], 'token_version'))
+if current and current > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('hset', KEYS[1], 'data', ARGV[1], 'token_version', ARGV[2])
+redis.call('expire', KEYS[1], ARGV[3])
+return 1
+"""
+
+def _user_key(user_id: int) -> str:
+    return f"auth:users:{user_id}"
+
+def get_token_payload(token: str) -> Optional[Dict[str, Any]]:
+    """Payload de un token ya verificado y vigente, o None."""
+    with _lock:
+        payload = _tokens.get(token)
+        if payload is None:
+            return None
+        if payload.get("exp", 0) <= time.time():
+            del _tokens[token]
+            return None
+        _tokens.move_to_end(token)
+        return payload
+
+def remember_token(token: str, payload: Dict[str, Any]) -> None:
+    with _lock:
+        _tokens[token] = payload
+        _tokens.move_to_end(token)
+        while len(_tokens) > TOKEN_CACHE_MAX_ENTRIES:
+            _tokens.popitem(last=False)
+
+async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Datos del usuario desde la caché en memoria o, si no, desde Redis."""
+    with _lock:
+        entry = _users.get(user_id)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    try:
+        raw = await get_async_redis().hget(_user_key(user_id), "data")
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo leer la caché de usuarios: {e}")
+        return None
+    if raw is None:
+        return None
+    data = json.loads(raw)
+    _remember_local(data)
+    return data
+
+async def remember_user(user) -> Dict[str, Any]:
+    data = {field: getattr(user, field) for field in USER_FIELDS}
+    _remember_local(data)
+    try:
+        await get_async_redis().eval(
+            _SET_IF_NOT_OLDER, 1, _user_key(user.id),
+            json.dumps(data), data["token_version"], settings.AUTH_USER_CACHE_REDIS_TTL_SECONDS
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo guardar el usuario en caché: {e}")
+    return data
+
+def _remember_local(data: Dict[str, Any]) -> None:
+    with _lock:
+        current = _users.get(data["id"])
+        if current and current[0]["token_version"] > data["token_version"]:
+            return
+        _users[data["id"]] = (data, time.monotonic() + settings.AUTH_USER_CACHE_TTL_SECONDS)
+
+def invalidate_user(user) -> None:
+    """
+    Reemplaza al usuario en la caché (Redis y la de este proceso) por sus datos
+    actuales, ya con el commit hecho. Las demás réplicas lo verán como mucho
+    AUTH_USER_CACHE_TTL_SECONDS después.
+    """
+    data = {field: getattr(user, field) for field in USER_FIELDS}
+    with _lock:
+        _users.pop(user.id, None)
+    get_redis().eval(
+        _SET_IF_NOT_OLDER, 1, _user_key(user.id),
+        json.dumps(data), data["token_version"], settings.AUTH_USER_CACHE_REDIS_TTL_SECONDS
+    )
@@ -1,17 +1,143 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import create_engine, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from app.core.config import settings
 
-engine = create_engine(settings.DATABASE_URL)
+def _async_database_url(url: str) -> str:
+    """Convierte la URL síncrona al driver asíncrono equivalente."""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+# Tiempo de espera para obtener conexión del pool (por proceso)
+_wait_lock = threading.Lock()
+_wait_stats = {"checkouts": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+def _record_wait(started: float) -> None:
+    wait_ms = (time.perf_counter() - started) * 1000
+    with _wait_lock:
+        _wait_stats["checkouts"] += 1
+        _wait_stats["wait_ms_total"] += wait_ms
+        _wait_stats["wait_ms_max"] = max(_wait_stats["wait_ms_max"], wait_ms)
+
+class _TimedCheckout:
+    """
+    Mide la espera de cada checkout del pool, incluidos los que agotan pool_timeout.
+
+    Se mide aquí y no en get_db: tomar la conexión en la dependencia la
+    retiene mientras el endpoint síncrono espera un hilo libre, y con el
+    threadpool lleno de peticiones esperando conexión eso se bloquea.
+    """
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            _record_wait(started)
+
+class _TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class _TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def _engine_options(is_async: bool) -> dict:
+    """
+    Opciones de pool y conexión comunes a los motores síncrono y asíncrono.
+
+    Con DB_PGBOUNCER el pool lo gestiona PgBouncer: usamos NullPool y
+    desactivamos las sentencias preparadas de asyncpg (incompatibles con el
+    modo transaction). Tampoco se envía statement_timeout como parámetro de
+    arranque, porque PgBouncer lo rechaza; debe configurarse en el rol o la BD.
+    """
+    if not settings.DATABASE_URL.startswith("postgresql"):
+        return {}
+
+    options: dict = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if settings.DB_PGBOUNCER:
+        options["poolclass"] = NullPool
+        if is_async:
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    options.update(
+        poolclass=_TimedAsyncQueuePool if is_async else _TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    if is_async:
+        options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}}
+    else:
+        options["connect_args"] = {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+engine = create_engine(settings.DATABASE_URL, **_engine_options(is_async=False))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono (worker asyncio y endpoints async). No abre conexiones hasta el primer uso.
+async_engine = create_async_engine(_async_database_url(settings.DATABASE_URL), **_engine_options(is_async=True))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def upsert(db, table):
+    """
+    INSERT con ON CONFLICT del dialecto de la sesión: Postgres en producción,
+    SQLite en desarrollo local y pruebas. Ambos admiten on_conflict_do_nothing,
+    on_conflict_do_update y excluded.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(table)
+    return pg_insert(table)
+
+def seconds_ago(db, seconds: float):
+    """Instante `seconds` segundos antes de ahora según el reloj de la BD, en el dialecto de la sesión."""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.datetime("now", f"-{seconds} seconds")
+    return func.now() - timedelta(seconds=seconds)
+
+def _pool_status(pool) -> dict:
+    if isinstance(pool, NullPool) or not hasattr(pool, "checkedout"):
+        return {"pool": type(pool).__name__}
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+    }
+
+def pool_metrics() -> dict:
+    """Estado de los pools y espera de conexión de este proceso."""
+    with _wait_lock:
+        waits = dict(_wait_stats)
+    waits["wait_ms_avg"] = waits["wait_ms_total"] / waits["checkouts"] if waits["checkouts"] else 0.0
+    return {
+        "sync": _pool_status(engine.pool),
+        "async": _pool_status(async_engine.sync_engine.pool),
+        "connection_wait": waits,
+    }
+
 # Dependencia para obtener sesión de BD en los endpoints
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependencia equivalente para endpoints async (motor asyncpg)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.redis import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Tipos de evento que publican la API y los workers
+NEW_MESSAGE = "new_message"
+MESSAGE_DELTA = "message_delta"
+STATUS_CHANGE = "status_change"
+# Mismo cambio de estado para muchas conversaciones (conversation_id 0, IDs en "conversation_ids")
+STATUS_CHANGE_BATCH = "status_change_batch"
+
+CONSUMER_GROUP = "api"
+
+# Entradas del stream leídas por cada XRANGE al reproducir eventos
+REPLAY_PAGE_SIZE = 500
+# Pendientes de otra réplica con más de este tiempo sin confirmar se reclaman
+CLAIM_MIN_IDLE_MS = 30000
+CLAIM_INTERVAL_SECONDS = 30
+
+def _fields(event_type: str, conversation_id: int, data: Dict[str, Any]) -> Dict[str, str]:
+    return {"type": event_type, "conversation_id": str(conversation_id), "data": json.dumps(data)}
+
+def _decode(event_id: str, fields: Dict[str, str]) -> Dict[str, Any]:
+    """Evento tal como se entrega a los clientes: tipo, conversación, ID y datos."""
+    return {
+        "type": fields["type"],
+        "conversation_id": int(fields["conversation_id"]),
+        "event_id": event_id,
+        **json.loads(fields["data"]),
+    }
+
+def publish(event_type: str, conversation_id: int, data: Dict[str, Any]) -> str:
+    """Publica un evento en el stream (desde código síncrono). Devuelve su ID."""
+    return get_redis().xadd(
+        settings.EVENT_STREAM, _fields(event_type, conversation_id, data),
+        maxlen=settings.EVENT_STREAM_MAXLEN, approximate=True
+    )
+
+async def publish_async(event_type: str, conversation_id: int, data: Dict[str, Any]) -> str:
+    return await get_async_redis().xadd(
+        settings.EVENT_STREAM, _fields(event_type, conversation_id, data),
+        maxlen=settings.EVENT_STREAM_MAXLEN, approximate=True
+    )
+
+async def replay(conversation_id: int, last_event_id: str, limit: int = 1000) -> List[Dict[str, Any]]:
+    """
+    Eventos de la conversación posteriores a `last_event_id` (para clientes que
+    reconectan), como mucho `limit`. El stream se recorre por páginas hasta el
+    final, porque la mayoría de entradas son de otras conversaciones.
+    """
+    redis = get_async_redis()
+    events = []
+    start = f"({last_event_id}"
+    while len(events) < limit:
+        entries = await redis.xrange(settings.EVENT_STREAM, min=start, count=REPLAY_PAGE_SIZE)
+        for event_id, fields in entries:
+            if int(fields["conversation_id"]) == conversation_id:
+                events.append(_decode(event_id, fields))
+            elif fields["type"] == STATUS_CHANGE_BATCH:
+                event = _decode(event_id, fields)
+                if conversation_id in event["conversation_ids"]:
+                    events.append(expand_batch(event, conversation_id))
+        if len(entries) < REPLAY_PAGE_SIZE:
+            break
+        start = f"({entries[-1][0]}"
+    return events[:limit]
+
+def expand_batch(event: Dict[str, Any], conversation_id: int) -> Dict[str, Any]:
+    """Evento status_change individual a partir de un status_change_batch."""
+    return {
+        "type": STATUS_CHANGE,
+        "conversation_id": conversation_id,
+        "event_id": event["event_id"],
+        "status": event["status"],
+    }
+
+async def run_consumer(handler: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+    """
+    Consume el stream con el grupo de la API: cada evento lo procesa una sola
+    réplica (que lo reparte a todas vía pub/sub) y se confirma con XACK después
+    de entregarlo. Los pendientes de una réplica caída se reclaman al arrancar
+    y cada CLAIM_INTERVAL_SECONDS.
+    """
+    redis = get_async_redis()
+    consumer = f"{socket.gethostname()}:{os.getpid()}"
+    while True:
+        try:
+            try:
+                await redis.xgroup_create(settings.EVENT_STREAM, CONSUMER_GROUP, id="$", mkstream=True)
+            except Exception as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+            next_claim = 0.0
+            while True:
+                loop_time = asyncio.get_running_loop().time()
+                if loop_time >= next_claim:
+                    await _claim_pending(redis, handler, consumer)
+                    next_claim = loop_time + CLAIM_INTERVAL_SECONDS
+                response = await redis.xreadgroup(
+                    CONSUMER_GROUP, consumer, {settings.EVENT_STREAM: ">"}, count=100, block=5000
+                )
+                for _, entries in response:
+                    await _handle_batch(redis, handler, entries)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"🔴 Error consumiendo eventos: {e}")
+            await asyncio.sleep(1)
+
+async def _claim_pending(redis, handler, consumer: str) -> None:
+    """Reclama y procesa los eventos que otra réplica leyó pero no llegó a confirmar."""
+    cursor = "0-0"
+    while True:
+        next_cursor, claimed, *_ = await redis.xautoclaim(
+            settings.EVENT_STREAM, CONSUMER_GROUP, consumer,
+            min_idle_time=CLAIM_MIN_IDLE_MS, start_id=cursor, count=100
+        )
+        await _handle_batch(redis, handler, claimed)
+        # "0-0": recorrida toda la lista de pendientes. Un cursor que no avanza tampoco se repite
+        if next_cursor in ("0-0", cursor):
+            return
+        cursor = next_cursor
+
+async def _handle_batch(redis, handler, entries) -> None:
+    for event_id, fields in entries:
+        if not fields:
+            # Recortado por MAXLEN antes de procesarse
+            await redis.xack(settings.EVENT_STREAM, CONSUMER_GROUP, event_id)
+            continue
+        try:
+            await handler(_decode(event_id, fields))
+        except Exception as e:
+            logger.error(f"🔴 Error entregando evento {event_id}: {e}")
+        await redis.xack(settings.EVENT_STREAM, CONSUMER_GROUP, event_id)
@@ -0,0 +1,14 @@
+from typing import Dict
+from app.core.redis import get_redis, get_async_redis
+
+# Contadores operativos compartidos entre procesos (hash en Redis)
+METRICS_KEY = "metrics"
+
+def incr(name: str, amount: float = 1) -> None:
+    get_redis().hincrbyfloat(METRICS_KEY, name, amount)
+
+async def incr_async(name: str, amount: float = 1) -> None:
+    await get_async_redis().hincrbyfloat(METRICS_KEY, name, amount)
+
+def get_all() -> Dict[str, float]:
+    return {name: float(value) for name, value in get_redis().hgetall(METRICS_KEY).items()}
@@ -0,0 +1,20 @@
+from typing import Optional
+import redis
+import redis.asyncio as aioredis
+from app.core.config import settings
+
+# Clientes Redis compartidos por el proceso (cada uno con su pool de conexiones)
+_redis: Optional[redis.Redis] = None
+_async_redis: Optional[aioredis.Redis] = None
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+def get_async_redis() -> aioredis.Redis:
+    global _async_redis
+    if _async_redis is None:
+        _async_redis = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_redis
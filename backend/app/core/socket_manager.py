@@ -1,13 +1,26 @@
 import socketio
 from typing import Dict, Any
+from app.core.config import settings
 
-# Crear servidor Socket.IO con CORS permitido
-sio = socketio.AsyncServer(cors_allowed_origins="*", async_mode='asgi')
+# Crear servidor Socket.IO con CORS permitido. El gestor Redis reparte los
+# emit entre todas las réplicas de la API.
+sio = socketio.AsyncServer(
+    cors_allowed_origins="*",
+    async_mode='asgi',
+    client_manager=socketio.AsyncRedisManager(settings.REDIS_URL)
+)
 # Crear aplicación ASGI para montar en FastAPI
 socket_app = socketio.ASGIApp(sio)
 
-# Diccionario para mantener salas (opcional)
-# Podemos usar las salas de Socket.IO directamente
+# Usamos las salas de Socket.IO directamente: una por conversación
+
+@sio.event
+async def join_conversation(sid, conversation_id):
+    await sio.enter_room(sid, f'conversation_{conversation_id}')
+
+@sio.event
+async def leave_conversation(sid, conversation_id):
+    await sio.leave_room(sid, f'conversation_{conversation_id}')
 
 async def emit_new_message(conversation_id: int, message_data: Dict[str, Any]):
     """Emitir nuevo mensaje a la sala de la conversación"""
@@ -15,4 +28,8 @@ async def emit_new_message(conversation_id: int, message_data: Dict[str, Any]):
 
 async def emit_conversation_updated(conversation_id: int, status: str):
     """Emitir actualización de estado a la sala de la conversación"""
-    await sio.emit('conversation_updated', {'conversation_id': conversation_id, 'status': status}, room=f'conversation_{conversation_id}')
\ No newline at end of file
+    await sio.emit('conversation_updated', {'conversation_id': conversation_id, 'status': status}, room=f'conversation_{conversation_id}')
+
+async def emit_message_delta(conversation_id: int, delta_data: Dict[str, Any]):
+    """Emitir un fragmento de la respuesta de la IA mientras se genera"""
+    await sio.emit('message_delta', delta_data, room=f'conversation_{conversation_id}')
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict
+from fastapi import WebSocket
+from app.core.config import settings
+from app.core.redis import get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Un canal Redis por conversación: cualquier proceso publica y cada réplica de
+# la API entrega el mensaje a los WebSockets conectados a ella.
+CHANNEL_PREFIX = "ws:conversation:"
+CONTROL_CHANNEL = "ws:control"
+
+class ClientConnection:
+    """
+    WebSocket de un cliente con su propia cola de envío acotada.
+
+    Un broadcast solo encola (nunca espera al cliente); una tarea por cliente
+    envía con timeout. Si la cola se llena o un envío falla o tarda demasiado,
+    el cliente se desconecta para que no frene ni acumule memoria.
+    """
+
+    def __init__(self, conversation_id: int, websocket: WebSocket):
+        self.conversation_id = conversation_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.dropped = False
+        self.task = asyncio.create_task(self._sender())
+
+    async def _sender(self) -> None:
+        try:
+            while True:
+                data = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(data), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"Cliente de conversación {self.conversation_id} desconectado: {e!r}")
+            asyncio.create_task(_drop(self))
+
+    def offer(self, data: str) -> bool:
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+# Conexiones activas de este proceso, por conversación
+active_connections: Dict[int, Dict[WebSocket, ClientConnection]] = {}
+
+_pubsub = None
+
+def _channel(conversation_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{conversation_id}"
+
+async def connect(conversation_id: int, websocket: WebSocket) -> None:
+    if conversation_id not in active_connections:
+        active_connections[conversation_id] = {}
+        # Primer cliente local de la conversación: empezar a escuchar su canal
+        if _pubsub is not None:
+            await _pubsub.subscribe(_channel(conversation_id))
+    active_connections[conversation_id][websocket] = ClientConnection(conversation_id, websocket)
+
+async def disconnect(conversation_id: int, websocket: WebSocket) -> None:
+    connections = active_connections.get(conversation_id)
+    if not connections:
+        return
+    client = connections.pop(websocket, None)
+    if client is not None:
+        client.task.cancel()
+    if not connections:
+        del active_connections[conversation_id]
+        if _pubsub is not None:
+            await _pubsub.unsubscribe(_channel(conversation_id))
+
+async def _drop(client: ClientConnection) -> None:
+    """Desconecta un cliente lento o roto y lo saca del registro."""
+    if client.dropped:
+        return
+    client.dropped = True
+    await disconnect(client.conversation_id, client.websocket)
+    try:
+        # 1013: "try again later", el cliente puede reconectar
+        await asyncio.wait_for(client.websocket.close(code=1013), timeout=1)
+    except Exception:
+        pass
+
+async def publish(conversation_id: int, payload: Dict[str, Any]) -> None:
+    """Publica un evento para todos los WebSockets de la conversación, en cualquier réplica."""
+    await get_async_redis().publish(_channel(conversation_id), json.dumps(payload))
+
+def deliver_local(conversation_id: int, data: str) -> None:
+    """
+    Entrega un evento ya serializado a los WebSockets de este proceso. Solo
+    encola en cada cliente, así que no espera a ninguno.
+    """
+    for client in list(active_connections.get(conversation_id, {}).values()):
+        if not client.offer(data):
+            logger.warning(f"⚠️ Cliente lento en conversación {conversation_id}: se desconecta")
+            asyncio.create_task(_drop(client))
+
+async def run_subscriber() -> None:
+    """Escucha los canales de las conversaciones con clientes locales (tarea de fondo de la API)."""
+    global _pubsub
+    while True:
+        try:
+            _pubsub = get_async_redis().pubsub()
+            # El canal de control mantiene la suscripción abierta aunque no haya clientes
+            await _pubsub.subscribe(CONTROL_CHANNEL, *(_channel(cid) for cid in active_connections))
+            while True:
+                message = await _pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None or message["channel"] == CONTROL_CHANNEL:
+                    continue
+                conversation_id = int(message["channel"][len(CHANNEL_PREFIX):])
+                deliver_local(conversation_id, message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"🔴 Error en suscriptor de WebSockets: {e}")
+            await asyncio.sleep(1)
+        finally:
+            if _pubsub is not None:
+                await _pubsub.aclose()
+                _pubsub = None
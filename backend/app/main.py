@@ -1,12 +1,32 @@
+import asyncio
+from contextlib import asynccontextmanager
+import socketio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import router
 from app.core.config import settings
+from app.core import event_bus, ws_broker
+from app.api.internal import dispatch_event
+from app.core.socket_manager import sio
+from app.services.status_callbacks import run_flusher
 
-app = FastAPI(
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Consumir el bus de eventos y recibir la difusión de las demás réplicas
+    consumer = asyncio.create_task(event_bus.run_consumer(dispatch_event))
+    subscriber = asyncio.create_task(ws_broker.run_subscriber())
+    # Aplicar por lotes los callbacks de estado de Twilio
+    flusher = asyncio.create_task(run_flusher())
+    yield
+    consumer.cancel()
+    subscriber.cancel()
+    flusher.cancel()
+
+fastapi_app = FastAPI(
     title="Asistente Inteligente API",
     version="0.1.0",
-    description="API para asistente multicanal con IA y derivación a humano"
+    description="API para asistente multicanal con IA y derivación a humano",
+    lifespan=lifespan
 )
 
 # Configuración de CORS
@@ -17,16 +37,20 @@ origins = [
     # Agrega aquí tu dominio de producción
 ]
 
-app.add_middleware(
+fastapi_app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-app.include_router(router)
+fastapi_app.include_router(router)
 
-@app.get("/")
+@fastapi_app.get("/")
 async def root():
-    return {"message": "Bienvenido a la API del Asistente Inteligente", "docs": "/docs"}
\ No newline at end of file
+    return {"message": "Bienvenido a la API del Asistente Inteligente", "docs": "/docs"}
+
+# Socket.IO atiende /socket.io y delega el resto de peticiones en FastAPI
+app = socketio.ASGIApp(sio, other_asgi_app=fastapi_app)
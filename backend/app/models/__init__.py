@@ -2,4 +2,5 @@ from .user import User
 from .customer import Customer
 from .conversation import Conversation
 from .message import Message
-from .setting import Setting
\ No newline at end of file
+from .setting import Setting
+from .stats import StatsFlush, StatsHourly, StatsRollupState
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -19,5 +19,20 @@ class Conversation(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     last_activity_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Resumen desnormalizado, mantenido al insertar cada mensaje (ver services/conversation_service.py)
+    last_message_preview = Column(String(200), nullable=True)
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")  # Mensajes del cliente sin leer por los agentes
+
+    __table_args__ = (
+        Index("ix_conversations_customer_id_status_created_at", customer_id, status, created_at.desc()),
+        Index(
+            "ix_conversations_active_last_activity_at", last_activity_at,
+            postgresql_where=status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]),
+        ),
+        Index("ix_conversations_inbox_order", func.coalesce(updated_at, created_at).desc(), id.desc()),
+    )
+
     customer = relationship("Customer", backref="conversations")
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum
+from sqlalchemy import Column, DDL, Integer, String, ForeignKey, DateTime, Text, Enum, Index, UniqueConstraint, event
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -9,6 +9,13 @@ class SenderType(str, enum.Enum):
     BOT = "bot"
     HUMAN = "human"
 
+class DeliveryStatus(str, enum.Enum):
+    QUEUED = "queued"
+    SENT = "sent"
+    DELIVERED = "delivered"
+    READ = "read"
+    FAILED = "failed"
+
 class Message(Base):
     __tablename__ = "messages"
 
@@ -19,4 +26,58 @@ class Message(Base):
     intent_detected = Column(String, nullable=True)  # Para depuración
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    conversation = relationship("Conversation", back_populates="messages")
\ No newline at end of file
+    # Entrega por WhatsApp (solo mensajes salientes; ver services/outbound.py)
+    delivery_status = Column(Enum(DeliveryStatus), nullable=True)
+    delivery_attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    delivery_error = Column(String(255), nullable=True)
+    twilio_sid = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index("ix_messages_conversation_id_created_at", conversation_id, created_at.desc()),
+        UniqueConstraint("twilio_sid", name="uq_messages_twilio_sid"),
+        # Reencolado de entregas pendientes
+        Index(
+            "ix_messages_queued_created_at", created_at,
+            postgresql_where=delivery_status == DeliveryStatus.QUEUED,
+        ),
+    )
+
+    conversation = relationship("Conversation", back_populates="messages")
+
+# Búsqueda de texto completo en SQLite (desarrollo local y pruebas): tabla FTS5
+# con contenido externo sincronizada con triggers. Se crea junto a la tabla
+# messages en create_all; en Postgres la búsqueda usa el índice GIN de la
+# migración d4f8b2a6c913.
+SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content, content='messages', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    "INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')",
+]
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(Message.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+# Los triggers se borran con la tabla; la tabla FTS no
+event.listen(
+    Message.__table__, "after_drop",
+    DDL("DROP TABLE IF EXISTS messages_fts").execute_if(dialect="sqlite")
+)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, String, DateTime, BigInteger, func
+from app.core.database import Base
+
+class StatsHourly(Base):
+    """Contadores pre-agregados por hora (ver services/stats_rollup.py)."""
+    __tablename__ = "stats_hourly"
+
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    metric = Column(String(64), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class StatsRollupState(Base):
+    """Último ID ya agregado de cada tabla de origen."""
+    __tablename__ = "stats_rollup_state"
+
+    source = Column(String(32), primary_key=True)
+    last_id = Column(BigInteger, nullable=False, default=0)
+
+class StatsFlush(Base):
+    """Volcados de analítica ya aplicados a stats_hourly (ver services/analytics.py)."""
+    __tablename__ = "stats_flushes"
+
+    flush_id = Column(String(32), primary_key=True)
+    flushed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -2,7 +2,7 @@ from pydantic import BaseModel
 from datetime import datetime
 from typing import List, Optional
 from app.models.conversation import ConversationStatus
-from app.models.message import SenderType
+from app.models.message import DeliveryStatus, SenderType
 
 class MessageBase(BaseModel):
     content: str
@@ -15,6 +15,7 @@ class MessageInDB(MessageBase):
     id: int
     conversation_id: int
     created_at: datetime
+    delivery_status: Optional[DeliveryStatus] = None
 
     class Config:
         from_attributes = True
@@ -26,14 +27,15 @@ class ConversationBase(BaseModel):
 class ConversationCreate(ConversationBase):
     pass
 
-class ConversationInDB(ConversationBase):
+# Cabecera de una conversación (los mensajes se paginan aparte)
+class ConversationHeader(ConversationBase):
     id: int
+    customer_phone: Optional[str]
     created_at: datetime
     updated_at: Optional[datetime]
-    messages: List[MessageInDB] = []
-
-    class Config:
-        from_attributes = True
+    last_message_at: Optional[datetime]
+    message_count: int = 0
+    unread_count: int = 0
 
 # Para listar conversaciones (sin mensajes)
 class ConversationListItem(BaseModel):
@@ -43,49 +45,15 @@ class ConversationListItem(BaseModel):
     status: ConversationStatus
     last_message: Optional[str]
     last_message_time: Optional[datetime]
-    unread_count: int = 0  # podríamos implementarlo despuésfrom pydantic import BaseModel
-from datetime import datetime
-from typing import List, Optional
-from app.models.conversation import ConversationStatus
-from app.models.message import SenderType
-
-class MessageBase(BaseModel):
-    content: str
-    sender: SenderType
+    message_count: int = 0
+    unread_count: int = 0
 
-class MessageCreate(MessageBase):
-    pass
-
-class MessageInDB(MessageBase):
+# Resultado de la búsqueda de texto completo en mensajes
+class MessageSearchResult(BaseModel):
     id: int
     conversation_id: int
+    sender: SenderType
     created_at: datetime
-
-    class Config:
-        from_attributes = True
-
-class ConversationBase(BaseModel):
-    customer_id: int
-    status: ConversationStatus
-
-class ConversationCreate(ConversationBase):
-    pass
-
-class ConversationInDB(ConversationBase):
-    id: int
-    created_at: datetime
-    updated_at: Optional[datetime]
-    messages: List[MessageInDB] = []
-
-    class Config:
-        from_attributes = True
-
-# Para listar conversaciones (sin mensajes)
-class ConversationListItem(BaseModel):
-    id: int
-    customer_id: int
+    snippet: str
+    conversation_status: ConversationStatus
     customer_phone: Optional[str]
-    status: ConversationStatus
-    last_message: Optional[str]
-    last_message_time: Optional[datetime]
-    unread_count: int = 0  # podríamos implementarlo después
\ No newline at end of file
@@ -1,11 +1,15 @@
 import logging
-from openai import OpenAI
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.response_cache import response_cache, config_fingerprint
+from app.services.intent_router import classify
 
 logger = logging.getLogger(__name__)
 
 # Inicializar cliente OpenAI
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
 
 # ============================================
 # CONFIGURACIÓN DEL NEGOCIO (personalizable)
@@ -27,21 +31,17 @@ BUSINESS_CONFIG = {
     ]
 }
 
-def generate_ai_response(user_message: str) -> str:
-    """
-    Genera respuesta personalizada usando OpenAI con contexto del negocio
-    """
-    try:
-        # Detectar si el usuario quiere hablar con humano
-        human_keywords = ["humano", "agente", "persona", "hablar con alguien", 
-                         "representante", "asesor", "queja", "reclamo"]
-        if any(keyword in user_message.lower() for keyword in human_keywords):
-            return ("Entiendo que prefieres hablar con un humano. "
-                   f"Un agente de {BUSINESS_CONFIG['name']} te contactará "
-                   "en menos de 5 minutos. Mientras tanto, ¿puedo ayudarte con algo más?")
-
-        # Construir el prompt del sistema con toda la información del negocio
-        system_prompt = f"""Eres un asistente virtual de atención al cliente para {BUSINESS_CONFIG['name']}, 
+def _human_handoff_reply(user_message: str) -> Optional[str]:
+    """Respuesta fija si el usuario pide hablar con un humano, o None."""
+    if classify(user_message).name == "handoff":
+        return ("Entiendo que prefieres hablar con un humano. "
+               f"Un agente de {BUSINESS_CONFIG['name']} te contactará "
+               "en menos de 5 minutos. Mientras tanto, ¿puedo ayudarte con algo más?")
+    return None
+
+def _build_system_prompt() -> str:
+    """Construye el prompt del sistema con toda la información del negocio."""
+    return f"""Eres un asistente virtual de atención al cliente para {BUSINESS_CONFIG['name']}, 
 una tienda de electrónica en Guatemala.
 
 INFORMACIÓN DEL NEGOCIO:
@@ -68,28 +68,92 @@ Ejemplos de respuestas:
 - "¡Claro! En {BUSINESS_CONFIG['name']} tenemos laptops HP y Lenovo ideales para estudiantes, desde Q2,500. ¿Tienes algún presupuesto en mente?"
 - "Nuestro horario es {BUSINESS_CONFIG['hours']}. ¿Necesitas ayuda con algo más?"
 - "Lamento escuchar eso. Permíteme transferirte con un agente especializado que podrá resolver tu caso. ¿Me confirmas tu número de teléfono?".
-
-RESPONDE AL SIGUIENTE MENSAJE DEL CLIENTE:
-{user_message}
 """
-        
-        # Llamada a OpenAI
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # El más económico
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
+
+# El prompt del sistema es estático: se construye una vez por proceso y solo
+# se regenera si cambia BUSINESS_CONFIG.
+_system_prompt: Tuple[str, str] = ("", "")
+
+def get_system_prompt() -> str:
+    global _system_prompt
+    version = config_fingerprint(BUSINESS_CONFIG)
+    if _system_prompt[0] != version:
+        _system_prompt = (version, _build_system_prompt())
+    return _system_prompt[1]
+
+def _build_messages(user_message: str, history: Optional[List[dict]] = None) -> list:
+    """Prompt del sistema + historial reciente de la conversación + turno actual."""
+    return (
+        [{"role": "system", "content": get_system_prompt()}]
+        + (history or [])
+        + [{"role": "user", "content": user_message}]
+    )
+
+def _fallback_reply() -> str:
+    return ("Lo siento, estoy teniendo problemas para procesar tu mensaje. "
+            f"Por favor llama a {BUSINESS_CONFIG['phone']} o escribe a "
+            f"{BUSINESS_CONFIG['email']} para atención personalizada.")
+
+async def generate_ai_response_async(
+    user_message: str,
+    history: Optional[List[dict]] = None,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+) -> str:
+    """
+    Genera respuesta personalizada usando OpenAI con contexto del negocio,
+    sin bloquear el event loop.
+
+    `history` son los mensajes previos de la conversación en formato OpenAI
+    (ver context_builder). La caché solo se usa (lectura y escritura) sin
+    historial: con contexto, la misma frase ("sí", "¿y cuánto cuesta?") puede
+    necesitar otra respuesta.
+
+    Si se pasa `on_delta`, la respuesta se pide en streaming y se llama con
+    cada fragmento de texto a medida que llega. Devuelve el texto completo.
+    """
+    try:
+        handoff = _human_handoff_reply(user_message)
+        if handoff:
+            return handoff
+
+        config_version = config_fingerprint(BUSINESS_CONFIG)
+        use_cache = settings.RESPONSE_CACHE_ENABLED and not history
+        if use_cache:
+            cached = await response_cache.get(user_message, config_version)
+            if cached is not None:
+                logger.info(f"🤖 IA (caché) respondió: {cached}")
+                if on_delta:
+                    await on_delta(cached)
+                return cached
+
+        started = time.perf_counter()
+        response = await async_client.chat.completions.create(
+            model="gpt-3.5-turbo",
+            messages=_build_messages(user_message, history),
             max_tokens=200,
-            temperature=0.7
+            temperature=0.7,
+            stream=on_delta is not None
         )
-        
-        ai_message = response.choices[0].message.content
+
+        if on_delta:
+            parts = []
+            async for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    await on_delta(delta)
+            ai_message = "".join(parts)
+        else:
+            ai_message = response.choices[0].message.content
+
         logger.info(f"🤖 IA (personalizada) respondió: {ai_message}")
+        if use_cache:
+            latency_ms = (time.perf_counter() - started) * 1000
+            await response_cache.set(user_message, ai_message, config_version, latency_ms)
         return ai_message
-        
+
     except Exception as e:
         logger.error(f"❌ Error con OpenAI: {str(e)}")
-        return ("Lo siento, estoy teniendo problemas para procesar tu mensaje. "
-                f"Por favor llama a {BUSINESS_CONFIG['phone']} o escribe a "
-                f"{BUSINESS_CONFIG['email']} para atención personalizada.")
\ No newline at end of file
+        return _fallback_reply()
@@ -0,0 +1,243 @@
+"""
+Analítica operativa por hora: latencia de primera respuesta del bot, latencia
+de toma de control humana, tasa de derivación y volumen por canal.
+
+Las latencias se registran en el momento en que ocurren (pipeline y endpoints
+de agentes) como histogramas de buckets fijos, y los eventos como contadores.
+Para no tocar la BD en el camino de escritura se acumulan en un hash de Redis
+por hora; refresh_stats_rollups los vuelca en stats_hourly, donde se leen
+igual que el resto de estadísticas. Los percentiles se calculan a partir de
+los histogramas sumados, en tiempo proporcional al número de horas.
+
+Cada volcado lleva un ID único que se guarda en stats_flushes en la misma
+transacción que el upsert: si el proceso cae entre el commit y el borrado del
+hash en Redis, el siguiente volcado ve el ID y no vuelve a sumar los datos.
+"""
+import logging
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.core.database import upsert
+from app.core.redis import get_redis, get_async_redis
+from app.models.stats import StatsFlush, StatsHourly
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "analytics:pending"
+FLUSHING_KEY = "analytics:flushing"
+FLUSH_ID_FIELD = "flush_id"
+FLUSH_LOCK_KEY = "analytics:flush:lock"
+FLUSH_LOCK_SECONDS = 300
+# Los IDs de volcados aplicados se guardan este tiempo (de sobra para reintentar uno)
+FLUSH_ID_RETENTION = timedelta(days=7)
+TAKEOVER_KEY = "analytics:takeover:{conversation_id}"
+TAKEOVER_TTL_SECONDS = 24 * 3600
+
+BOT_RESPONSE = "bot_response_ms"
+HUMAN_TAKEOVER = "takeover_ms"
+HANDOFFS = "handoffs"
+
+# Límites superiores (ms) de los buckets del histograma; el último es +inf
+LATENCY_BOUNDS_MS = [250, 500, 1000, 2000, 3000, 5000, 10000, 20000, 30000, 60000,
+                     120000, 300000, 600000, 1800000, 3600000]
+
+PERCENTILES = (0.5, 0.9, 0.99)
+
+# Libera el lock solo si sigue siendo nuestro
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def _bucket_label(latency_ms: float) -> str:
+    for bound in LATENCY_BOUNDS_MS:
+        if latency_ms <= bound:
+            return str(bound)
+    return "inf"
+
+def _hour(now: float) -> str:
+    return datetime.fromtimestamp(now - now % 3600, tz=timezone.utc).isoformat()
+
+def _latency_fields(name: str, seconds: float, now: float) -> Dict[str, float]:
+    hour = _hour(now)
+    latency_ms = max(seconds, 0) * 1000
+    return {
+        f"{hour}|{name}:le:{_bucket_label(latency_ms)}": 1,
+        f"{hour}|{name}:count": 1,
+        f"{hour}|{name}:sum": round(latency_ms),
+    }
+
+def _incr_fields(pipe, fields: Dict[str, float]) -> None:
+    for field, amount in fields.items():
+        pipe.hincrby(PENDING_KEY, field, int(amount))
+
+async def record_bot_response(seconds: float) -> None:
+    """Latencia desde el primer mensaje del turno del cliente hasta la respuesta del bot."""
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        _incr_fields(pipe, _latency_fields(BOT_RESPONSE, seconds, time.time()))
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo registrar la latencia del bot: {e}")
+
+async def record_handoff_async(conversation_id: int) -> None:
+    """El cliente pidió un humano: cuenta la derivación y arranca el reloj de toma de control."""
+    now = time.time()
+    try:
+        pipe = get_async_redis().pipeline(transaction=False)
+        pipe.hincrby(PENDING_KEY, f"{_hour(now)}|{HANDOFFS}", 1)
+        pipe.set(TAKEOVER_KEY.format(conversation_id=conversation_id), now, ex=TAKEOVER_TTL_SECONDS, nx=True)
+        await pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo registrar la derivación: {e}")
+
+def record_handoff(conversation_id: int) -> None:
+    """Un agente tomó el control (take_control): igual que record_handoff_async."""
+    now = time.time()
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.hincrby(PENDING_KEY, f"{_hour(now)}|{HANDOFFS}", 1)
+        pipe.set(TAKEOVER_KEY.format(conversation_id=conversation_id), now, ex=TAKEOVER_TTL_SECONDS, nx=True)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo registrar la derivación: {e}")
+
+def record_agent_message(conversation_id: int) -> None:
+    """Primer mensaje de un agente tras la derivación: registra la latencia de toma de control."""
+    redis = get_redis()
+    try:
+        started = redis.getdel(TAKEOVER_KEY.format(conversation_id=conversation_id))
+        if started is None:
+            return
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        _incr_fields(pipe, _latency_fields(HUMAN_TAKEOVER, now - float(started), now))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo registrar la toma de control: {e}")
+
+def flush_pending(db: Session) -> int:
+    """
+    Vuelca los contadores acumulados en Redis a stats_hourly. Si un volcado
+    anterior falló, su hash (FLUSHING_KEY) se procesa primero. Un lock en Redis
+    evita que dos volcados corran a la vez.
+    """
+    redis = get_redis()
+    token = uuid.uuid4().hex
+    if not redis.set(FLUSH_LOCK_KEY, token, nx=True, ex=FLUSH_LOCK_SECONDS):
+        logger.info("⏭️ Otro proceso está volcando la analítica")
+        return 0
+    try:
+        if not redis.exists(FLUSHING_KEY):
+            if not redis.exists(PENDING_KEY):
+                return 0
+            # El ID del volcado viaja en el propio hash
+            pipe = redis.pipeline(transaction=True)
+            pipe.rename(PENDING_KEY, FLUSHING_KEY)
+            pipe.hset(FLUSHING_KEY, FLUSH_ID_FIELD, token)
+            pipe.execute()
+
+        fields = redis.hgetall(FLUSHING_KEY)
+        flush_id = fields.pop(FLUSH_ID_FIELD, None) or token
+        rows = []
+        for field, value in fields.items():
+            hour, metric = field.split("|", 1)
+            rows.append({"bucket_start": datetime.fromisoformat(hour), "metric": metric, "value": int(value)})
+
+        claimed = db.execute(
+            upsert(db, StatsFlush).values(flush_id=flush_id)
+            .on_conflict_do_nothing(index_elements=[StatsFlush.flush_id])
+            .returning(StatsFlush.flush_id)
+        ).scalar()
+        if claimed is None:
+            # Ya se aplicó (el proceso cayó antes de borrar el hash)
+            logger.warning(f"⚠️ Volcado de analítica {flush_id} ya aplicado: se descarta")
+            rows = []
+        elif rows:
+            stmt = upsert(db, StatsHourly).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[StatsHourly.bucket_start, StatsHourly.metric],
+                set_={"value": StatsHourly.value + stmt.excluded.value}
+            )
+            db.execute(stmt)
+        db.execute(delete(StatsFlush).where(StatsFlush.flushed_at < datetime.now(timezone.utc) - FLUSH_ID_RETENTION))
+        db.commit()
+        redis.delete(FLUSHING_KEY)
+        return len(rows)
+    finally:
+        redis.eval(_RELEASE_LOCK, 1, FLUSH_LOCK_KEY, token)
+
+def _percentile(histogram: Dict[str, int], q: float) -> Optional[float]:
+    """Percentil (ms) interpolado linealmente dentro del bucket, como en Prometheus."""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = q * total
+    cumulative = 0
+    lower = 0
+    for bound in LATENCY_BOUNDS_MS:
+        count = histogram.get(str(bound), 0)
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    # Cae en el bucket +inf: el mejor dato es el último límite
+    return float(LATENCY_BOUNDS_MS[-1])
+
+def _latency_summary(values: Dict[str, int], name: str) -> Dict[str, Optional[float]]:
+    prefix = f"{name}:le:"
+    histogram = {metric[len(prefix):]: value for metric, value in values.items() if metric.startswith(prefix)}
+    count = values.get(f"{name}:count", 0)
+    summary = {"count": count, "avg": values.get(f"{name}:sum", 0) / count if count else None}
+    for q in PERCENTILES:
+        summary[f"p{int(q * 100)}"] = _percentile(histogram, q)
+    return summary
+
+def _summarize(values: Dict[str, int]) -> Dict:
+    conversations = values.get("conversations_created", 0)
+    return {
+        "bot_response_ms": _latency_summary(values, BOT_RESPONSE),
+        "takeover_ms": _latency_summary(values, HUMAN_TAKEOVER),
+        "handoffs": values.get(HANDOFFS, 0),
+        "conversations_created": conversations,
+        "handoff_rate": values.get(HANDOFFS, 0) / conversations if conversations else None,
+        "messages_by_channel": {
+            metric[len("messages_channel_"):]: value
+            for metric, value in values.items() if metric.startswith("messages_channel_")
+        },
+    }
+
+def analytics_series(db: Session, start: datetime, end: datetime, granularity: str = "hour") -> Dict:
+    """
+    Serie de analítica (por hora o por día) en [start, end) y el resumen del
+    rango completo. Una sola consulta sobre stats_hourly.
+    """
+    rows = db.execute(
+        select(StatsHourly.bucket_start, StatsHourly.metric, StatsHourly.value)
+        .where(
+            StatsHourly.bucket_start >= start,
+            StatsHourly.bucket_start < end,
+            # Los mensajes por emisor ya están en /stats
+            StatsHourly.metric.notin_(["messages_customer", "messages_bot", "messages_human"])
+        )
+    ).all()
+
+    buckets: Dict[datetime, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+    overall: Dict[str, int] = defaultdict(int)
+    for bucket_start, metric, value in rows:
+        if granularity == "day":
+            bucket_start = bucket_start.replace(hour=0, minute=0, second=0, microsecond=0)
+        buckets[bucket_start][metric] += value
+        overall[metric] += value
+
+    return {
+        "granularity": granularity,
+        "summary": _summarize(overall),
+        "points": [{"bucket": bucket, **_summarize(values)} for bucket, values in sorted(buckets.items())],
+    }
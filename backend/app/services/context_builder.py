@@ -0,0 +1,106 @@
+import json
+import logging
+from functools import lru_cache
+from typing import List
+import tiktoken
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.redis import get_redis, get_async_redis
+from app.models.message import Message, SenderType
+
+logger = logging.getLogger(__name__)
+
+# Rol de OpenAI para cada tipo de emisor (los agentes humanos hablan "como" el asistente)
+ROLES = {
+    SenderType.CUSTOMER: "user",
+    SenderType.BOT: "assistant",
+    SenderType.HUMAN: "assistant",
+}
+
+def _cache_key(conversation_id: int) -> str:
+    return f"context:{conversation_id}"
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # Sin el archivo BPE (p. ej. sin red) usamos una estimación
+        logger.warning(f"⚠️ No se pudo cargar el tokenizador, se estimarán tokens: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+def trim_to_budget(history: List[dict], budget: int) -> List[dict]:
+    """Conserva los mensajes más recientes que quepan en el presupuesto de tokens."""
+    kept, used = [], 0
+    for message in reversed(history):
+        # ~4 tokens de formato por mensaje en la API de chat
+        tokens = count_tokens(message["content"]) + 4
+        if used + tokens > budget:
+            break
+        kept.append(message)
+        used += tokens
+    return list(reversed(kept))
+
+async def _load_from_db(db: AsyncSession, conversation_id: int) -> List[dict]:
+    messages = (await db.execute(
+        select(Message.sender, Message.content)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(settings.LLM_CONTEXT_MAX_MESSAGES)
+    )).all()
+    return [{"role": ROLES[sender], "content": content} for sender, content in reversed(messages)]
+
+async def get_recent_messages(db: AsyncSession, conversation_id: int) -> List[dict]:
+    """
+    Últimos LLM_CONTEXT_MAX_MESSAGES mensajes de la conversación en formato
+    OpenAI. Se leen de la caché en Redis y solo se consulta la BD si no existe.
+    """
+    redis = get_async_redis()
+    key = _cache_key(conversation_id)
+    cached = await redis.lrange(key, 0, -1)
+    if cached:
+        return [json.loads(item) for item in cached]
+
+    history = await _load_from_db(db, conversation_id)
+    if history:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.rpush(key, *(json.dumps(item) for item in history))
+            pipe.expire(key, settings.LLM_CONTEXT_CACHE_TTL_SECONDS)
+            await pipe.execute()
+    return history
+
+async def build_history(db: AsyncSession, conversation_id: int) -> List[dict]:
+    """
+    Historial previo al turno actual, recortado al presupuesto de tokens.
+    Los mensajes del cliente al final de la lista son el turno en curso (se
+    envían aparte como mensaje del usuario), así que se excluyen.
+    """
+    history = await get_recent_messages(db, conversation_id)
+    while history and history[-1]["role"] == "user":
+        history.pop()
+    return trim_to_budget(history, settings.LLM_CONTEXT_TOKEN_BUDGET)
+
+async def remember_message(conversation_id: int, sender: SenderType, content: str) -> None:
+    """
+    Agrega un mensaje ya guardado en BD a la caché. Si la caché no existe no
+    hace nada (RPUSHX): se cargará completa desde la BD cuando haga falta.
+    """
+    redis = get_async_redis()
+    key = _cache_key(conversation_id)
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.rpushx(key, json.dumps({"role": ROLES[sender], "content": content}))
+        pipe.ltrim(key, -settings.LLM_CONTEXT_MAX_MESSAGES, -1)
+        pipe.expire(key, settings.LLM_CONTEXT_CACHE_TTL_SECONDS)
+        await pipe.execute()
+
+def forget_conversation(conversation_id: int) -> None:
+    """Descarta la caché (desde código síncrono, p. ej. endpoints de la API)."""
+    get_redis().delete(_cache_key(conversation_id))
@@ -0,0 +1,62 @@
+import logging
+import time
+from typing import Callable, Dict, List
+from app.core.config import settings
+from app.core.redis import get_redis, get_async_redis
+
+logger = logging.getLogger(__name__)
+
+# Sorted set: miembro = ID de conversación, score = instante (epoch) en que vence por inactividad
+EXPIRY_KEY = "expiry:conversations"
+
+# Saca atómicamente los vencidos, para que dos schedulers no cierren la misma conversación
+_POP_DUE = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #ids > 0 then
+    -- unpack es global en Lua 5.1 (Redis) y table.unpack en 5.2+
+    redis.call('ZREM', KEYS[1], (unpack or table.unpack)(ids))
+end
+return ids
+"""
+
+def _deadline(now: float) -> float:
+    return now + settings.INACTIVITY_TIMEOUT_MINUTES * 60
+
+def schedule_expiry(conversation_id: int, clock: Callable[[], float] = time.time) -> None:
+    """
+    (Re)programa el cierre por inactividad tras actividad en la conversación.
+    Si Redis falla no se interrumpe nada: el barrido periódico la cerrará.
+    """
+    try:
+        get_redis().zadd(EXPIRY_KEY, {str(conversation_id): _deadline(clock())})
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo programar el cierre de la conversación {conversation_id}: {e}")
+
+async def schedule_expiry_async(conversation_id: int, clock: Callable[[], float] = time.time) -> None:
+    try:
+        await get_async_redis().zadd(EXPIRY_KEY, {str(conversation_id): _deadline(clock())})
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo programar el cierre de la conversación {conversation_id}: {e}")
+
+def cancel_expiry(conversation_id: int) -> None:
+    try:
+        get_redis().zrem(EXPIRY_KEY, str(conversation_id))
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo cancelar el cierre de la conversación {conversation_id}: {e}")
+
+async def pop_due(now: float, limit: int) -> List[int]:
+    ids = await get_async_redis().eval(_POP_DUE, 1, EXPIRY_KEY, now, limit)
+    return [int(conversation_id) for conversation_id in ids]
+
+async def retry_later(deadlines: Dict[int, float]) -> None:
+    """
+    Reprograma cada conversación en su vencimiento (epoch) sin adelantar
+    vencimientos posteriores ya existentes (ZADD GT).
+    """
+    if deadlines:
+        await get_async_redis().zadd(EXPIRY_KEY, {str(cid): when for cid, when in deadlines.items()}, gt=True)
+
+async def next_deadline() -> float:
+    """Instante del próximo vencimiento, o infinito si no hay ninguno."""
+    first = await get_async_redis().zrange(EXPIRY_KEY, 0, 0, withscores=True)
+    return first[0][1] if first else float("inf")
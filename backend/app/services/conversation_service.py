@@ -0,0 +1,67 @@
+import logging
+from typing import Optional
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+from app.models.conversation import Conversation
+from app.models.message import DeliveryStatus, Message, SenderType
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_LENGTH = 200
+
+def append_message(
+    db: Session,
+    conversation: Conversation,
+    sender: SenderType,
+    content: str,
+    intent_detected: Optional[str] = None,
+    outbound: bool = False,
+    mark_read: bool = False
+) -> Message:
+    """
+    Agrega un mensaje a la conversación y actualiza el resumen desnormalizado
+    (último mensaje, contadores) en la misma transacción.
+
+    Los contadores se actualizan con expresiones SQL (col = col + 1) para que
+    sean atómicos aunque varios procesos escriban a la vez. No hace commit.
+
+    Con outbound=True el mensaje queda pendiente de entrega por WhatsApp; tras
+    el commit hay que llamar a outbound.enqueue_delivery(message.id).
+
+    Con mark_read=True (un agente respondió) se reinician los no leídos.
+    """
+    message = Message(
+        conversation_id=conversation.id,
+        sender=sender,
+        content=content,
+        intent_detected=intent_detected,
+        delivery_status=DeliveryStatus.QUEUED if outbound else None
+    )
+    db.add(message)
+
+    conversation.last_message_preview = content[:PREVIEW_LENGTH]
+    conversation.last_message_at = func.now()
+    conversation.message_count = Conversation.message_count + 1
+    if sender == SenderType.CUSTOMER:
+        conversation.unread_count = Conversation.unread_count + 1
+    elif mark_read:
+        conversation.unread_count = 0
+    conversation.updated_at = func.now()
+    return message
+
+def mark_as_read(db: Session, conversation: Conversation) -> None:
+    """
+    Reinicia el contador de no leídos (no hace commit). Leer no es actividad:
+    updated_at y last_activity_at se fijan a su valor actual para que no los
+    toque su onupdate.
+    """
+    db.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation.id)
+        .values(
+            unread_count=0,
+            updated_at=Conversation.updated_at,
+            last_activity_at=Conversation.last_activity_at
+        )
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,138 @@
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from app.services.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Palabras clave por intención (ya normalizadas: minúsculas y sin acentos)
+INTENT_KEYWORDS: Dict[str, List[str]] = {
+    "handoff": ["humano", "agente", "persona", "hablar con alguien", "representante",
+                "asesor", "queja", "reclamo"],
+    "hours": ["horario", "horarios", "a que hora", "que horas", "abren", "cierran",
+              "abierto", "abiertos", "atienden"],
+    # Sin verbos sueltos ("enviar", "llega"): aparecen igual en quejas y en otros temas
+    "shipping": ["envio", "envios", "envian", "entrega", "entregas", "domicilio", "delivery"],
+    # "cambio"/"cambiar" solos son ambiguos ("cambio de aceite"): solo en frases de producto
+    "returns": ["devolucion", "devoluciones", "devolver", "reembolso", "cambio de producto",
+                "cambiar un producto", "cambiar el producto", "cambiar mi pedido", "cambio de talla",
+                "cambiar la talla"],
+    "warranty": ["garantia", "garantias"],
+    "payment": ["pago", "pagos", "pagar", "tarjeta", "efectivo", "transferencia",
+                "contra entrega", "metodos de pago", "formas de pago"],
+    "contact": ["telefono", "correo", "email", "contacto", "pagina web", "sitio web"],
+}
+
+# Respuestas para las intenciones que se contestan sin la IA (campos de BUSINESS_CONFIG)
+INTENT_TEMPLATES: Dict[str, str] = {
+    "hours": "Nuestro horario es {hours}. ¿Necesitas ayuda con algo más?",
+    "shipping": "{shipping}. ¿Te puedo ayudar con algo más?",
+    "returns": "Tenemos {returns_policy}. ¿Necesitas ayuda con algo más?",
+    "warranty": "Todos nuestros productos tienen {warranty}. ¿Te puedo ayudar con algo más?",
+    "payment": "Aceptamos: {payment_methods}. ¿Necesitas ayuda con algo más?",
+    "contact": "Puedes llamarnos al {phone}, escribir a {email} o visitar {website}. ¿Te ayudo con algo más?",
+}
+
+# Solo se responde con plantilla si el mensaje es corto y trata un único tema
+FAQ_MAX_WORDS = 12
+# Palabras de queja o de un caso concreto ("no me llega", "todavía no"): la
+# política general no responde a eso, mejor la IA
+NOT_FAQ_WORDS = {"no", "nunca", "todavia", "aun", "ya", "problema", "mal", "roto", "danado", "tarde"}
+
+class AhoCorasick:
+    """Autómata Aho-Corasick: encuentra todas las palabras clave en una sola pasada."""
+
+    def __init__(self, patterns: List[Tuple[str, str]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        for pattern, label in patterns:
+            self._add(pattern, label)
+        self._build()
+
+    def _add(self, pattern: str, label: str) -> None:
+        state = 0
+        for ch in pattern:
+            if ch not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][ch] = len(self._goto) - 1
+            state = self._goto[state][ch]
+        self._output[state].append((pattern, label))
+
+    def _build(self) -> None:
+        # BFS desde los hijos de la raíz (su enlace de fallo es la raíz)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, child in self._goto[state].items():
+                queue.append(child)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def search(self, text: str):
+        """Genera (inicio, fin, patrón, etiqueta) por cada coincidencia."""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pattern, label in self._output[state]:
+                yield i - len(pattern) + 1, i + 1, pattern, label
+
+@dataclass
+class Intent:
+    name: Optional[str]
+    scores: Dict[str, int]
+    answerable: bool = False
+
+_automaton = AhoCorasick([
+    (keyword, intent) for intent, keywords in INTENT_KEYWORDS.items() for keyword in keywords
+])
+
+def classify(message: str) -> Intent:
+    """
+    Clasifica el mensaje por intención. Cuenta las palabras clave completas
+    de cada intención; la derivación a humano tiene prioridad sobre el resto.
+    Si varias se solapan solo cuenta la más larga ("contra entrega" es pago,
+    no también envío por "entrega").
+    """
+    text = normalize_text(message)
+    # Solo palabras completas ("hora" no debe coincidir dentro de "ahora")
+    matches = [
+        (start, end, intent) for start, end, _, intent in _automaton.search(text)
+        if (start == 0 or text[start - 1] == " ") and (end == len(text) or text[end] == " ")
+    ]
+    scores: Dict[str, int] = {}
+    covered = 0
+    for start, end, intent in sorted(matches, key=lambda m: (m[0], m[0] - m[1])):
+        if start < covered:
+            continue
+        covered = end
+        scores[intent] = scores.get(intent, 0) + 1
+
+    if not scores:
+        return Intent(name=None, scores=scores)
+    if "handoff" in scores:
+        return Intent(name="handoff", scores=scores)
+
+    name = max(scores, key=scores.get)
+    words = text.split()
+    answerable = (
+        len(scores) == 1
+        and name in INTENT_TEMPLATES
+        and len(words) <= FAQ_MAX_WORDS
+        and NOT_FAQ_WORDS.isdisjoint(words)
+    )
+    return Intent(name=name, scores=scores, answerable=answerable)
+
+def templated_answer(intent: Intent, business_config: dict) -> Optional[str]:
+    """Respuesta directa desde la configuración del negocio, o None si hay que usar la IA."""
+    if not intent.answerable:
+        return None
+    return INTENT_TEMPLATES[intent.name].format(**business_config)
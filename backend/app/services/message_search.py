@@ -0,0 +1,90 @@
+"""
+Búsqueda de texto completo en el historial de mensajes.
+
+En Postgres usa el índice GIN sobre to_tsvector('es_unaccent', content): la
+configuración es_unaccent es la española (stemming) más unaccent, así que
+"garantia" encuentra "garantía"; se crea en la migración d4f8b2a6c913. En
+SQLite (desarrollo local y pruebas) usa la tabla FTS5 messages_fts, que se
+crea con la tabla messages (ver SQLITE_FTS_DDL en app/models/message.py).
+
+Los resultados van del más reciente al más antiguo y se paginan por
+(created_at, id).
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import column, desc, func, literal_column, select, table, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import async_engine
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.models.message import Message, SenderType
+
+TS_CONFIG = literal_column("'es_unaccent'::regconfig")
+HIGHLIGHT_START = "«"
+HIGHLIGHT_STOP = "»"
+
+# Tabla FTS5 de SQLite (contenido externo: rowid = messages.id)
+messages_fts = table("messages_fts", column("rowid"))
+
+def _fts5_query(text: str) -> str:
+    """Convierte el texto del usuario en una consulta FTS5 de términos literales (AND implícito)."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+def _match_postgres(query: str):
+    tsquery = func.websearch_to_tsquery(TS_CONFIG, query)
+    condition = func.to_tsvector(TS_CONFIG, Message.content).op("@@")(tsquery)
+    snippet = func.ts_headline(
+        TS_CONFIG, Message.content, tsquery,
+        f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxWords=30, MinWords=10"
+    )
+    return condition, snippet
+
+def _match_sqlite(query: str):
+    fts = literal_column("messages_fts")
+    condition = fts.op("MATCH")(_fts5_query(query))
+    snippet = func.snippet(fts, 0, HIGHLIGHT_START, HIGHLIGHT_STOP, "…", 16)
+    return condition, snippet
+
+async def search_messages(
+    db: AsyncSession,
+    query: str,
+    status: Optional[ConversationStatus] = None,
+    sender: Optional[SenderType] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    limit: int = 20
+) -> List:
+    """Mensajes que coinciden con la búsqueda, con un fragmento resaltado."""
+    is_sqlite = async_engine.dialect.name == "sqlite"
+    condition, snippet = _match_sqlite(query) if is_sqlite else _match_postgres(query)
+
+    stmt = (
+        select(
+            Message.id,
+            Message.conversation_id,
+            Message.sender,
+            Message.created_at,
+            snippet.label("snippet"),
+            Conversation.status.label("conversation_status"),
+            Customer.phone_number.label("customer_phone"),
+        )
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .outerjoin(Customer, Customer.id == Conversation.customer_id)
+        .where(condition)
+    )
+    if is_sqlite:
+        stmt = stmt.join(messages_fts, messages_fts.c.rowid == Message.id)
+    if status:
+        stmt = stmt.where(Conversation.status == status)
+    if sender:
+        stmt = stmt.where(Message.sender == sender)
+    if date_from:
+        stmt = stmt.where(Message.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Message.created_at < date_to)
+    if cursor:
+        stmt = stmt.where(tuple_(Message.created_at, Message.id) < tuple_(*cursor))
+
+    stmt = stmt.order_by(desc(Message.created_at), desc(Message.id)).limit(limit)
+    return (await db.execute(stmt)).all()
@@ -0,0 +1,62 @@
+import logging
+import time
+import uuid
+from app.core import event_bus
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+async def _publish(event_type: str, conversation_id: int, data: dict) -> None:
+    try:
+        await event_bus.publish_async(event_type, conversation_id, data)
+    except Exception as e:
+        # Las notificaciones son best-effort: el mensaje ya está en BD
+        logger.warning(f"⚠️ No se pudo publicar el evento {event_type}: {e}")
+
+def _publish_sync(event_type: str, conversation_id: int, data: dict) -> None:
+    try:
+        event_bus.publish(event_type, conversation_id, data)
+    except Exception as e:
+        logger.warning(f"⚠️ No se pudo publicar el evento {event_type}: {e}")
+
+def notify_new_message_sync(conversation_id: int, message_data: dict) -> None:
+    """Igual que notify_new_message, para endpoints y tareas síncronas."""
+    _publish_sync(event_bus.NEW_MESSAGE, conversation_id, message_data)
+
+def notify_status_change_sync(conversation_id: int, status: str) -> None:
+    _publish_sync(event_bus.STATUS_CHANGE, conversation_id, {"status": status})
+
+def notify_status_change_batch_sync(conversation_ids: list, status: str) -> None:
+    """Un solo evento para un lote de conversaciones con el mismo cambio de estado."""
+    _publish_sync(event_bus.STATUS_CHANGE_BATCH, 0, {"status": status, "conversation_ids": conversation_ids})
+
+async def notify_new_message(conversation_id: int, message_data: dict) -> None:
+    await _publish(event_bus.NEW_MESSAGE, conversation_id, message_data)
+
+async def notify_status_change_batch(conversation_ids: list, status: str) -> None:
+    await _publish(event_bus.STATUS_CHANGE_BATCH, 0, {"status": status, "conversation_ids": conversation_ids})
+
+class MessageStream:
+    """
+    Publica los fragmentos de una respuesta en streaming, agrupados cada
+    STREAM_FLUSH_INTERVAL_MS para no generar un evento por token.
+    """
+
+    def __init__(self, conversation_id: int):
+        self.conversation_id = conversation_id
+        self.stream_id = uuid.uuid4().hex
+        self._buffer = ""
+        self._last_flush = time.monotonic()
+
+    async def push(self, delta: str) -> None:
+        self._buffer += delta
+        if (time.monotonic() - self._last_flush) * 1000 >= settings.STREAM_FLUSH_INTERVAL_MS:
+            await self.flush()
+
+    async def flush(self, done: bool = False) -> None:
+        if not self._buffer and not done:
+            return
+        payload = {"stream_id": self.stream_id, "delta": self._buffer, "done": done}
+        self._buffer = ""
+        self._last_flush = time.monotonic()
+        await _publish(event_bus.MESSAGE_DELTA, self.conversation_id, payload)
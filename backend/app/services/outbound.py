@@ -0,0 +1,216 @@
+"""
+Entrega saliente de mensajes por WhatsApp.
+
+Los mensajes salientes se guardan con delivery_status=QUEUED (ver
+conversation_service.append_message) y se encolan en la cola "outbound" de
+Celery. La tarea llama a deliver(), que:
+
+- es idempotente por ID de mensaje: solo envía si sigue en QUEUED y nadie más
+  lo está enviando (lock en Redis),
+- respeta un token bucket por número emisor compartido por todos los workers,
+- respeta el orden de la conversación: no envía un mensaje mientras haya
+  uno anterior de la misma conversación pendiente (espera con backoff y
+  reencola el anterior si su tarea se perdió),
+- reintenta con backoff exponencial los 429, 5xx y errores de red; si el
+  error llegó después de enviar la petición (p. ej. ReadTimeout) primero
+  consulta en Twilio si el mensaje se aceptó, para no enviarlo dos veces, y
+- deja el estado final (SENT/FAILED) y el SID de Twilio en el mensaje.
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_async_redis
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.message import DeliveryStatus, Message
+from app.services.twilio_service import find_sent_message_async, send_whatsapp_message_async
+from app.worker import celery_app
+
+logger = logging.getLogger(__name__)
+
+DELIVER_TASK = "app.workers.tasks.deliver_outbound_message"
+LOCK_SECONDS = 60
+SENT_MARKER_SECONDS = 24 * 3600
+# Espera mientras un mensaje anterior de la conversación sigue pendiente
+ORDER_WAIT_SECONDS = 1.0
+# Como mucho un reencolado del mensaje que bloquea por este intervalo
+NUDGE_SECONDS = 60
+# Margen al buscar en Twilio un envío de estado desconocido (relojes distintos)
+RECONCILE_CLOCK_SKEW = timedelta(minutes=2)
+
+# Token bucket con el reloj de Redis para que todos los workers compartan el ritmo.
+# Devuelve 0 si se concede el envío, o los segundos a esperar por el siguiente token.
+_TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+def enqueue_delivery(message_id: int) -> None:
+    """Encola la entrega de un mensaje ya guardado (y con commit) en estado QUEUED."""
+    celery_app.send_task(DELIVER_TASK, args=[message_id])
+
+async def take_token(sender: str) -> float:
+    """Pide un token del bucket del número emisor; devuelve la espera necesaria (0 = enviar ya)."""
+    wait = await get_async_redis().eval(
+        _TAKE_TOKEN, 1, f"outbound:bucket:{sender}",
+        settings.OUTBOUND_RATE_PER_SECOND, settings.OUTBOUND_BURST
+    )
+    return float(wait)
+
+def backoff_seconds(attempts: int, retry_after: Optional[float] = None) -> float:
+    """Backoff exponencial con jitter; nunca antes de lo que pida Twilio (Retry-After)."""
+    delay = min(settings.OUTBOUND_BACKOFF_MAX_SECONDS, settings.OUTBOUND_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    delay = random.uniform(delay / 2, delay)
+    return max(delay, retry_after or 0)
+
+async def _wait_for_earlier(message_id: int, blocking_id: int) -> float:
+    """
+    Espera (con backoff exponencial) a que salga el mensaje anterior de la
+    conversación. Si nadie lo está enviando, su tarea pudo perderse: se vuelve
+    a encolar en lugar de esperar a requeue_stale_deliveries.
+    """
+    redis = get_async_redis()
+    wait_key = f"outbound:order_wait:{message_id}"
+    waits = await redis.incr(wait_key)
+    await redis.expire(wait_key, SENT_MARKER_SECONDS)
+    if not await redis.exists(f"outbound:lock:{blocking_id}") and \
+            await redis.set(f"outbound:nudge:{blocking_id}", "1", nx=True, ex=NUDGE_SECONDS):
+        await asyncio.to_thread(enqueue_delivery, blocking_id)
+    return min(ORDER_WAIT_SECONDS * 2 ** (waits - 1), settings.OUTBOUND_BACKOFF_MAX_SECONDS)
+
+async def deliver(message_id: int) -> Optional[float]:
+    """
+    Intenta entregar un mensaje. Devuelve los segundos a esperar antes de
+    reintentar, o None si ya no hay nada que hacer (enviado, fallido, o en
+    manos de otro worker).
+    """
+    redis = get_async_redis()
+    sent_key = f"outbound:sent:{message_id}"
+    lock_key = f"outbound:lock:{message_id}"
+    ambiguous_key = f"outbound:ambiguous:{message_id}"
+    if not await redis.set(lock_key, "1", nx=True, ex=LOCK_SECONDS):
+        return None
+
+    try:
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(
+                select(Message, Customer.phone_number)
+                .join(Conversation, Conversation.id == Message.conversation_id)
+                .outerjoin(Customer, Customer.id == Conversation.customer_id)
+                .where(Message.id == message_id)
+            )).first()
+            if not row:
+                return None
+            message, to = row
+            if message.delivery_status != DeliveryStatus.QUEUED:
+                return None
+
+            # Enviado pero sin llegar a guardarse (p. ej. caída tras el envío)
+            sid = await redis.get(sent_key)
+            if sid:
+                message.delivery_status = DeliveryStatus.SENT
+                message.twilio_sid = sid
+                await db.commit()
+                return None
+
+            if not to:
+                message.delivery_status = DeliveryStatus.FAILED
+                message.delivery_error = "Cliente sin número de teléfono"
+                await db.commit()
+                return None
+
+            # El intento anterior acabó sin respuesta de Twilio: comprobar antes de reenviar
+            sent_since = await redis.get(ambiguous_key)
+            if sent_since:
+                since = datetime.fromtimestamp(float(sent_since), tz=timezone.utc) - RECONCILE_CLOCK_SKEW
+                found = await find_sent_message_async(to, message.content, since)
+                if "error" in found:
+                    return backoff_seconds(message.delivery_attempts)
+                if found["sid"]:
+                    await redis.set(sent_key, found["sid"], ex=SENT_MARKER_SECONDS)
+                    await redis.delete(ambiguous_key)
+                    message.delivery_status = DeliveryStatus.SENT
+                    message.twilio_sid = found["sid"]
+                    message.delivery_error = None
+                    await db.commit()
+                    logger.info(f"✅ Mensaje {message_id} ya aceptado por Twilio (SID {found['sid']})")
+                    return None
+                await redis.delete(ambiguous_key)
+                if message.delivery_attempts >= settings.OUTBOUND_MAX_ATTEMPTS:
+                    message.delivery_status = DeliveryStatus.FAILED
+                    await db.commit()
+                    logger.error(f"❌ Entrega del mensaje {message_id} fallida definitivamente: {message.delivery_error}")
+                    return None
+
+            # Orden de la conversación: primero los anteriores que siguen pendientes
+            blocking_id = (await db.execute(
+                select(Message.id)
+                .where(
+                    Message.conversation_id == message.conversation_id,
+                    Message.id < message.id,
+                    Message.delivery_status == DeliveryStatus.QUEUED
+                )
+                .order_by(Message.id)
+                .limit(1)
+            )).scalar()
+            if blocking_id is not None:
+                return await _wait_for_earlier(message_id, blocking_id)
+            await redis.delete(f"outbound:order_wait:{message_id}")
+
+            wait = await take_token(settings.TWILIO_WHATSAPP_NUMBER)
+            if wait > 0:
+                # Esperar turno no cuenta como intento
+                return wait
+
+            message.delivery_attempts += 1
+            sent_at = time.time()
+            result = await send_whatsapp_message_async(to, message.content)
+            if result.get("success"):
+                await redis.set(sent_key, result["sid"], ex=SENT_MARKER_SECONDS)
+                message.delivery_status = DeliveryStatus.SENT
+                message.twilio_sid = result["sid"]
+                message.delivery_error = None
+                await db.commit()
+                return None
+
+            message.delivery_error = (result.get("message") or result.get("error") or "")[:255]
+            if result.get("ambiguous"):
+                # Siempre se reintenta: el siguiente intento decide si hace falta reenviar
+                await redis.set(ambiguous_key, sent_at, ex=SENT_MARKER_SECONDS)
+                retry_in = backoff_seconds(message.delivery_attempts)
+                await db.commit()
+                logger.warning(f"⚠️ Estado del envío del mensaje {message_id} desconocido, se comprobará en {retry_in:.1f}s")
+                return retry_in
+            if result.get("retryable") and message.delivery_attempts < settings.OUTBOUND_MAX_ATTEMPTS:
+                retry_in = backoff_seconds(message.delivery_attempts, result.get("retry_after"))
+                await db.commit()
+                logger.warning(f"⚠️ Envío del mensaje {message_id} fallido (intento {message.delivery_attempts}), reintento en {retry_in:.1f}s")
+                return retry_in
+
+            message.delivery_status = DeliveryStatus.FAILED
+            await db.commit()
+            logger.error(f"❌ Entrega del mensaje {message_id} fallida definitivamente: {message.delivery_error}")
+            return None
+    finally:
+        await redis.delete(lock_key)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.core import metrics
+from app.core.config import settings
+from app.core.redis import get_async_redis
+from app.services.text_utils import normalize_text, char_ngrams, jaccard
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """
+    Caché de respuestas de la IA para preguntas repetidas.
+
+    - Nivel exacto: texto normalizado (sin acentos ni puntuación), en memoria
+      del proceso o en Redis (RESPONSE_CACHE_BACKEND).
+    - Nivel por similitud (opcional): trigramas de caracteres con Jaccard
+      >= RESPONSE_CACHE_SIMILARITY_THRESHOLD, sobre las entradas locales.
+
+    Las claves incluyen una huella de la configuración del negocio, así que
+    cambiar BUSINESS_CONFIG invalida la caché automáticamente.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: int, similarity_threshold: float, backend: str = "memory"):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.backend = backend
+        # clave normalizada -> (expira_en, trigramas, respuesta), en orden LRU
+        self._entries: "OrderedDict[str, Tuple[float, set, str]]" = OrderedDict()
+        self._version = ""
+        # Media móvil de la latencia de la IA, para estimar el tiempo ahorrado por acierto
+        self._llm_latency_ms = 0.0
+
+    def _check_version(self, version: str) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def _redis_key(self, normalized: str) -> str:
+        digest = hashlib.sha1(normalized.encode()).hexdigest()
+        return f"response_cache:{self._version}:{digest}"
+
+    def _get_local(self, normalized: str) -> Optional[str]:
+        now = time.monotonic()
+        entry = self._entries.get(normalized)
+        if entry and entry[0] > now:
+            self._entries.move_to_end(normalized)
+            return entry[2]
+        if entry:
+            del self._entries[normalized]
+
+        if self.similarity_threshold > 0:
+            grams = char_ngrams(normalized)
+            best, best_score = None, self.similarity_threshold
+            for key, (expires_at, entry_grams, response) in self._entries.items():
+                if expires_at <= now:
+                    continue
+                score = jaccard(grams, entry_grams)
+                if score >= best_score:
+                    best, best_score = key, score
+            if best is not None:
+                self._entries.move_to_end(best)
+                return self._entries[best][2]
+        return None
+
+    def _set_local(self, normalized: str, response: str) -> None:
+        self._entries[normalized] = (time.monotonic() + self.ttl_seconds, char_ngrams(normalized), response)
+        self._entries.move_to_end(normalized)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, message: str, config_version: str) -> Optional[str]:
+        self._check_version(config_version)
+        normalized = normalize_text(message)
+        response = self._get_local(normalized)
+        if response is None and self.backend == "redis":
+            response = await get_async_redis().get(self._redis_key(normalized))
+            if response is not None:
+                self._set_local(normalized, response)
+
+        if response is None:
+            await metrics.incr_async("response_cache_misses")
+        else:
+            await metrics.incr_async("response_cache_hits")
+            await metrics.incr_async("response_cache_latency_saved_ms", round(self._llm_latency_ms, 1))
+        return response
+
+    async def set(self, message: str, response: str, config_version: str, llm_latency_ms: float) -> None:
+        self._check_version(config_version)
+        self._llm_latency_ms = llm_latency_ms if not self._llm_latency_ms else 0.9 * self._llm_latency_ms + 0.1 * llm_latency_ms
+        normalized = normalize_text(message)
+        self._set_local(normalized, response)
+        if self.backend == "redis":
+            await get_async_redis().set(self._redis_key(normalized), response, ex=self.ttl_seconds)
+
+def config_fingerprint(config: dict) -> str:
+    return hashlib.sha1(json.dumps(config, sort_keys=True, ensure_ascii=False).encode()).hexdigest()[:12]
+
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    backend=settings.RESPONSE_CACHE_BACKEND,
+)
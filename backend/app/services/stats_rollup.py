@@ -0,0 +1,162 @@
+"""
+Estadísticas pre-agregadas por hora (tabla stats_hourly).
+
+Una tarea periódica (refresh_stats_rollups) agrega de forma incremental las
+filas nuevas de messages y conversations: recuerda el último ID agregado de
+cada tabla (stats_rollup_state) y suma los nuevos conteos a su hora con un
+upsert, todo en la misma transacción, así nada se cuenta dos veces.
+
+Solo se agregan filas con más de STATS_ROLLUP_LAG_SECONDS de antigüedad, para
+no saltarse IDs de transacciones que aún no han hecho commit. Los huecos de
+IDs mayores que un tramo (secuencias reservadas y no usadas) se saltan.
+
+En Postgres trunca las horas con date_trunc; en SQLite (desarrollo local y
+pruebas) con strftime.
+
+La analítica de latencias y derivaciones (services/analytics.py) se vuelca
+en la misma tabla.
+
+/stats y las series temporales se leen de aquí, en tiempo proporcional al
+número de horas consultadas y no al de mensajes.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List
+from sqlalchemy import DateTime, String, case, cast, func, literal, select, type_coerce
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import seconds_ago, upsert
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.message import Message
+from app.models.stats import StatsHourly, StatsRollupState
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 50000
+
+# Canal del mensaje según el cliente: WhatsApp (teléfono) o web (sesión)
+_channel = case(
+    (Customer.phone_number.isnot(None), literal("messages_channel_whatsapp")),
+    else_=literal("messages_channel_web")
+)
+_messages_with_customer = (
+    Message.__table__
+    .join(Conversation.__table__, Conversation.id == Message.conversation_id)
+    .outerjoin(Customer.__table__, Customer.id == Conversation.customer_id)
+)
+
+# Origen -> (modelo con el ID de la marca de agua, FROM, columnas de agrupación además de la hora, nombre de la métrica)
+SOURCES = {
+    "messages": (Message, Message.__table__, [Message.sender], literal("messages_").concat(func.lower(cast(Message.sender, String)))),
+    "conversations": (Conversation, Conversation.__table__, [], literal("conversations_created")),
+    "message_channels": (Message, _messages_with_customer, [_channel], _channel),
+}
+
+METRICS = ["conversations_created", "messages_customer", "messages_bot", "messages_human"]
+
+_SQLITE_TRUNC_FORMATS = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
+def _truncate(db: Session, unit: str, column):
+    """Inicio de la hora o el día (UTC) de una fecha, según el dialecto."""
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(func.strftime(_SQLITE_TRUNC_FORMATS[unit], column), DateTime(timezone=True))
+    return func.date_trunc(unit, column)
+
+def _settled_before(db: Session):
+    """Límite (reloj de la BD) de las filas con antigüedad suficiente para agregarse."""
+    return seconds_ago(db, settings.STATS_ROLLUP_LAG_SECONDS)
+
+def _advance(db: Session, source: str) -> int:
+    """Agrega el siguiente tramo de filas de un origen; devuelve cuántos IDs avanzó."""
+    model, from_clause, group_columns, metric = SOURCES[source]
+    state = db.execute(
+        select(StatsRollupState).where(StatsRollupState.source == source).with_for_update()
+    ).scalar_one_or_none()
+    if state is None:
+        # Tablas creadas con create_all (sin la fila inicial de la migración)
+        state = StatsRollupState(source=source, last_id=0)
+        db.add(state)
+    last_id = state.last_id
+
+    settled = _settled_before(db)
+    upper = db.execute(
+        select(func.max(model.id)).where(
+            model.id > last_id,
+            model.id <= last_id + CHUNK_SIZE,
+            model.created_at < settled
+        )
+    ).scalar()
+    if upper is None:
+        # Tramo vacío: puede ser un hueco de IDs; saltar hasta la siguiente fila agregable
+        next_id = db.execute(
+            select(func.min(model.id)).where(model.id > last_id, model.created_at < settled)
+        ).scalar()
+        if next_id is None:
+            db.commit()
+            return 0
+        state.last_id = next_id - 1
+        db.commit()
+        return next_id - 1 - last_id
+
+    bucket = _truncate(db, "hour", model.created_at)
+    rows = (
+        select(bucket, metric, func.count())
+        .select_from(from_clause)
+        .where(model.id > last_id, model.id <= upper)
+        .group_by(bucket, *group_columns)
+    )
+    stmt = upsert(db, StatsHourly).from_select(["bucket_start", "metric", "value"], rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StatsHourly.bucket_start, StatsHourly.metric],
+        set_={"value": StatsHourly.value + stmt.excluded.value}
+    )
+    db.execute(stmt)
+    state.last_id = upper
+    db.commit()
+    return upper - last_id
+
+def refresh_rollups(db: Session) -> int:
+    """Pone al día todos los orígenes (por tramos de CHUNK_SIZE IDs)."""
+    advanced = 0
+    for source in SOURCES:
+        while True:
+            step = _advance(db, source)
+            if not step:
+                break
+            advanced += step
+    return advanced
+
+def totals(db: Session, metrics: List[str], recent_since: datetime) -> Dict[str, Dict[str, int]]:
+    """
+    Total histórico de cada métrica y el de las horas desde recent_since, en
+    una sola consulta.
+    """
+    rows = db.execute(
+        select(
+            StatsHourly.metric,
+            func.sum(StatsHourly.value),
+            func.sum(case((StatsHourly.bucket_start >= recent_since, StatsHourly.value), else_=0)),
+        )
+        .where(StatsHourly.metric.in_(metrics))
+        .group_by(StatsHourly.metric)
+    ).all()
+    result = {metric: {"total": 0, "recent": 0} for metric in metrics}
+    for metric, total, recent in rows:
+        result[metric] = {"total": int(total or 0), "recent": int(recent or 0)}
+    return result
+
+def series(db: Session, metric: str, start: datetime, end: datetime, granularity: str = "hour") -> List[Dict]:
+    """Serie por hora o por día (UTC) de una métrica en [start, end)."""
+    bucket = StatsHourly.bucket_start if granularity == "hour" else _truncate(db, "day", StatsHourly.bucket_start)
+    rows = db.execute(
+        select(bucket.label("bucket"), func.sum(StatsHourly.value))
+        .where(
+            StatsHourly.metric == metric,
+            StatsHourly.bucket_start >= start,
+            StatsHourly.bucket_start < end
+        )
+        .group_by(bucket)
+        .order_by(bucket)
+    ).all()
+    return [{"bucket": row[0], "value": int(row[1])} for row in rows]
@@ -0,0 +1,161 @@
+"""
+Callbacks de estado de entrega de Twilio (sent/delivered/read/failed...).
+
+El webhook solo añade el callback a una lista de Redis y responde; un flusher
+por réplica de la API saca lotes de la lista y los aplica con unos pocos
+UPDATE por lote (uno por estado destino / código de error) en lugar de una
+transacción por callback.
+
+Los callbacks pueden llegar desordenados, así que un estado nunca retrocede
+(p. ej. un "sent" tardío no pisa un "delivered").
+
+Un callback puede llegar antes de que el envío guarde el SID. Esos callbacks
+esperan en un sorted set (puntuación = cuándo reintentar, con backoff) y el
+flusher los devuelve al buffer cuando vencen.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_async_redis
+from app.models.message import DeliveryStatus, Message
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "twilio:status_callbacks"
+# Callbacks de mensajes cuyo SID aún no se ha guardado (envío en curso): se reintentan
+RETRY_KEY = "twilio:status_callbacks:retry"
+MAX_REQUEUES = 5
+
+# Mueve al buffer los reintentos ya vencidos
+_RELEASE_DUE = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    -- unpack es global en Lua 5.1 (Redis) y table.unpack en 5.2+
+    redis.call('ZREM', KEYS[1], (unpack or table.unpack)(due))
+    redis.call('RPUSH', KEYS[2], (unpack or table.unpack)(due))
+end
+return #due
+"""
+
+TWILIO_STATUSES = {
+    "sent": DeliveryStatus.SENT,
+    "delivered": DeliveryStatus.DELIVERED,
+    "read": DeliveryStatus.READ,
+    "failed": DeliveryStatus.FAILED,
+    "undelivered": DeliveryStatus.FAILED,
+}
+
+# Orden de avance; FAILED es terminal pero no sustituye a DELIVERED/READ
+RANK = {
+    DeliveryStatus.QUEUED: 0,
+    DeliveryStatus.SENT: 1,
+    DeliveryStatus.FAILED: 2,
+    DeliveryStatus.DELIVERED: 3,
+    DeliveryStatus.READ: 4,
+}
+
+async def buffer_callback(form) -> bool:
+    """Guarda un callback en el buffer. Devuelve False si el estado no nos interesa."""
+    status = TWILIO_STATUSES.get((form.get("MessageStatus") or "").lower())
+    sid = form.get("MessageSid")
+    if not status or not sid:
+        return False
+    await get_async_redis().rpush(BUFFER_KEY, json.dumps({
+        "sid": sid,
+        "status": status.name,
+        "error": form.get("ErrorCode"),
+        "requeues": 0,
+    }))
+    return True
+
+def _coalesce(callbacks: List[dict]) -> Dict[str, dict]:
+    """Un solo callback por SID: el de estado más avanzado del lote."""
+    latest: Dict[str, dict] = {}
+    for callback in callbacks:
+        current = latest.get(callback["sid"])
+        if current is None or RANK[DeliveryStatus[callback["status"]]] > RANK[DeliveryStatus[current["status"]]]:
+            latest[callback["sid"]] = callback
+    return latest
+
+async def apply_batch(callbacks: List[dict]) -> int:
+    """Aplica un lote de callbacks; devuelve cuántos mensajes se actualizaron."""
+    latest = _coalesce(callbacks)
+    groups: Dict[Tuple[str, Optional[str]], List[str]] = defaultdict(list)
+    for sid, callback in latest.items():
+        groups[(callback["status"], callback["error"])].append(sid)
+
+    updated = set()
+    async with AsyncSessionLocal() as db:
+        for (status_name, error), sids in groups.items():
+            status = DeliveryStatus[status_name]
+            behind = [s for s, rank in RANK.items() if rank < RANK[status]]
+            values = {"delivery_status": status}
+            if status == DeliveryStatus.FAILED and error:
+                values["delivery_error"] = f"Twilio error {error}"
+            result = await db.execute(
+                update(Message)
+                .where(Message.twilio_sid.in_(sids), Message.delivery_status.in_(behind))
+                .values(**values)
+                .returning(Message.twilio_sid)
+                .execution_options(synchronize_session=False)
+            )
+            updated.update(result.scalars().all())
+
+        # SIDs que aún no existen: el envío todavía no guardó el SID
+        pending = [sid for sid in latest if sid not in updated]
+        if pending:
+            known = set((await db.execute(
+                select(Message.twilio_sid).where(Message.twilio_sid.in_(pending))
+            )).scalars().all())
+            pending = [sid for sid in pending if sid not in known]
+        await db.commit()
+
+    now = time.time()
+    retry = {
+        json.dumps({**latest[sid], "requeues": latest[sid]["requeues"] + 1}):
+            now + settings.STATUS_CALLBACK_RETRY_SECONDS * 2 ** latest[sid]["requeues"]
+        for sid in pending if latest[sid]["requeues"] < MAX_REQUEUES
+    }
+    if retry:
+        await get_async_redis().zadd(RETRY_KEY, retry)
+    return len(updated)
+
+async def release_due_retries(now: Optional[float] = None) -> int:
+    """Devuelve al buffer los callbacks cuyo reintento ya venció; devuelve cuántos."""
+    now = time.time() if now is None else now
+    return await get_async_redis().eval(
+        _RELEASE_DUE, 2, RETRY_KEY, BUFFER_KEY, now, settings.STATUS_CALLBACK_BATCH_SIZE
+    )
+
+async def run_flusher() -> None:
+    """Vacía el buffer por lotes de STATUS_CALLBACK_BATCH_SIZE cada STATUS_CALLBACK_FLUSH_MS."""
+    redis = get_async_redis()
+    while True:
+        try:
+            await release_due_retries()
+            raw = await redis.lpop(BUFFER_KEY, settings.STATUS_CALLBACK_BATCH_SIZE)
+            if not raw:
+                await asyncio.sleep(settings.STATUS_CALLBACK_FLUSH_MS / 1000)
+                continue
+            callbacks = [json.loads(item) for item in raw]
+            try:
+                updated = await apply_batch(callbacks)
+            except Exception:
+                # Devolver el lote al buffer para no perder estados
+                await redis.rpush(BUFFER_KEY, *raw)
+                raise
+            await metrics.incr_async("status_callbacks_applied", updated)
+            if len(raw) < settings.STATUS_CALLBACK_BATCH_SIZE:
+                await asyncio.sleep(settings.STATUS_CALLBACK_FLUSH_MS / 1000)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"🔴 Error aplicando callbacks de estado: {e}")
+            await asyncio.sleep(1)
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w\s]", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin acentos, sin signos de puntuación y con espacios simples."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _NON_WORD.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+def char_ngrams(text: str, n: int = 3) -> set:
+    """Conjunto de n-gramas de caracteres (con bordes) de un texto ya normalizado."""
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
@@ -1,34 +1,86 @@
 import logging
-from twilio.rest import Client
-from twilio.base.exceptions import TwilioRestException
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import httpx
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# Inicializar cliente Twilio
-client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+TWILIO_MESSAGES_PATH = "/2010-04-01/Accounts/{account_sid}/Messages.json"
 
-def send_whatsapp_message(to: str, body: str) -> dict:
+# Cliente HTTP asíncrono compartido (se crea en el primer uso, dentro del event loop)
+_async_http: Optional[httpx.AsyncClient] = None
+
+def _get_async_http() -> httpx.AsyncClient:
+    global _async_http
+    if _async_http is None:
+        _async_http = httpx.AsyncClient(
+            auth=(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN),
+            timeout=httpx.Timeout(10.0, connect=5.0),
+        )
+    return _async_http
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, ValueError):
+        return None
+
+async def send_whatsapp_message_async(to: str, body: str) -> dict:
     """
-    Envía un mensaje de WhatsApp usando Twilio
-    Retorna dict con estado y detalles
+    Envía un mensaje de WhatsApp usando la API REST de Twilio directamente con
+    httpx. Retorna dict con "success" y el SID o los detalles del error, más
+    "retryable" (429, 5xx o error de red), "retry_after" si Twilio lo indica y
+    "ambiguous" si no se sabe si Twilio llegó a aceptarlo.
     """
+    url = settings.TWILIO_API_BASE_URL + TWILIO_MESSAGES_PATH.format(account_sid=settings.TWILIO_ACCOUNT_SID)
+    data = {
+        "From": settings.TWILIO_WHATSAPP_NUMBER,
+        "To": to,
+        "Body": body,
+    }
+    if settings.TWILIO_STATUS_CALLBACK_URL:
+        data["StatusCallback"] = settings.TWILIO_STATUS_CALLBACK_URL
     try:
-        message = client.messages.create(
-            body=body,
-            from_=settings.TWILIO_WHATSAPP_NUMBER,
-            to=to
-        )
-        logger.info(f"✅ Mensaje enviado a {to}, SID: {message.sid}")
-        return {"success": True, "sid": message.sid}
-        
-    except TwilioRestException as e:
-        logger.error(f"❌ Error de Twilio: {e}")
+        response = await _get_async_http().post(url, data=data)
+        if response.status_code >= 400:
+            try:
+                data = response.json()
+            except ValueError:
+                data = {}
+            logger.error(f"❌ Error de Twilio: HTTP {response.status_code} {data.get('message')}")
+            return {
+                "success": False,
+                "error": "twilio_error",
+                "message": data.get("message", response.text),
+                "code": data.get("code"),
+                "retryable": response.status_code == 429 or response.status_code >= 500,
+                "retry_after": _retry_after(response)
+            }
+        data = response.json()
+        logger.info(f"✅ Mensaje enviado a {to}, SID: {data.get('sid')}")
+        return {"success": True, "sid": data.get("sid")}
+
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # La petición no llegó a salir: reintentar no duplica el mensaje
+        logger.error(f"❌ Error de red enviando mensaje: {str(e)}")
         return {
             "success": False,
-            "error": "twilio_error",
+            "error": "network",
             "message": str(e),
-            "code": e.code
+            "retryable": True
+        }
+    except httpx.TransportError as e:
+        # La petición salió pero no hubo respuesta (p. ej. ReadTimeout): Twilio
+        # puede haberlo aceptado, así que antes de reenviar hay que comprobarlo
+        logger.error(f"❌ Error de red tras enviar mensaje (estado desconocido): {str(e)}")
+        return {
+            "success": False,
+            "error": "network",
+            "message": str(e),
+            "retryable": True,
+            "ambiguous": True
         }
     except Exception as e:
         logger.error(f"❌ Error inesperado enviando mensaje: {str(e)}")
@@ -36,4 +88,30 @@ def send_whatsapp_message(to: str, body: str) -> dict:
             "success": False,
             "error": "unexpected",
             "message": str(e)
-        }
\ No newline at end of file
+        }
+
+async def find_sent_message_async(to: str, body: str, since: datetime) -> dict:
+    """
+    Busca en Twilio un mensaje ya aceptado con ese destino y texto, creado
+    desde `since`. Retorna {"sid": ...} (None si no existe) o {"error": ...}
+    si no se pudo consultar.
+    """
+    url = settings.TWILIO_API_BASE_URL + TWILIO_MESSAGES_PATH.format(account_sid=settings.TWILIO_ACCOUNT_SID)
+    params = {
+        "From": settings.TWILIO_WHATSAPP_NUMBER,
+        "To": to,
+        # Twilio filtra por día (UTC)
+        "DateSent>": since.astimezone(timezone.utc).date().isoformat(),
+        "PageSize": 100,
+    }
+    try:
+        response = await _get_async_http().get(url, params=params)
+        response.raise_for_status()
+        for message in response.json().get("messages", []):
+            created = message.get("date_created")
+            if message.get("body") == body and created and parsedate_to_datetime(created) >= since:
+                return {"sid": message["sid"]}
+        return {"sid": None}
+    except Exception as e:
+        logger.error(f"❌ No se pudo consultar Twilio: {str(e)}")
+        return {"error": str(e)}
@@ -0,0 +1,14 @@
+from sqlalchemy.orm import Session
+from app.core import auth_cache
+from app.models.user import User
+
+def deactivate_user(db: Session, user: User) -> None:
+    """
+    Desactiva al usuario e invalida sus tokens vigentes (token_version + 1).
+    Hace commit para que la invalidación de la caché no preceda al cambio en BD.
+    """
+    user.is_active = False
+    user.token_version = User.token_version + 1
+    db.commit()
+    db.refresh(user)
+    auth_cache.invalidate_user(user)
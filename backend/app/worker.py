@@ -21,13 +21,24 @@ celery_app.conf.update(
     task_time_limit=30 * 60,
     task_soft_time_limit=60,
     broker_connection_retry_on_startup=True,
+    # Los envíos salientes van en su propia cola para no esperar detrás del pipeline
+    task_routes={'app.workers.tasks.deliver_outbound_message': {'queue': 'outbound'}},
 )
 
-# Programar tarea periódica (cada minuto)
+# Barrido periódico de inactividad. El cierre puntual lo hace
+# app.workers.expiry_scheduler; esto solo recoge lo que se le haya escapado.
 celery_app.conf.beat_schedule = {
     'close-inactive-conversations': {
         'task': 'app.workers.tasks.close_inactive_conversations',
-        'schedule': crontab(minute='*'),  # cada minuto (ajustable)
+        'schedule': crontab(minute='*/15'),
+    },
+    'refresh-stats-rollups': {
+        'task': 'app.workers.tasks.refresh_stats_rollups',
+        'schedule': crontab(),
+    },
+    'requeue-stale-deliveries': {
+        'task': 'app.workers.tasks.requeue_stale_deliveries',
+        'schedule': crontab(minute='*/5'),
     },
 }
 
@@ -0,0 +1,213 @@
+"""
+Worker asyncio: consume mensajes entrantes de Redis y los procesa
+concurrentemente (hasta ASYNC_WORKER_CONCURRENCY a la vez) en un solo proceso.
+
+Los mensajes se reparten en ASYNC_WORKER_PARTITIONS listas según el hash del
+número de origen. Cada partición la consume en serie un único worker (que la
+reserva con un lease en Redis), así los mensajes de un mismo cliente se
+procesan en orden y clientes distintos escalan entre procesos y nodos.
+
+Un mensaje sigue en la lista 'processing' de su partición hasta que su turno
+se ha respondido, así una caída en cualquier punto no lo pierde.
+
+Uso (con MESSAGE_PIPELINE=async):
+    python -m app.workers.async_worker
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import time
+import uuid
+import zlib
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.redis import get_async_redis
+from app.workers.pipeline import ingest_incoming_message, reply_to_turn
+
+logger = logging.getLogger(__name__)
+
+# Renueva el lease solo si sigue siendo nuestro
+_RENEW_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Libera el lease solo si sigue siendo nuestro
+_RELEASE_LEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+def partition_for(from_number: str) -> int:
+    return zlib.crc32(from_number.encode()) % settings.ASYNC_WORKER_PARTITIONS
+
+def _queue_key(partition: int) -> str:
+    return f"{settings.ASYNC_WORKER_QUEUE}:{partition}"
+
+def _processing_key(partition: int) -> str:
+    return f"{settings.ASYNC_WORKER_QUEUE}:{partition}:processing"
+
+def _ingested_key(partition: int) -> str:
+    return f"{settings.ASYNC_WORKER_QUEUE}:{partition}:ingested"
+
+def _owner_key(partition: int) -> str:
+    return f"{settings.ASYNC_WORKER_QUEUE}:{partition}:owner"
+
+def _workers_key() -> str:
+    return f"{settings.ASYNC_WORKER_QUEUE}:workers"
+
+async def enqueue_incoming_message(message_data: dict) -> None:
+    """Encola un mensaje en la partición de su número de origen (no bloquea el event loop)."""
+    partition = partition_for(message_data.get("from") or "")
+    await get_async_redis().rpush(_queue_key(partition), json.dumps(message_data))
+
+# Un lock por conversación: sus respuestas se generan de una en una en este proceso
+_reply_locks: Dict[int, asyncio.Lock] = {}
+_reply_lock_users: Dict[int, int] = {}
+
+@asynccontextmanager
+async def _conversation_lock(conversation_id: int):
+    lock = _reply_locks.setdefault(conversation_id, asyncio.Lock())
+    _reply_lock_users[conversation_id] = _reply_lock_users.get(conversation_id, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _reply_lock_users[conversation_id] -= 1
+        if not _reply_lock_users[conversation_id]:
+            del _reply_lock_users[conversation_id]
+            del _reply_locks[conversation_id]
+
+async def _ingest(partition: int, raw: str, semaphore: asyncio.Semaphore) -> Optional[dict]:
+    """
+    Guarda el mensaje una sola vez: el turno resultante se apunta en Redis, así
+    al recuperar 'processing' tras una caída no se vuelve a insertar.
+    """
+    redis = get_async_redis()
+    stored = await redis.hget(_ingested_key(partition), raw)
+    if stored is not None:
+        return json.loads(stored)
+    async with semaphore:
+        turn = await ingest_incoming_message(json.loads(raw))
+    if turn is not None:
+        await redis.hset(_ingested_key(partition), raw, json.dumps(turn))
+    return turn
+
+async def _reply(partition: int, raw: str, turn: Optional[dict], semaphore: asyncio.Semaphore) -> None:
+    """
+    Espera la ventana de debounce y responde el turno con el lock de la
+    conversación tomado. El mensaje sale de 'processing' solo al terminar.
+    """
+    redis = get_async_redis()
+    try:
+        if turn is not None:
+            await asyncio.sleep(settings.MESSAGE_DEBOUNCE_MS / 1000)
+            async with _conversation_lock(turn["conversation_id"]), semaphore:
+                await reply_to_turn(turn["conversation_id"], turn["message_id"], turn["from"])
+    except asyncio.CancelledError:
+        # Perdimos la partición: el mensaje sigue en 'processing' para quien la tome
+        raise
+    except Exception as e:
+        logger.error(f"🔴 ASYNC WORKER ERROR: {e}", exc_info=True)
+    pipe = redis.pipeline(transaction=True)
+    pipe.lrem(_processing_key(partition), 1, raw)
+    pipe.hdel(_ingested_key(partition), raw)
+    await pipe.execute()
+
+async def _consume_partition(partition: int, owner: str, stop: asyncio.Event, semaphore: asyncio.Semaphore) -> None:
+    """
+    Guarda en serie los mensajes de una partición hasta que se pida parar. Cada
+    respuesta corre en su propia tarea, así los siguientes mensajes de la
+    ráfaga se guardan dentro de la misma ventana de debounce.
+    """
+    redis = get_async_redis()
+    queue, processing = _queue_key(partition), _processing_key(partition)
+    replies: set = set()
+    logger.info(f"🟢 ASYNC WORKER: partición {partition} asignada a {owner}")
+
+    async def handle(raw: str) -> None:
+        try:
+            turn = await _ingest(partition, raw, semaphore)
+        except Exception as e:
+            logger.error(f"🔴 ASYNC WORKER ERROR: {e}", exc_info=True)
+            turn = None
+        task = asyncio.create_task(_reply(partition, raw, turn, semaphore))
+        replies.add(task)
+        task.add_done_callback(replies.discard)
+
+    try:
+        # Lo que quedó en 'processing' es de un worker que murió a mitad: se reintenta primero
+        for raw in await redis.lrange(processing, 0, -1):
+            await handle(raw)
+        while not stop.is_set():
+            raw = await redis.blmove(queue, processing, 1, src="LEFT", dest="RIGHT")
+            if raw is not None:
+                await handle(raw)
+        # Al ceder la partición se terminan las respuestas en curso
+        await asyncio.gather(*replies, return_exceptions=True)
+    finally:
+        for task in replies:
+            task.cancel()
+        await redis.eval(_RELEASE_LEASE, 1, _owner_key(partition), owner)
+        logger.info(f"⚪ ASYNC WORKER: partición {partition} liberada")
+
+async def run_worker(concurrency: Optional[int] = None) -> None:
+    concurrency = concurrency or settings.ASYNC_WORKER_CONCURRENCY
+    partitions = settings.ASYNC_WORKER_PARTITIONS
+    lease_seconds = settings.ASYNC_WORKER_LEASE_SECONDS
+    redis = get_async_redis()
+    semaphore = asyncio.Semaphore(concurrency)
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    consumers: dict[int, tuple[asyncio.Task, asyncio.Event]] = {}
+    logger.info(f"🟢 ASYNC WORKER {owner}: {partitions} particiones, concurrencia {concurrency}")
+
+    while True:
+        # Registro de workers vivos para repartir las particiones a partes iguales
+        now = time.time()
+        await redis.zadd(_workers_key(), {owner: now})
+        await redis.zremrangebyscore(_workers_key(), "-inf", now - lease_seconds)
+        live_workers = max(1, await redis.zcard(_workers_key()))
+        fair_share = math.ceil(partitions / live_workers)
+
+        for partition, (task, stop) in list(consumers.items()):
+            if task.done():
+                del consumers[partition]
+            elif not await redis.eval(_RENEW_LEASE, 1, _owner_key(partition), owner, lease_seconds * 1000):
+                # Perdimos el lease (p. ej. pausa larga): otro worker puede tenerla ya
+                logger.warning(f"⚠️ ASYNC WORKER: lease perdido en partición {partition}")
+                task.cancel()
+                del consumers[partition]
+
+        # Ceder las particiones que sobran (terminan el mensaje en curso antes de soltarlas)
+        active = [p for p, (_, stop) in consumers.items() if not stop.is_set()]
+        for partition in active[fair_share:]:
+            consumers[partition][1].set()
+
+        # Tomar particiones libres hasta la cuota justa
+        offset = random.randrange(partitions)
+        for i in range(partitions):
+            if len(active) >= fair_share:
+                break
+            partition = (offset + i) % partitions
+            if partition in consumers:
+                continue
+            if await redis.set(_owner_key(partition), owner, nx=True, px=lease_seconds * 1000):
+                stop = asyncio.Event()
+                task = asyncio.create_task(_consume_partition(partition, owner, stop, semaphore))
+                consumers[partition] = (task, stop)
+                active.append(partition)
+
+        await asyncio.sleep(lease_seconds / 3)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
@@ -0,0 +1,102 @@
+"""
+Cierra conversaciones por inactividad justo cuando vence su plazo, leyendo
+solo los vencimientos del sorted set de Redis (services/conversation_expiry)
+en lugar de escanear la tabla cada minuto. El barrido periódico de Celery
+queda como red de seguridad.
+
+Uso:
+    python -m app.workers.expiry_scheduler
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Tuple
+from sqlalchemy import select, update, func
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.conversation import Conversation, ConversationStatus
+from app.services import conversation_expiry
+from app.services.notifier import notify_status_change_batch
+
+logger = logging.getLogger(__name__)
+
+# Tope de espera entre comprobaciones (por si se programan vencimientos nuevos)
+MAX_IDLE_SECONDS = 5.0
+# Margen por diferencias de reloj entre la app y la BD
+CLOCK_TOLERANCE_SECONDS = 2
+
+async def close_expired(conversation_ids: List[int]) -> Tuple[List[int], Dict[int, float]]:
+    """
+    Cierra las que siguen activas y sin actividad reciente. Devuelve las
+    cerradas y, de las que siguen activas, su last_activity_at (epoch).
+    """
+    async with AsyncSessionLocal() as db:
+        closed_ids = (await db.execute(
+            update(Conversation)
+            .where(
+                Conversation.id.in_(conversation_ids),
+                Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]),
+                Conversation.last_activity_at < func.now()
+                    - timedelta(minutes=settings.INACTIVITY_TIMEOUT_MINUTES)
+                    + timedelta(seconds=CLOCK_TOLERANCE_SECONDS)
+            )
+            .values(
+                status=ConversationStatus.ENDED,
+                updated_at=func.now(),
+                last_activity_at=Conversation.last_activity_at
+            )
+            .returning(Conversation.id)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        remaining = list(set(conversation_ids) - set(closed_ids))
+        active = (await db.execute(
+            select(Conversation.id, Conversation.last_activity_at).where(
+                Conversation.id.in_(remaining),
+                Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN])
+            )
+        )).all() if remaining else []
+        await db.commit()
+    return list(closed_ids), {cid: last_activity.timestamp() for cid, last_activity in active}
+
+async def run_once(
+    now: float,
+    close: Callable[[List[int]], Awaitable[Tuple[List[int], Dict[int, float]]]] = close_expired
+) -> int:
+    """Procesa todos los vencimientos hasta `now`. Devuelve cuántas se cerraron."""
+    closed_count = 0
+    timeout = settings.INACTIVITY_TIMEOUT_MINUTES * 60
+    while True:
+        due = await conversation_expiry.pop_due(now, settings.INACTIVITY_SWEEP_BATCH_SIZE)
+        if not due:
+            return closed_count
+        closed_ids, still_active = await close(due)
+        if closed_ids:
+            closed_count += len(closed_ids)
+            await notify_status_change_batch(closed_ids, ConversationStatus.ENDED.value)
+        # Las que siguen activas tuvieron actividad después de programarse: vencen a
+        # partir de esa actividad (como poco tras CLOCK_TOLERANCE_SECONDS, por desfase
+        # de reloj), salvo que ya tengan un vencimiento posterior
+        await conversation_expiry.retry_later({
+            cid: max(last_activity + timeout, now + CLOCK_TOLERANCE_SECONDS)
+            for cid, last_activity in still_active.items()
+        })
+
+async def run_scheduler(clock: Callable[[], float] = time.time) -> None:
+    logger.info("🟢 EXPIRY: programador de cierre por inactividad iniciado")
+    while True:
+        try:
+            closed = await run_once(clock())
+            if closed:
+                logger.info(f"🕒 EXPIRY: {closed} conversaciones cerradas por inactividad")
+            wait = min(await conversation_expiry.next_deadline() - clock(), MAX_IDLE_SECONDS)
+            await asyncio.sleep(max(wait, 0))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"🔴 EXPIRY: {e}", exc_info=True)
+            await asyncio.sleep(1)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_scheduler())
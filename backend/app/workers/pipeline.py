@@ -0,0 +1,227 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import List, Optional
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.customer import Customer
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.message import Message, SenderType
+from app.services.ai_service import generate_ai_response_async, BUSINESS_CONFIG
+from app.services.intent_router import classify, templated_answer
+from app.services.outbound import enqueue_delivery
+from app.services.analytics import record_bot_response, record_handoff_async
+from app.services.conversation_service import append_message
+from app.services.context_builder import build_history, remember_message
+from app.services.conversation_expiry import schedule_expiry_async
+from app.services.notifier import MessageStream, notify_new_message
+
+logger = logging.getLogger(__name__)
+
+# Máximo de mensajes seguidos del cliente que se combinan en un turno
+MAX_TURN_MESSAGES = 20
+
+# Espacio de claves de pg_advisory_xact_lock para las respuestas por conversación
+REPLY_LOCK_CLASS = 1
+
+async def _get_or_create_customer(db: AsyncSession, from_number: str) -> Customer:
+    customer = (await db.execute(
+        select(Customer).where(Customer.phone_number == from_number)
+    )).scalars().first()
+    if customer:
+        return customer
+    try:
+        async with db.begin_nested():
+            customer = Customer(phone_number=from_number)
+            db.add(customer)
+    except IntegrityError:
+        # Otro worker lo creó a la vez (phone_number es único)
+        customer = (await db.execute(
+            select(Customer).where(Customer.phone_number == from_number)
+        )).scalars().one()
+    return customer
+
+async def ingest_incoming_message(message_data: dict) -> Optional[dict]:
+    """
+    Guarda el mensaje entrante del cliente (creando cliente y conversación si
+    hace falta). Devuelve los datos necesarios para responder el turno.
+    """
+    from_number = message_data.get("from")
+    message_body = message_data.get("body")
+
+    logger.info(f"🟡 WORKER: Procesando mensaje de {from_number}: {message_body}")
+
+    async with AsyncSessionLocal() as db:
+        try:
+            # 1. Buscar o crear cliente
+            customer = await _get_or_create_customer(db, from_number)
+
+            # Serializa por cliente hasta el commit, para que dos workers no creen dos conversaciones
+            if db.bind.dialect.name == "postgresql":
+                await db.execute(select(func.pg_advisory_xact_lock(customer.id)))
+
+            # 2. Buscar conversación activa (última no terminada)
+            conversation = (await db.execute(
+                select(Conversation)
+                .where(
+                    Conversation.customer_id == customer.id,
+                    Conversation.status != ConversationStatus.ENDED
+                )
+                .order_by(Conversation.created_at.desc())
+                .limit(1)
+            )).scalars().first()
+            if not conversation:
+                conversation = Conversation(
+                    customer_id=customer.id,
+                    status=ConversationStatus.BOT
+                )
+                db.add(conversation)
+                await db.flush()
+
+            # 3. Guardar mensaje del cliente
+            customer_msg = append_message(db, conversation, SenderType.CUSTOMER, message_body)
+            await db.commit()
+            await remember_message(conversation.id, SenderType.CUSTOMER, message_body)
+            await schedule_expiry_async(conversation.id)
+            await notify_new_message(conversation.id, {
+                "id": customer_msg.id,
+                "conversation_id": conversation.id,
+                "sender": SenderType.CUSTOMER.value,
+                "content": message_body,
+            })
+            return {"conversation_id": conversation.id, "message_id": customer_msg.id, "from": from_number}
+
+        except Exception as e:
+            logger.error(f"🔴 WORKER ERROR: {str(e)}", exc_info=True)
+            await db.rollback()
+            return None
+
+async def _pending_turn(db: AsyncSession, conversation_id: int) -> List[Message]:
+    """Mensajes del cliente posteriores a la última respuesta (más antiguo primero)."""
+    recent = (await db.execute(
+        select(Message)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(MAX_TURN_MESSAGES)
+    )).scalars().all()
+    turn = []
+    for message in recent:
+        if message.sender != SenderType.CUSTOMER:
+            break
+        turn.append(message)
+    return list(reversed(turn))
+
+async def _is_latest_message(db: AsyncSession, conversation_id: int, message_id: int) -> bool:
+    """
+    Comprueba que message_id sigue siendo el último mensaje de la conversación.
+    En Postgres toma un lock por conversación hasta el commit, así la
+    comprobación y el guardado de la respuesta no se intercalan entre procesos.
+    """
+    if db.bind.dialect.name == "postgresql":
+        # Clave de dos enteros: no choca con el lock por cliente (clave de uno) de la ingesta
+        await db.execute(select(func.pg_advisory_xact_lock(REPLY_LOCK_CLASS, conversation_id)))
+    latest = (await db.execute(
+        select(Message.id)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(1)
+    )).scalar()
+    return latest == message_id
+
+async def reply_to_turn(conversation_id: int, message_id: int, from_number: str) -> dict:
+    """
+    Responde el turno pendiente de la conversación con una sola llamada a la IA.
+
+    Si llegó otro mensaje del cliente después de `message_id`, no hace nada:
+    el último mensaje de la ráfaga es el que responde (debounce).
+    """
+    async with AsyncSessionLocal() as db:
+        try:
+            turn = await _pending_turn(db, conversation_id)
+            if not turn or turn[-1].id != message_id:
+                await metrics.incr_async("llm_calls_saved")
+                return {"status": "coalesced", "conversation_id": conversation_id}
+            if len(turn) > 1:
+                await metrics.incr_async("messages_coalesced", len(turn) - 1)
+            combined_body = "\n".join(message.content for message in turn)
+
+            conversation = await db.get(Conversation, conversation_id)
+            stream: Optional[MessageStream] = None
+
+            # 4. Clasificar intención: derivar a humano, responder con plantilla o usar la IA
+            intent = classify(combined_body)
+            turn[-1].intent_detected = intent.name
+            faq_answer = templated_answer(intent, BUSINESS_CONFIG)
+            if intent.name == "handoff":
+                conversation.status = ConversationStatus.HUMAN
+                ai_response = "Has solicitado hablar con un humano. Un agente se pondrá en contacto contigo en breve."
+                sender_type = SenderType.HUMAN  # El mensaje lo enviará el sistema pero lo marcamos como humano
+            elif faq_answer:
+                ai_response = faq_answer
+                sender_type = SenderType.BOT
+                await metrics.incr_async("faq_answers")
+            else:
+                history = await build_history(db, conversation_id)
+                if settings.LLM_STREAMING_ENABLED:
+                    # Los agentes ven la respuesta mientras se genera
+                    stream = MessageStream(conversation_id)
+                    ai_response = await generate_ai_response_async(combined_body, history, on_delta=stream.push)
+                    await stream.flush(done=True)
+                else:
+                    ai_response = await generate_ai_response_async(combined_body, history)
+                sender_type = SenderType.BOT
+
+            # 5. Guardar respuesta del bot/humano, salvo que mientras tanto haya
+            # llegado otro mensaje del cliente (su turno responderá a ambos) u otra respuesta
+            if not await _is_latest_message(db, conversation_id, message_id):
+                await db.rollback()
+                await metrics.incr_async("llm_calls_saved")
+                return {"status": "coalesced", "conversation_id": conversation_id}
+            reply_msg = append_message(db, conversation, sender_type, ai_response, outbound=True)
+            await db.commit()
+            if intent.name == "handoff":
+                await record_handoff_async(conversation_id)
+            else:
+                received_at = turn[0].created_at
+                if received_at.tzinfo is None:
+                    # SQLite no guarda la zona horaria (Postgres sí)
+                    received_at = received_at.replace(tzinfo=timezone.utc)
+                await record_bot_response((datetime.now(timezone.utc) - received_at).total_seconds())
+            await remember_message(conversation_id, sender_type, ai_response)
+            await schedule_expiry_async(conversation_id)
+            await notify_new_message(conversation_id, {
+                "id": reply_msg.id,
+                "conversation_id": conversation_id,
+                "sender": sender_type.value,
+                "content": ai_response,
+                "stream_id": stream.stream_id if stream else None,
+            })
+
+        except Exception as e:
+            logger.error(f"🔴 WORKER ERROR: {str(e)}", exc_info=True)
+            await db.rollback()
+            return {"status": "error", "error": str(e)}
+
+    # 6. Encolar el envío por WhatsApp (reintentos y límite de ritmo en services/outbound.py)
+    try:
+        await asyncio.to_thread(enqueue_delivery, reply_msg.id)
+    except Exception as e:
+        # Queda en QUEUED: requeue_stale_deliveries lo recogerá
+        logger.warning(f"⚠️ WORKER: No se pudo encolar el envío a {from_number}: {e}")
+    logger.info(f"✅ WORKER: Respuesta encolada para {from_number}")
+    return {"status": "success", "to": from_number, "response": ai_response}
+
+# Event loop persistente por proceso: el motor async, AsyncOpenAI y httpx quedan
+# ligados al loop en el que se usan por primera vez, así que no usamos asyncio.run().
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def run_in_worker_loop(coro):
+    """Ejecuta una corrutina desde código síncrono (tareas Celery)."""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+    return _worker_loop.run_until_complete(coro)
@@ -1,131 +1,141 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 from app.worker import celery_app
-from app.services.twilio_service import send_whatsapp_message
-from app.services.ai_service import generate_ai_response
-from app.core.database import SessionLocal
-from app.models.customer import Customer
+from app.core.config import settings
+from app.workers.pipeline import ingest_incoming_message, reply_to_turn, run_in_worker_loop
+from app.core.database import SessionLocal, seconds_ago
+from app.services.notifier import notify_status_change_batch_sync
+from app.services.outbound import deliver, enqueue_delivery
+from app.services.stats_rollup import refresh_rollups
+from app.services.analytics import flush_pending
 from app.models.conversation import Conversation, ConversationStatus
-from app.models.message import Message, SenderType
-from sqlalchemy import func
+from app.models.message import DeliveryStatus, Message
+from sqlalchemy import func, select, update
 
 logger = logging.getLogger(__name__)
 
 @celery_app.task(bind=True, name="app.workers.tasks.process_whatsapp_message")
 def process_whatsapp_message(self, message_data: dict):
     """
-    Procesa un mensaje de WhatsApp: guarda en BD, genera respuesta con IA y envía.
+    Procesa un mensaje de WhatsApp. Solo es un adaptador: la lógica está en
+    el pipeline asíncrono (app/workers/pipeline.py). La respuesta se programa
+    tras la ventana de debounce para responder ráfagas de una sola vez.
+    """
+    turn = run_in_worker_loop(ingest_incoming_message(message_data))
+    if turn is None:
+        return {"status": "error", "error": "no se pudo guardar el mensaje"}
+    reply_to_conversation.apply_async(
+        args=[turn["conversation_id"], turn["message_id"], turn["from"]],
+        countdown=settings.MESSAGE_DEBOUNCE_MS / 1000
+    )
+    return {"status": "queued", **turn}
+
+@celery_app.task(name="app.workers.tasks.reply_to_conversation")
+def reply_to_conversation(conversation_id: int, message_id: int, from_number: str):
+    """Responde el turno pendiente de una conversación (ver pipeline.reply_to_turn)."""
+    return run_in_worker_loop(reply_to_turn(conversation_id, message_id, from_number))
+
+@celery_app.task(bind=True, name="app.workers.tasks.deliver_outbound_message", acks_late=True)
+def deliver_outbound_message(self, message_id: int):
+    """
+    Entrega por WhatsApp un mensaje saliente ya guardado (ver services/outbound.py).
+    Corre en la cola "outbound"; los reintentos y su límite los lleva el propio
+    mensaje (delivery_attempts), no Celery.
+    """
+    retry_in = run_in_worker_loop(deliver(message_id))
+    if retry_in is not None:
+        raise self.retry(countdown=retry_in, max_retries=None)
+
+@celery_app.task(name="app.workers.tasks.requeue_stale_deliveries")
+def requeue_stale_deliveries():
+    """
+    Vuelve a encolar los mensajes que siguen en QUEUED pasado un tiempo (tarea
+    perdida por la caída de un worker o de Redis). deliver() es idempotente,
+    así que un duplicado no provoca un doble envío.
     """
     db = SessionLocal()
     try:
-        from_number = message_data.get("from")
-        message_body = message_data.get("body")
-        
-        logger.info(f"🟡 WORKER: Procesando mensaje de {from_number}: {message_body}")
-        
-        # 1. Buscar o crear cliente
-        customer = db.query(Customer).filter(Customer.phone_number == from_number).first()
-        if not customer:
-            customer = Customer(phone_number=from_number)
-            db.add(customer)
-            db.commit()
-            db.refresh(customer)
-        
-        # 2. Buscar conversación activa (última no terminada)
-        conversation = db.query(Conversation).filter(
-            Conversation.customer_id == customer.id,
-            Conversation.status != ConversationStatus.ENDED
-        ).order_by(Conversation.created_at.desc()).first()
-        
-        if not conversation:
-            # Crear nueva conversación
-            conversation = Conversation(
-                customer_id=customer.id,
-                status=ConversationStatus.BOT
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-        
-        # 3. Guardar mensaje del cliente
-        customer_msg = Message(
-            conversation_id=conversation.id,
-            sender=SenderType.CUSTOMER,
-            content=message_body
-        )
-        db.add(customer_msg)
-        db.commit()
-        
-        # 4. Decidir si deriva a humano (lógica simple)
-        human_keywords = ["humano", "agente", "persona", "hablar con alguien", "representante"]
-        needs_human = any(keyword in message_body.lower() for keyword in human_keywords)
-        
-        if needs_human:
-            # Cambiar estado a humano
-            conversation.status = ConversationStatus.HUMAN
-            db.commit()
-            ai_response = "Has solicitado hablar con un humano. Un agente se pondrá en contacto contigo en breve."
-            sender_type = SenderType.HUMAN  # El mensaje lo enviará el sistema pero lo marcamos como humano
-        else:
-            # Generar respuesta con IA
-            ai_response = generate_ai_response(message_body)
-            sender_type = SenderType.BOT
-        
-        # 5. Guardar respuesta del bot/humano
-        bot_msg = Message(
-            conversation_id=conversation.id,
-            sender=sender_type,
-            content=ai_response
-        )
-        db.add(bot_msg)
-        conversation.updated_at = func.now()
-        db.commit()
-        
-        # 6. Enviar respuesta por WhatsApp
-        result = send_whatsapp_message(from_number, ai_response)
-        
-        if result.get("success"):
-            logger.info(f"✅ WORKER: Respuesta enviada a {from_number}")
-            return {"status": "success", "to": from_number, "response": ai_response}
-        else:
-            logger.warning(f"⚠️ WORKER: Error enviando: {result.get('message')}")
-            return {"status": "error", "to": from_number, "error": result.get('message')}
-        
-    except Exception as e:
-        logger.error(f"🔴 WORKER ERROR: {str(e)}", exc_info=True)
-        db.rollback()
-        return {"status": "error", "error": str(e)}
+        cutoff = func.now() - timedelta(minutes=settings.OUTBOUND_REQUEUE_AFTER_MINUTES)
+        message_ids = db.execute(
+            select(Message.id)
+            .where(Message.delivery_status == DeliveryStatus.QUEUED, Message.created_at < cutoff)
+            .order_by(Message.created_at)
+            .limit(1000)
+        ).scalars().all()
+        for message_id in message_ids:
+            enqueue_delivery(message_id)
+        if message_ids:
+            logger.info(f"🔁 Reencoladas {len(message_ids)} entregas pendientes")
+        return len(message_ids)
     finally:
         db.close()
 
 @celery_app.task(name="app.workers.tasks.close_inactive_conversations")
 def close_inactive_conversations():
     """
-    Tarea periódica para cerrar conversaciones inactivas (sin mensajes en los últimos N minutos).
+    Tarea periódica para cerrar conversaciones inactivas (sin actividad en los
+    últimos INACTIVITY_TIMEOUT_MINUTES).
+
+    Se hace por lotes con un único UPDATE ... RETURNING por lote (usa el índice
+    parcial de conversaciones activas por last_activity_at), sin cargar objetos
+    ORM, y se publica un solo evento por lote.
     """
     db = SessionLocal()
+    closed_count = 0
     try:
-        # Definir tiempo de inactividad (ej: 5 minutos)
-        inactive_timeout = timedelta(minutes=5)
-        cutoff = datetime.utcnow() - inactive_timeout
-        
-        # Buscar conversaciones activas (BOT o HUMAN) cuya última actualización sea anterior al cutoff
-        conversations = db.query(Conversation).filter(
-            Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]),
-            Conversation.updated_at < cutoff
-        ).all()
-        
-        closed_count = 0
-        for conv in conversations:
-            conv.status = ConversationStatus.ENDED
-            conv.updated_at = func.now()
-            closed_count += 1
-        
-        db.commit()
+        cutoff = seconds_ago(db, settings.INACTIVITY_TIMEOUT_MINUTES * 60)
+        while True:
+            batch = (
+                select(Conversation.id)
+                .where(
+                    Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]),
+                    Conversation.last_activity_at < cutoff
+                )
+                .order_by(Conversation.last_activity_at)
+                .limit(settings.INACTIVITY_SWEEP_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            closed_ids = db.execute(
+                update(Conversation)
+                .where(Conversation.id.in_(batch.scalar_subquery()))
+                .values(
+                    status=ConversationStatus.ENDED,
+                    updated_at=func.now(),
+                    # Cerrar no es actividad: evitar el onupdate de la columna
+                    last_activity_at=Conversation.last_activity_at
+                )
+                .returning(Conversation.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.commit()
+
+            if closed_ids:
+                closed_count += len(closed_ids)
+                notify_status_change_batch_sync(closed_ids, ConversationStatus.ENDED.value)
+            if len(closed_ids) < settings.INACTIVITY_SWEEP_BATCH_SIZE:
+                break
+
         logger.info(f"✅ Cerradas {closed_count} conversaciones inactivas")
         return closed_count
     except Exception as e:
         logger.error(f"🔴 Error cerrando conversaciones inactivas: {e}")
         db.rollback()
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@celery_app.task(name="app.workers.tasks.refresh_stats_rollups")
+def refresh_stats_rollups():
+    """
+    Agrega en stats_hourly los mensajes y conversaciones nuevos y vuelca la
+    analítica acumulada en Redis (ver services/stats_rollup.py y services/analytics.py).
+    """
+    db = SessionLocal()
+    try:
+        flush_pending(db)
+        return refresh_rollups(db)
+    except Exception as e:
+        logger.error(f"🔴 Error actualizando estadísticas agregadas: {e}")
+        db.rollback()
+    finally:
+        db.close()
@@ -0,0 +1,169 @@
+"""
+Prueba de carga al estilo locust: `--agents` agentes usando el panel a la vez.
+
+Cada agente repite, con una pausa de `--think-ms` entre peticiones, una tarea
+elegida por peso: bandeja, cabecera y mensajes de una conversación, enviar un
+mensaje y, de vez en cuando, iniciar sesión (bcrypt de verdad). Las peticiones
+van a la API en proceso (httpx + ASGI, sin red) durante `--seconds` segundos y
+al final se muestran peticiones, fallos y p50/p95/p99 por tarea.
+
+Se mide dos veces:
+
+- antes: como estaba el código, el envío llama a Twilio dentro de la petición
+  (una espera bloqueante de `--twilio-ms` en el threadpool) y bcrypt corre en
+  el mismo threadpool que los endpoints síncronos,
+- después: el envío solo encola la entrega y bcrypt usa su pool acotado.
+
+Desde backend/ (con --fake-redis no hace falta un Redis):
+    DATABASE_URL=postgresql://... python -m scripts.bench_agent_traffic --agents 200 --seconds 30
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+import anyio
+import httpx
+from sqlalchemy import event, select
+from app.api import conversations as conversations_api
+from app.api.deps import get_current_active_user
+from app.core import redis as app_redis
+from app.core import security
+from app.core.database import Base, SessionLocal, async_engine, engine
+from app.main import fastapi_app
+from app.models.conversation import Conversation
+from app.models.user import User
+from scripts.synthetic_data import seed
+
+BENCH_USERNAME = "bench-agent"
+BENCH_PASSWORD = "bench-password"
+
+# (tarea, peso): lo que hace un agente con el panel abierto
+TASKS = [
+    ("bandeja", 5),
+    ("cabecera", 3),
+    ("mensajes", 3),
+    ("enviar", 2),
+    ("login", 1),
+]
+
+def _sqlite_concurrent_writes(dbapi_connection, connection_record) -> None:
+    # SQLite admite un solo escritor: WAL y espera en lugar de "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+def _bench_user() -> None:
+    with SessionLocal() as db:
+        if db.execute(select(User).where(User.username == BENCH_USERNAME)).scalars().first() is None:
+            db.add(User(username=BENCH_USERNAME, email="bench-agent@example.com",
+                        hashed_password=security.get_password_hash(BENCH_PASSWORD)))
+            db.commit()
+
+def _use_old_code(twilio_seconds: float) -> None:
+    """Envío con la llamada a Twilio en la petición y bcrypt en el threadpool de los endpoints."""
+    def send_in_request(message_id: int) -> None:
+        time.sleep(twilio_seconds)
+
+    async def verify_in_threadpool(plain_password: str, hashed_password: str) -> bool:
+        return await anyio.to_thread.run_sync(security.verify_password, plain_password, hashed_password)
+
+    conversations_api.enqueue_delivery = send_in_request
+    security.verify_password_async = verify_in_threadpool
+
+def _use_new_code(originals: dict) -> None:
+    conversations_api.enqueue_delivery = lambda message_id: None
+    security.verify_password_async = originals["verify_password_async"]
+
+async def _run(agents: int, seconds: float, think_seconds: float, conversation_ids: List[int]) -> dict:
+    names = [name for name, _ in TASKS]
+    weights = [weight for _, weight in TASKS]
+    timings: Dict[str, List[float]] = {name: [] for name in names}
+    failures: Dict[str, int] = {name: 0 for name in names}
+    deadline = time.perf_counter() + seconds
+    transport = httpx.ASGITransport(app=fastapi_app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=120) as client:
+        async def call(name: str):
+            conversation_id = random.choice(conversation_ids)
+            if name == "bandeja":
+                return await client.get("/conversations/?limit=50")
+            if name == "cabecera":
+                return await client.get(f"/conversations/{conversation_id}")
+            if name == "mensajes":
+                return await client.get(f"/conversations/{conversation_id}/messages?limit=50")
+            if name == "enviar":
+                return await client.post(f"/conversations/{conversation_id}/messages",
+                                         json={"content": "le ayudo con su pedido", "sender": "human"})
+            return await client.post("/auth/login", data={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+
+        async def agent() -> None:
+            await asyncio.sleep(random.uniform(0, think_seconds))
+            while time.perf_counter() < deadline:
+                name = random.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    failed = (await call(name)).status_code >= 400
+                except Exception:
+                    failed = True
+                timings[name].append((time.perf_counter() - started) * 1000)
+                failures[name] += failed
+                await asyncio.sleep(think_seconds)
+
+        await asyncio.gather(*(agent() for _ in range(agents)))
+    return {name: (timings[name], failures[name]) for name in names}
+
+def _report(label: str, results: dict, seconds: float) -> None:
+    total = sum(len(timings) for timings, _ in results.values())
+    print(f"\n{label}: {total / seconds:.0f} req/s")
+    print(f"{'tarea':<10} {'peticiones':>10} {'fallos':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, (timings, failures) in results.items():
+        if not timings:
+            continue
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f"{name:<10} {len(timings):>10} {failures:>7} {statistics.median(timings):>9.1f} {p95:>9.1f} {p99:>9.1f}")
+
+async def main(args) -> None:
+    if args.fake_redis:
+        import fakeredis
+        import fakeredis.aioredis
+        server = fakeredis.FakeServer()
+        app_redis._redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        app_redis._async_redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+        event.listen(engine, "connect", _sqlite_concurrent_writes)
+        event.listen(async_engine.sync_engine, "connect", _sqlite_concurrent_writes)
+    _bench_user()
+    with SessionLocal() as db:
+        conversation_ids = db.execute(select(Conversation.id).limit(10_000)).scalars().all()
+    fastapi_app.dependency_overrides[get_current_active_user] = lambda: User(id=1, email="bench@local", is_active=True)
+
+    print(f"{args.agents} agentes, pausa {args.think_ms} ms, Twilio {args.twilio_ms} ms, {args.seconds} s por ronda")
+    originals = {"verify_password_async": security.verify_password_async}
+    for label, setup in [("antes", lambda: _use_old_code(args.twilio_ms / 1000)),
+                         ("después", lambda: _use_new_code(originals))]:
+        setup()
+        results = await _run(args.agents, args.seconds, args.think_ms / 1000, conversation_ids)
+        _report(label, results, args.seconds)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--think-ms", type=float, default=500)
+    parser.add_argument("--twilio-ms", type=float, default=300)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    parser.add_argument("--fake-redis", action="store_true", help="Redis en memoria en lugar de REDIS_URL")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(args.messages, args.conversations)
+    asyncio.run(main(args))
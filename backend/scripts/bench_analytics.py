@@ -0,0 +1,129 @@
+"""
+Generador de datos sintéticos y benchmark de la analítica por hora.
+
+Rellena stats_hourly con `--days` días de actividad inventada (latencias del
+bot y de toma de control como histogramas, derivaciones, conversaciones y
+mensajes por emisor y canal), igual que lo dejarían refresh_stats_rollups y
+flush_pending, y mide las consultas de /stats y /stats/analytics.
+
+Desde backend/:
+    DATABASE_URL=postgresql://... python -m scripts.bench_analytics --days 365
+    python -m scripts.bench_analytics --skip-load   # repetir solo las consultas
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete
+from app.core.database import Base, SessionLocal, engine, upsert
+from app.models.stats import StatsHourly
+from app.services import analytics, stats_rollup
+import app.models  # noqa: F401  (registra todas las tablas en Base.metadata)
+
+BATCH_SIZE = 5000
+
+def _latency_rows(name: str, samples_ms: list) -> Counter:
+    values = Counter()
+    for latency_ms in samples_ms:
+        values[f"{name}:le:{analytics._bucket_label(latency_ms)}"] += 1
+        values[f"{name}:sum"] += round(latency_ms)
+    values[f"{name}:count"] = len(samples_ms)
+    return values
+
+def _hour_values(hour: datetime, conversations_per_hour: int) -> Counter:
+    """Métricas inventadas de una hora, con más tráfico de día que de noche."""
+    daytime = 0.3 + 0.7 * math.sin(math.pi * hour.hour / 24) ** 2
+    conversations = max(1, int(random.gauss(conversations_per_hour * daytime, conversations_per_hour * 0.1)))
+    handoffs = sum(random.random() < 0.15 for _ in range(conversations))
+    customer_messages = conversations * random.randint(3, 6)
+
+    values = Counter({
+        "conversations_created": conversations,
+        analytics.HANDOFFS: handoffs,
+        "messages_customer": customer_messages,
+        "messages_bot": int(customer_messages * 0.8),
+        "messages_human": handoffs * random.randint(2, 5),
+        "messages_channel_whatsapp": int(customer_messages * 1.5),
+        "messages_channel_web": int(customer_messages * 0.3),
+    })
+    # Latencias log-normales: el bot tarda segundos, un agente minutos
+    values.update(_latency_rows(analytics.BOT_RESPONSE,
+                                [random.lognormvariate(7.3, 0.6) for _ in range(customer_messages)]))
+    values.update(_latency_rows(analytics.HUMAN_TAKEOVER,
+                                [random.lognormvariate(11.5, 1.0) for _ in range(handoffs)]))
+    return values
+
+def generate(days: int, conversations_per_hour: int) -> int:
+    """Sustituye stats_hourly por `days` días sintéticos hasta la hora actual; devuelve las filas."""
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    hours = [end - timedelta(hours=h) for h in range(days * 24)]
+    Base.metadata.create_all(engine, tables=[StatsHourly.__table__])
+
+    db = SessionLocal()
+    try:
+        db.execute(delete(StatsHourly))
+        rows = []
+        written = 0
+        for hour in hours:
+            rows.extend(
+                {"bucket_start": hour, "metric": metric, "value": value}
+                for metric, value in _hour_values(hour, conversations_per_hour).items()
+            )
+            if len(rows) >= BATCH_SIZE:
+                db.execute(upsert(db, StatsHourly).values(rows))
+                written += len(rows)
+                rows = []
+        if rows:
+            db.execute(upsert(db, StatsHourly).values(rows))
+            written += len(rows)
+        db.commit()
+        return written
+    finally:
+        db.close()
+
+def _time(runs: int, query) -> list:
+    timings = []
+    db = SessionLocal()
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            query(db)
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        db.close()
+    return sorted(timings)
+
+def bench(runs: int) -> None:
+    now = datetime.now(timezone.utc)
+    queries = {
+        "analítica 24 h": lambda db: analytics.analytics_series(db, now - timedelta(days=1), now),
+        "analítica 7 días": lambda db: analytics.analytics_series(db, now - timedelta(days=7), now),
+        "analítica 30 días/día": lambda db: analytics.analytics_series(db, now - timedelta(days=30), now, "day"),
+        "analítica 1 año/día": lambda db: analytics.analytics_series(db, now - timedelta(days=365), now, "day"),
+        "totales /stats": lambda db: stats_rollup.totals(db, stats_rollup.METRICS, now - timedelta(days=1)),
+        "serie 7 días": lambda db: stats_rollup.series(db, "messages_customer", now - timedelta(days=7), now),
+    }
+    print(f"{'consulta':<24} {'p50 ms':>8} {'p95 ms':>8} {'máx ms':>8}")
+    for name, query in queries.items():
+        timings = _time(runs, query)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<24} {statistics.median(timings):>8.1f} {p95:>8.1f} {timings[-1]:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--conversations-per-hour", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    if not args.skip_load:
+        started = time.perf_counter()
+        rows = generate(args.days, args.conversations_per_hour)
+        print(f"📥 {rows} filas de stats_hourly ({args.days} días) en {time.perf_counter() - started:.1f} s")
+    bench(args.runs)
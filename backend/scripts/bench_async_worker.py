@@ -0,0 +1,172 @@
+"""
+Prueba de carga del worker asyncio con OpenAI y Twilio simulados.
+
+Corre el pipeline real (ingesta, respuesta del turno y entrega saliente) contra
+la base de DATABASE_URL, con la API de OpenAI y la de Twilio sustituidas por
+transportes httpx que solo esperan la latencia indicada. Para cada nivel de
+conversaciones concurrentes envía `--turns` rondas de un mensaje por
+conversación y mide turnos por segundo y la latencia mensaje -> envío a Twilio.
+
+La referencia "en serie" es lo que daba la tarea Celery con --pool=solo: un
+turno detrás de otro, cada uno con su llamada a la IA y a Twilio.
+
+Con SQLite las escrituras se hacen de una en una: las cifras con muchas
+conversaciones solo son representativas en Postgres.
+
+Desde backend/ (con --fake-redis no hace falta un Redis):
+    python -m scripts.bench_async_worker --levels 1 50 500 --llm-ms 800 --twilio-ms 150
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+from typing import List
+import httpx
+from openai import AsyncOpenAI
+from app.core import redis as app_redis
+from app.core.config import settings
+from sqlalchemy import event
+from app.core.database import Base, async_engine, engine
+from app.services import ai_service, outbound, twilio_service
+from app.workers import async_worker, pipeline
+import app.models  # noqa: F401  (registra todas las tablas en Base.metadata)
+
+# Ni plantilla ni derivación: cada turno pasa por la IA
+MESSAGE = "hola, ¿tienen laptops Lenovo?"
+# Un turno que no sale en este tiempo se da por perdido (ver los errores del worker)
+ROUND_TIMEOUT_SECONDS = 120
+
+def _sqlite_concurrent_writes(dbapi_connection, connection_record) -> None:
+    # SQLite admite un solo escritor: WAL y espera larga en lugar de "database is locked"
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=60000")
+    cursor.close()
+
+def _stub_openai(latency: float) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={
+            "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()),
+            "model": "gpt-3.5-turbo",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Sí, tenemos varios modelos Lenovo."}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+    ai_service.async_client = AsyncOpenAI(
+        api_key="bench", http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+def _stub_twilio(latency: float) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(201, json={"sid": f"SM{uuid.uuid4().hex}"})
+    twilio_service._async_http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    settings.TWILIO_API_BASE_URL = "http://twilio.bench"
+    settings.TWILIO_WHATSAPP_NUMBER = "whatsapp:+14155238886"
+    # Medir el worker, no el límite de ritmo del número
+    settings.OUTBOUND_RATE_PER_SECOND = 1_000_000.0
+    settings.OUTBOUND_BURST = 1_000_000
+
+class Bench:
+    """Worker y entregas en el mismo loop; apunta cuándo sale cada turno hacia Twilio."""
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.deliveries: asyncio.Queue = asyncio.Queue()
+        self.sent_at: List[float] = []
+        self.progress = asyncio.Event()
+
+    def enqueue_delivery(self, message_id: int) -> None:
+        # El pipeline lo llama desde un hilo (asyncio.to_thread), como a Celery
+        self.loop.call_soon_threadsafe(self.deliveries.put_nowait, message_id)
+
+    async def _deliver_forever(self) -> None:
+        while True:
+            message_id = await self.deliveries.get()
+            wait = await outbound.deliver(message_id)
+            if wait:
+                await asyncio.sleep(wait)
+                self.deliveries.put_nowait(message_id)
+                continue
+            self.sent_at.append(time.perf_counter())
+            self.progress.set()
+
+    async def run_level(self, conversations: int, turns: int) -> List[float]:
+        """Latencias (s) de cada turno con `conversations` conversaciones a la vez."""
+        self.loop = asyncio.get_running_loop()
+        run_id = uuid.uuid4().hex[:6]
+        senders = [f"whatsapp:+bench{run_id}{i}" for i in range(conversations)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        stop = asyncio.Event()
+        tasks = [
+            asyncio.create_task(async_worker._consume_partition(p, "bench", stop, semaphore))
+            for p in range(settings.ASYNC_WORKER_PARTITIONS)
+        ]
+        tasks += [asyncio.create_task(self._deliver_forever()) for _ in range(self.concurrency)]
+
+        latencies = []
+        try:
+            for _ in range(turns):
+                target = len(self.sent_at) + conversations
+                started = time.perf_counter()
+                for sender in senders:
+                    await async_worker.enqueue_incoming_message({"from": sender, "body": MESSAGE})
+                # Cada turno acaba cuando su respuesta sale hacia Twilio
+                while len(self.sent_at) < target:
+                    self.progress.clear()
+                    try:
+                        await asyncio.wait_for(self.progress.wait(), ROUND_TIMEOUT_SECONDS)
+                    except asyncio.TimeoutError:
+                        raise RuntimeError(f"{target - len(self.sent_at)} turnos sin enviar tras {ROUND_TIMEOUT_SECONDS} s")
+                latencies += [sent_at - started for sent_at in self.sent_at[-conversations:]]
+        finally:
+            stop.set()
+            for task in tasks[settings.ASYNC_WORKER_PARTITIONS:]:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return latencies
+
+def _report(conversations: int, turns: int, latencies: List[float], elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{conversations:>14} {conversations * turns / elapsed:>12.1f} "
+          f"{statistics.median(latencies) * 1000:>9.0f} {p95 * 1000:>9.0f}")
+
+async def main(args) -> None:
+    if args.fake_redis:
+        import fakeredis.aioredis
+        app_redis._async_redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+        event.listen(async_engine.sync_engine, "connect", _sqlite_concurrent_writes)
+    settings.MESSAGE_DEBOUNCE_MS = 0
+    settings.RESPONSE_CACHE_ENABLED = False
+    settings.LLM_STREAMING_ENABLED = False
+    settings.ASYNC_WORKER_QUEUE = f"bench_incoming:{uuid.uuid4().hex[:6]}"
+    _stub_openai(args.llm_ms / 1000)
+    _stub_twilio(args.twilio_ms / 1000)
+    bench = Bench(args.concurrency)
+    pipeline.enqueue_delivery = bench.enqueue_delivery
+
+    serial = 1000 / (args.llm_ms + args.twilio_ms)
+    print(f"IA {args.llm_ms} ms, Twilio {args.twilio_ms} ms, concurrencia {args.concurrency}")
+    print(f"referencia en serie (Celery --pool=solo): {serial:.1f} turnos/s\n")
+    print(f"{'conversaciones':>14} {'turnos/s':>12} {'p50 ms':>9} {'p95 ms':>9}")
+    for conversations in args.levels:
+        started = time.perf_counter()
+        latencies = await bench.run_level(conversations, args.turns)
+        _report(conversations, args.turns, latencies, time.perf_counter() - started)
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-ms", type=float, default=800)
+    parser.add_argument("--twilio-ms", type=float, default=150)
+    parser.add_argument("--concurrency", type=int, default=settings.ASYNC_WORKER_CONCURRENCY)
+    parser.add_argument("--fake-redis", action="store_true", help="Redis en memoria en lugar de REDIS_URL")
+    asyncio.run(main(parser.parse_args()))
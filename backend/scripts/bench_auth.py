@@ -0,0 +1,130 @@
+"""
+Benchmark de la autenticación: latencia de peticiones autenticadas y consultas a la BD por petición.
+
+Lanza `--requests` peticiones con token (hasta `--concurrency` a la vez) a la
+API en proceso (httpx + ASGI, sin red), repartidas entre `--users` agentes, a
+dos endpoints: /stats/pool (sin BD: casi todo es autenticación) y la
+cabecera de una conversación. Cuenta las consultas de los dos motores.
+
+- antes: get_current_user anterior (verifica el JWT y consulta el usuario
+  por username en cada petición),
+- después: get_current_user con la caché de tokens y de usuarios.
+
+Desde backend/ (con --fake-redis no hace falta un Redis):
+    DATABASE_URL=postgresql://... python -m scripts.bench_auth --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import timedelta
+from typing import Annotated, Dict, List
+import httpx
+from fastapi import Depends, HTTPException
+from jose import JWTError, jwt
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.api import deps
+from app.core import redis as app_redis
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, async_engine, engine, get_db
+from app.core.security import create_access_token
+from app.main import fastapi_app
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.user import User
+
+def _old_get_current_user(
+    token: Annotated[str, Depends(deps.oauth2_scheme)],
+    db: Annotated[Session, Depends(get_db)]
+) -> User:
+    """get_current_user antes de la caché."""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401)
+    user = db.query(User).filter(User.username == payload.get("sub")).first()
+    if user is None:
+        raise HTTPException(status_code=401)
+    return user
+
+def _setup(users: int) -> tuple:
+    """Agentes con su token y una conversación; devuelve (tokens, conversation_id)."""
+    if engine.dialect.name == "sqlite":
+        Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        agents = []
+        for i in range(users):
+            username = f"bench-auth-{i}"
+            agent = db.execute(select(User).where(User.username == username)).scalars().first()
+            if agent is None:
+                agent = User(username=username, email=f"{username}@example.com", hashed_password="x")
+                db.add(agent)
+            agents.append(agent)
+        conversation = Conversation(customer=Customer(phone_number=f"whatsapp:+bench-auth-{time.time_ns()}"))
+        db.add(conversation)
+        db.commit()
+        tokens = [
+            create_access_token({"sub": agent.username, "uid": agent.id, "ver": agent.token_version},
+                                timedelta(hours=1))
+            for agent in agents
+        ]
+        return tokens, conversation.id
+
+async def _run(paths: Dict[str, str], tokens: List[str], requests: int, concurrency: int) -> Dict[str, List[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {name: [] for name in paths}
+    names = list(paths)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fastapi_app), base_url="http://api") as client:
+        async def request(i: int) -> None:
+            name = names[i % len(names)]
+            headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(paths[name], headers=headers)
+                latencies[name].append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"{paths[name]}: respuesta {response.status_code}")
+        await asyncio.gather(*(request(i) for i in range(requests)))
+    return latencies
+
+async def main(args) -> None:
+    if args.fake_redis:
+        import fakeredis
+        import fakeredis.aioredis
+        server = fakeredis.FakeServer()
+        app_redis._redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        app_redis._async_redis = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    tokens, conversation_id = _setup(args.users)
+    paths = {"/stats/pool": "/stats/pool", "cabecera": f"/conversations/{conversation_id}"}
+
+    queries = {"count": 0}
+    def count(*_):
+        queries["count"] += 1
+    for db_engine in (engine, async_engine.sync_engine):
+        event.listen(db_engine, "before_cursor_execute", count)
+
+    print(f"{args.requests} peticiones, {args.concurrency} concurrentes, {args.users} agentes\n")
+    print(f"{'auth':<10} {'endpoint':<12} {'p50 ms':>9} {'p99 ms':>9} {'consultas/petición':>19}")
+    for label, override in [("antes", _old_get_current_user), ("después", None)]:
+        if override:
+            fastapi_app.dependency_overrides[deps.get_current_user] = override
+        else:
+            fastapi_app.dependency_overrides.pop(deps.get_current_user, None)
+        queries["count"] = 0
+        latencies = await _run(paths, tokens, args.requests, args.concurrency)
+        per_request = queries["count"] / args.requests
+        for name, timings in latencies.items():
+            timings.sort()
+            p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+            print(f"{label:<10} {name:<12} {statistics.median(timings):>9.2f} {p99:>9.2f} {per_request:>19.2f}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--fake-redis", action="store_true", help="Redis en memoria en lugar de REDIS_URL")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,113 @@
+"""
+Prueba de carga del pool de conexiones: espera de conexión con `--concurrency` peticiones a la vez.
+
+Lanza `--requests` peticiones contra la API en proceso (httpx + ASGI, sin red)
+mezclando endpoints del motor asíncrono (bandeja y mensajes) y del síncrono
+(cabecera de la conversación, en el threadpool), con hasta `--concurrency`
+en vuelo. Muestrea el pool durante la carga y al final muestra latencias,
+el máximo de conexiones en uso y la espera de conexión (pool_metrics). Las
+peticiones que fallan, incluidas las que agotan DB_POOL_TIMEOUT, cuentan
+como errores.
+
+El pool se configura como en producción, con variables de entorno:
+    DATABASE_URL=postgresql://... DB_POOL_SIZE=10 DB_MAX_OVERFLOW=20 \\
+        python -m scripts.bench_db_pool --concurrency 500 --requests 5000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Dict, List
+import httpx
+from sqlalchemy import select
+from app.api.deps import get_current_active_user
+from app.core.database import SessionLocal, async_engine, pool_metrics
+from app.main import fastapi_app
+from app.models.conversation import Conversation
+from app.models.user import User
+from scripts.synthetic_data import seed
+
+SAMPLE_INTERVAL_SECONDS = 0.01
+
+# (nombre, ruta) de cada tipo de petición: bandeja y mensajes (async), cabecera (sync)
+ENDPOINTS = [
+    ("GET /conversations (async)", "/conversations/?limit=50"),
+    ("GET /conversations/{id} (sync)", "/conversations/{id}"),
+    ("GET /conversations/{id}/messages (async)", "/conversations/{id}/messages?limit=50"),
+]
+
+async def _sample_pools(peak: Dict[str, int], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        for name, status in pool_metrics().items():
+            if "checked_out" in status:
+                peak[name] = max(peak.get(name, 0), status["checked_out"])
+        await asyncio.sleep(SAMPLE_INTERVAL_SECONDS)
+
+async def bench(requests: int, concurrency: int) -> None:
+    with SessionLocal() as db:
+        conversation_ids = db.execute(select(Conversation.id).limit(10_000)).scalars().all()
+    fastapi_app.dependency_overrides[get_current_active_user] = lambda: User(id=1, email="bench@local", is_active=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: Dict[str, List[float]] = {}
+    errors = 0
+    transport = httpx.ASGITransport(app=fastapi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api", timeout=120) as client:
+        async def request(i: int) -> None:
+            nonlocal errors
+            name, path = ENDPOINTS[i % len(ENDPOINTS)]
+            path = path.format(id=random.choice(conversation_ids))
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    failed = response.status_code >= 400
+                except Exception:
+                    # p. ej. TimeoutError del pool (DB_POOL_TIMEOUT agotado)
+                    failed = True
+                elapsed = (time.perf_counter() - started) * 1000
+            if failed:
+                errors += 1
+            latencies.setdefault(name, []).append(elapsed)
+
+        peak: Dict[str, int] = {}
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(_sample_pools(peak, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(request(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await sampler
+
+    print(f"{requests} peticiones, {concurrency} concurrentes: {requests / elapsed:.0f} req/s, {errors} errores\n")
+    print(f"{'endpoint':<42} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, timings in sorted(latencies.items()):
+        timings.sort()
+        print(f"{name:<42} {statistics.median(timings):>9.1f} {timings[int(len(timings) * 0.99)]:>9.1f}")
+
+    metrics = pool_metrics()
+    waits = metrics["connection_wait"]
+    if waits["checkouts"]:
+        print(f"\nespera de conexión: media {waits['wait_ms_avg']:.1f} ms, máxima {waits['wait_ms_max']:.1f} ms "
+              f"en {waits['checkouts']} checkouts")
+    else:
+        print("\nespera de conexión: sin medir (solo con el pool de Postgres)")
+    for name in ("sync", "async"):
+        status = metrics[name]
+        size = f"tamaño {status['size']}, " if "size" in status else ""
+        print(f"pool {name} ({status['pool']}): {size}máximo en uso {peak.get(name, '-')}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=50_000)
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(args.messages, args.conversations)
+    asyncio.run(bench(args.requests, args.concurrency))
@@ -0,0 +1,120 @@
+"""
+Benchmark de las notificaciones worker -> API: POST /internal (antes) frente al bus de eventos.
+
+Arranca una "API" en otro proceso (uvicorn) que recibe los eventos de las dos
+formas: el endpoint HTTP que llamaban los workers y el consumidor del stream
+(event_bus.run_consumer). El proceso principal hace de `--publishers` workers
+publicando `--events` eventos en total y mide eventos por segundo y la
+latencia de extremo a extremo (publicación -> el evento llega al manejador de
+la API, donde se reparte a los WebSockets).
+
+Necesita un Redis de verdad en REDIS_URL: fakeredis no devuelve las entradas
+ya presentes en un XREADGROUP con BLOCK, así que el consumidor se queda atrás.
+
+Desde backend/:
+    REDIS_URL=redis://localhost:6379/0 python -m scripts.bench_event_bus --events 5000 --publishers 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import List
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from app.core import event_bus
+from app.core.config import settings
+from app.core.redis import get_async_redis
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def _api_process(port: int, received: multiprocessing.Queue) -> None:
+    """La API: endpoint HTTP anterior y consumidor del stream, con el mismo manejador."""
+    async def handle(event: dict) -> None:
+        received.put(time.time() - event["sent_at"])
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        consumer = asyncio.create_task(event_bus.run_consumer(handle))
+        yield
+        consumer.cancel()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post("/internal/conversations/{conversation_id}/messages/notify")
+    async def notify_new_message(conversation_id: int, message_data: dict):
+        await handle(message_data)
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"ok": True}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+async def _wait_for_api(base_url: str) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(200):
+            try:
+                await client.get("/health")
+                groups = await get_async_redis().xinfo_groups(settings.EVENT_STREAM)
+                if any(group["name"] == event_bus.CONSUMER_GROUP for group in groups):
+                    return
+            except Exception:
+                pass
+            await asyncio.sleep(0.05)
+    raise RuntimeError("la API no arrancó")
+
+async def _publish_http(base_url: str, events: int, publishers: int) -> None:
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(5.0)) as client:
+        async def worker(n: int) -> None:
+            for i in range(n):
+                await client.post(f"/internal/conversations/{i % 100 + 1}/messages/notify",
+                                  json={"id": i, "content": "hola", "sent_at": time.time()})
+        await asyncio.gather(*(worker(events // publishers) for _ in range(publishers)))
+
+async def _publish_bus(events: int, publishers: int) -> None:
+    async def worker(n: int) -> None:
+        for i in range(n):
+            await event_bus.publish_async(event_bus.NEW_MESSAGE, i % 100 + 1,
+                                          {"id": i, "content": "hola", "sent_at": time.time()})
+    await asyncio.gather(*(worker(events // publishers) for _ in range(publishers)))
+
+def _collect(received: multiprocessing.Queue, expected: int) -> List[float]:
+    return [received.get(timeout=30) for _ in range(expected)]
+
+async def main(args) -> None:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    received = multiprocessing.get_context("spawn").Queue()
+    api = multiprocessing.get_context("spawn").Process(target=_api_process, args=(port, received), daemon=True)
+    api.start()
+    try:
+        await _wait_for_api(base_url)
+        events = args.events // args.publishers * args.publishers
+        print(f"{events} eventos, {args.publishers} publicadores\n")
+        print(f"{'camino':<10} {'eventos/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+        for name, publish in [("HTTP", lambda: _publish_http(base_url, events, args.publishers)),
+                              ("bus", lambda: _publish_bus(events, args.publishers))]:
+            started = time.perf_counter()
+            await publish()
+            latencies = sorted(await asyncio.to_thread(_collect, received, events))
+            elapsed = time.perf_counter() - started
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            print(f"{name:<10} {events / elapsed:>10.0f} "
+                  f"{statistics.median(latencies) * 1000:>9.2f} {p99 * 1000:>9.2f}")
+    finally:
+        api.terminate()
+        api.join()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--publishers", type=int, default=8)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Benchmark del barrido de inactividad sobre `--conversations` conversaciones vencidas.
+
+Carga las conversaciones con scripts.synthetic_data (salvo --skip-load), las
+deja activas y sin actividad desde hace una hora, y cierra todas con:
+
+- antes: el barrido anterior (carga todos los objetos ORM, los cambia uno a
+  uno y publica un evento por conversación),
+- después: close_inactive_conversations (UPDATE ... RETURNING por lotes, un
+  evento por lote).
+
+Cada barrido corre en su propio proceso (Linux) para medir su RSS máximo. Los
+eventos se cuentan en lugar de publicarse, así no hace falta Redis.
+
+Desde backend/:
+    DATABASE_URL=postgresql://... python -m scripts.bench_inactivity_sweep --conversations 1000000
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, update
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.workers import tasks
+from scripts.synthetic_data import PHONE_PREFIX, seed
+
+def _make_stale() -> int:
+    """Deja activas y vencidas las conversaciones sintéticas; devuelve cuántas son."""
+    with engine.begin() as conn:
+        return conn.execute(
+            update(Conversation)
+            .where(Conversation.customer_id.in_(
+                select(Customer.id).where(Customer.phone_number.like(f"{PHONE_PREFIX}%")).scalar_subquery()
+            ))
+            .values(status=ConversationStatus.BOT, last_activity_at=datetime.now(timezone.utc) - timedelta(hours=1))
+        ).rowcount
+
+def _before(notify) -> int:
+    """close_inactive_conversations antes del cambio (con INACTIVITY_TIMEOUT_MINUTES en lugar de 5 fijos)."""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=settings.INACTIVITY_TIMEOUT_MINUTES)
+        conversations = db.query(Conversation).filter(
+            Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]),
+            Conversation.last_activity_at < cutoff
+        ).all()
+        for conversation in conversations:
+            conversation.status = ConversationStatus.ENDED
+            conversation.updated_at = func.now()
+        db.commit()
+        for conversation in conversations:
+            notify([conversation.id])
+        return len(conversations)
+    finally:
+        db.close()
+
+def _after(notify) -> int:
+    tasks.notify_status_change_batch_sync = lambda conversation_ids, status: notify(conversation_ids)
+    return tasks.close_inactive_conversations()
+
+def _peak_rss_mib() -> float:
+    """RSS máximo del proceso (VmHWM). ru_maxrss no sirve: tras fork+exec arrastra el del padre."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _sweep(name: str, results: multiprocessing.Queue) -> None:
+    events = []
+    started = time.perf_counter()
+    closed = {"antes": _before, "después": _after}[name](events.append)
+    elapsed = time.perf_counter() - started
+    peak_mib = _peak_rss_mib()
+    results.put((closed, len(events), elapsed, peak_mib))
+
+def _run(name: str) -> None:
+    stale = _make_stale()
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_sweep, args=(name, results))
+    process.start()
+    closed, events, elapsed, peak_mib = results.get()
+    process.join()
+    print(f"{name:<10} {stale:>10} {closed:>10} {events:>9} {elapsed:>9.1f} {peak_mib:>9.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=1_000_000)
+    parser.add_argument("--skip-load", action="store_true", help="Usar las conversaciones ya cargadas")
+    parser.add_argument("--skip-before", action="store_true", help="No medir el barrido anterior")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(0, args.conversations)
+    print(f"{'barrido':<10} {'vencidas':>10} {'cerradas':>10} {'eventos':>9} {'s':>9} {'RSS MiB':>9}")
+    if not args.skip_before:
+        _run("antes")
+    _run("después")
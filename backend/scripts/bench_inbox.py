@@ -0,0 +1,92 @@
+"""
+Benchmark de la bandeja de conversaciones (GET /conversations).
+
+Compara la versión anterior (OFFSET y una consulta por fila para el último
+mensaje y el cliente) con la actual (una consulta sobre las columnas
+desnormalizadas, paginada por cursor) en la primera página y en páginas
+profundas. Carga antes los datos con scripts.synthetic_data salvo --skip-load.
+
+Desde backend/:
+    DATABASE_URL=postgresql://... python -m scripts.bench_inbox --conversations 100000 --messages 5000000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from sqlalchemy import desc
+from starlette.responses import Response
+from app.api.conversations import list_conversations
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.conversation import Conversation
+from app.models.message import Message
+from scripts.synthetic_data import seed
+
+PAGE_SIZE = 50
+
+def _before(db, offset: int) -> int:
+    """GET /conversations antes del cambio: OFFSET + N+1 consultas."""
+    conversations = (
+        db.query(Conversation).order_by(desc(Conversation.updated_at))
+        .offset(offset).limit(PAGE_SIZE).all()
+    )
+    for conversation in conversations:
+        db.query(Message).filter(Message.conversation_id == conversation.id).order_by(desc(Message.created_at)).first()
+        conversation.customer.phone_number if conversation.customer else None
+    return len(conversations)
+
+async def _after(db, cursor):
+    response = Response()
+    items = await list_conversations(response, db, None, status=None, limit=PAGE_SIZE, cursor=cursor)
+    return items, response.headers.get("x-next-cursor")
+
+def _report(name: str, timings: list) -> None:
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<28} {statistics.median(timings):>9.1f} {p99:>9.1f}")
+
+async def bench(pages: list, runs: int) -> None:
+    print(f"{'página':<28} {'p50 ms':>9} {'p99 ms':>9}")
+    async with AsyncSessionLocal() as db:
+        # Cursor de cada página pedida (recorriendo la bandeja una vez)
+        cursors, cursor, page = {1: None}, None, 1
+        while page < max(pages):
+            _, cursor = await _after(db, cursor)
+            if cursor is None:
+                break
+            page += 1
+            cursors[page] = cursor
+
+        for page in pages:
+            if page not in cursors:
+                continue
+            sync_db = SessionLocal()
+            try:
+                timings = []
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    _before(sync_db, (page - 1) * PAGE_SIZE)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    sync_db.expunge_all()
+                _report(f"antes, página {page}", timings)
+            finally:
+                sync_db.close()
+
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                await _after(db, cursors[page])
+                timings.append((time.perf_counter() - started) * 1000)
+            _report(f"después, página {page}", timings)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=5_000_000)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 20, 200])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(args.messages, args.conversations)
+    asyncio.run(bench(args.pages, args.runs))
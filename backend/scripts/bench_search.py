@@ -0,0 +1,67 @@
+"""
+Benchmark de la búsqueda en el historial (services/message_search.py).
+
+Carga mensajes sintéticos (scripts.synthetic_data) en la base de
+DATABASE_URL y mide la latencia de search_messages con consultas típicas de
+los agentes: término frecuente, términos raros, filtros y segunda página.
+
+Desde backend/:
+    DATABASE_URL=postgresql://... python -m scripts.bench_search --messages 5000000
+    python -m scripts.bench_search --skip-load   # repetir solo las consultas
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from app.core.database import AsyncSessionLocal
+from app.models.conversation import ConversationStatus
+from app.models.message import SenderType
+from app.services.message_search import search_messages
+from scripts.synthetic_data import seed
+
+QUERIES = {
+    "término frecuente": dict(query="garantia"),
+    "dos términos": dict(query="lenovo cargador"),
+    "frase rara": dict(query="impresora devolución factura tarjeta"),
+    "estado HUMAN": dict(query="garantia", status=ConversationStatus.HUMAN),
+    "emisor cliente": dict(query="precio", sender=SenderType.CUSTOMER),
+    "última semana": dict(query="envio", date_from=datetime.now(timezone.utc) - timedelta(days=7)),
+}
+
+async def _time(runs: int, limit: int, **params) -> tuple:
+    """Tiempos (ms, ordenados) de `runs` búsquedas iguales y las filas de la última."""
+    timings = []
+    async with AsyncSessionLocal() as db:
+        for _ in range(runs):
+            started = time.perf_counter()
+            rows = await search_messages(db, limit=limit, **params)
+            timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings), rows
+
+async def bench(runs: int, limit: int) -> None:
+    print(f"{'consulta':<20} {'p50 ms':>8} {'p95 ms':>8} {'máx ms':>8}")
+    for name, params in QUERIES.items():
+        timings, rows = await _time(runs, limit, **params)
+        _report(name, timings)
+        if name == "término frecuente" and len(rows) == limit:
+            # Segunda página con el cursor de la primera
+            timings, _ = await _time(runs, limit, cursor=(rows[-1].created_at, rows[-1].id), **params)
+            _report("  página 2", timings)
+
+def _report(name: str, timings: list) -> None:
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{name:<20} {statistics.median(timings):>8.1f} {p95:>8.1f} {timings[-1]:>8.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5_000_000)
+    parser.add_argument("--conversations", type=int, default=50_000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(args.messages, args.conversations)
+    asyncio.run(bench(args.runs, args.limit))
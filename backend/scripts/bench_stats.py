@@ -0,0 +1,115 @@
+"""
+Benchmark de /stats y de las series temporales con `--messages` mensajes (por defecto 10M).
+
+Carga los datos con scripts.synthetic_data (salvo --skip-load) y mide:
+
+- antes: los nueve COUNT(*) sobre conversations y messages del /stats
+  anterior, y una serie diaria de 30 días agrupando los mensajes crudos,
+- después: /stats y la misma serie leídos de stats_hourly.
+
+También mide lo que cuesta mantener los contadores: la agregación inicial de
+todas las filas y un refresco incremental tras `--new-messages` mensajes nuevos.
+
+Desde backend/:
+    DATABASE_URL=postgresql://... python -m scripts.bench_stats --messages 10000000 --conversations 200000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+from sqlalchemy import func, insert, select
+from app.api import stats as stats_api
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.message import Message, SenderType
+from app.services import stats_rollup
+from scripts.synthetic_data import seed
+
+def _old_stats(db) -> dict:
+    """Los conteos del /stats anterior (sin el cálculo del promedio)."""
+    last_24h = datetime.utcnow() - timedelta(hours=24)
+    return {
+        "total_conversations": db.query(Conversation).count(),
+        "bot": db.query(Conversation).filter(Conversation.status == ConversationStatus.BOT).count(),
+        "human": db.query(Conversation).filter(Conversation.status == ConversationStatus.HUMAN).count(),
+        "ended": db.query(Conversation).filter(Conversation.status == ConversationStatus.ENDED).count(),
+        "total_messages": db.query(func.coalesce(func.sum(Conversation.message_count), 0)).scalar(),
+        "customer": db.query(Message).filter(Message.sender == SenderType.CUSTOMER).count(),
+        "bot_messages": db.query(Message).filter(Message.sender == SenderType.BOT).count(),
+        "human_messages": db.query(Message).filter(Message.sender == SenderType.HUMAN).count(),
+        "last_24h": db.query(Conversation).filter(Conversation.created_at >= last_24h).count(),
+    }
+
+def _old_daily_series(db, start: datetime, end: datetime) -> list:
+    """Serie diaria de mensajes de clientes agrupando las filas de messages."""
+    day = stats_rollup._truncate(db, "day", Message.created_at)
+    return db.execute(
+        select(day, func.count())
+        .where(Message.sender == SenderType.CUSTOMER, Message.created_at >= start, Message.created_at < end)
+        .group_by(day)
+        .order_by(day)
+    ).all()
+
+def _time(call: Callable, repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            call(db)
+            timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+def _report(name: str, timings: List[float]) -> None:
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<34} {statistics.median(timings):>10.1f} {p99:>10.1f}")
+
+def _add_messages(count: int) -> None:
+    with SessionLocal() as db:
+        conversation_ids = db.execute(select(Conversation.id).limit(1000)).scalars().all()
+        created_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.execute(insert(Message), [
+            {"conversation_id": conversation_ids[i % len(conversation_ids)], "sender": SenderType.CUSTOMER,
+             "content": "mensaje nuevo", "created_at": created_at}
+            for i in range(count)
+        ])
+        db.commit()
+
+def main(args) -> None:
+    # Los datos sintéticos llegan hasta ahora: agregar todo sin esperar el margen
+    settings.STATS_ROLLUP_LAG_SECONDS = 0
+    with SessionLocal() as db:
+        messages = db.query(func.count(Message.id)).scalar()
+        started = time.perf_counter()
+        advanced = stats_rollup.refresh_rollups(db)
+        print(f"{messages} mensajes; agregación inicial de {advanced} IDs: {time.perf_counter() - started:.1f} s\n")
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=30)
+    print(f"{'consulta':<34} {'p50 ms':>10} {'p99 ms':>10}")
+    _report("antes: /stats (9 COUNT)", _time(_old_stats, args.repeat))
+    _report("después: /stats", _time(lambda db: stats_api.get_stats(db, None), args.repeat))
+    _report("antes: serie diaria 30 días", _time(lambda db: _old_daily_series(db, start, end), args.repeat))
+    _report("después: serie diaria 30 días",
+            _time(lambda db: stats_rollup.series(db, "messages_customer", start, end, "day"), args.repeat))
+
+    _add_messages(args.new_messages)
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        stats_rollup.refresh_rollups(db)
+        print(f"\nrefresco incremental tras {args.new_messages} mensajes nuevos: "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--conversations", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--new-messages", type=int, default=10_000)
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(args.messages, args.conversations)
+    main(args)
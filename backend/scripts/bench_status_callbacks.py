@@ -0,0 +1,139 @@
+"""
+Benchmark de los callbacks de estado de Twilio (callbacks por segundo).
+
+Prepara `--messages` mensajes salientes con SID (datos de
+scripts.synthetic_data) y genera tres callbacks por mensaje (sent, delivered
+y read) en orden aleatorio, como llegan de Twilio. Mide:
+
+- ingesta: POST /webhook/twilio/status a la API en proceso (httpx + ASGI,
+  sin red), hasta `--concurrency` a la vez; solo se guardan en el buffer,
+- aplicación antes: un UPDATE y un commit por callback,
+- aplicación después: lotes de STATUS_CALLBACK_BATCH_SIZE sacados del buffer
+  con apply_batch, como run_flusher.
+
+Desde backend/ (con --fake-redis no hace falta un Redis):
+    DATABASE_URL=postgresql://... python -m scripts.bench_status_callbacks --messages 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import List
+import httpx
+from sqlalchemy import func, select, text, update
+from app.core import redis as app_redis
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, async_engine, engine
+from app.core.redis import get_async_redis
+from app.main import fastapi_app
+from app.models.message import DeliveryStatus, Message
+from app.services import status_callbacks
+from scripts.synthetic_data import PHONE_PREFIX, seed
+
+SID_PREFIX = "SMbench"
+
+_SYNTHETIC = (
+    "conversation_id IN (SELECT conversations.id FROM conversations "
+    "JOIN customers ON customers.id = conversations.customer_id WHERE customers.phone_number LIKE :phones)"
+)
+
+def _reset_statuses() -> List[str]:
+    """Los mensajes sintéticos a SENT con SID; devuelve los SID."""
+    params = {"prefix": SID_PREFIX, "phones": f"{PHONE_PREFIX}%"}
+    with engine.begin() as conn:
+        conn.execute(text(
+            "UPDATE messages SET twilio_sid = :prefix || id, delivery_status = 'SENT', delivery_error = NULL "
+            f"WHERE {_SYNTHETIC}"
+        ), params)
+        return conn.execute(text(f"SELECT twilio_sid FROM messages WHERE {_SYNTHETIC}"), params).scalars().all()
+
+def _callbacks(sids: List[str]) -> List[dict]:
+    forms = [{"MessageSid": sid, "MessageStatus": status} for sid in sids for status in ("sent", "delivered", "read")]
+    random.shuffle(forms)
+    return forms
+
+def _applied() -> int:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(Message)
+            .where(Message.twilio_sid.like(f"{SID_PREFIX}%"), Message.delivery_status == DeliveryStatus.READ)
+        ).scalar()
+
+async def _ingest(forms: List[dict], concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fastapi_app), base_url="http://api") as client:
+        async def post(form: dict) -> None:
+            async with semaphore:
+                response = await client.post("/webhook/twilio/status", data=form)
+            if response.status_code != 204:
+                raise RuntimeError(f"respuesta {response.status_code}")
+        started = time.perf_counter()
+        await asyncio.gather(*(post(form) for form in forms))
+        return time.perf_counter() - started
+
+async def _apply_one_by_one(forms: List[dict]) -> float:
+    """Antes: una transacción por callback (el estado tampoco retrocede)."""
+    started = time.perf_counter()
+    for form in forms:
+        status = status_callbacks.TWILIO_STATUSES[form["MessageStatus"]]
+        behind = [s for s, rank in status_callbacks.RANK.items() if rank < status_callbacks.RANK[status]]
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Message)
+                .where(Message.twilio_sid == form["MessageSid"], Message.delivery_status.in_(behind))
+                .values(delivery_status=status)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+    return time.perf_counter() - started
+
+async def _apply_batches() -> float:
+    """Después: vaciar el buffer por lotes con apply_batch."""
+    redis = get_async_redis()
+    started = time.perf_counter()
+    while True:
+        raw = await redis.lpop(status_callbacks.BUFFER_KEY, settings.STATUS_CALLBACK_BATCH_SIZE)
+        if not raw:
+            return time.perf_counter() - started
+        await status_callbacks.apply_batch([json.loads(item) for item in raw])
+
+async def main(args) -> None:
+    if args.fake_redis:
+        import fakeredis.aioredis
+        app_redis._async_redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    settings.TWILIO_VALIDATE_SIGNATURE = False
+    await get_async_redis().delete(status_callbacks.BUFFER_KEY, status_callbacks.RETRY_KEY)
+
+    sids = _reset_statuses()
+    forms = _callbacks(sids)
+    print(f"{len(sids)} mensajes, {len(forms)} callbacks, lotes de {settings.STATUS_CALLBACK_BATCH_SIZE}\n")
+    print(f"{'fase':<28} {'s':>8} {'callbacks/s':>12} {'en READ':>9}")
+
+    elapsed = await _ingest(forms, args.concurrency)
+    print(f"{'ingesta (webhook -> buffer)':<28} {elapsed:>8.1f} {len(forms) / elapsed:>12.0f} {'-':>9}")
+
+    if not args.skip_before:
+        sample = forms[:args.before_sample]
+        elapsed = await _apply_one_by_one(sample)
+        print(f"{'antes: 1 transacción c/u':<28} {elapsed:>8.1f} {len(sample) / elapsed:>12.0f} {'-':>9}")
+        _reset_statuses()
+
+    elapsed = await _apply_batches()
+    print(f"{'después: lotes':<28} {elapsed:>8.1f} {len(forms) / elapsed:>12.0f} {_applied():>9}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--before-sample", type=int, default=20_000,
+                        help="Callbacks aplicados uno a uno en la medida de antes (es lenta)")
+    parser.add_argument("--skip-before", action="store_true")
+    parser.add_argument("--skip-load", action="store_true", help="Usar los datos ya cargados")
+    parser.add_argument("--fake-redis", action="store_true", help="Redis en memoria en lugar de REDIS_URL")
+    args = parser.parse_args()
+
+    if not args.skip_load:
+        seed(args.messages, max(1, args.messages // 50))
+    asyncio.run(main(args))
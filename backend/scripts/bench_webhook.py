@@ -0,0 +1,124 @@
+"""
+Benchmark del webhook de Twilio (peticiones por segundo): antes y después.
+
+Envía `--requests` webhooks firmados a la API en proceso (httpx + ASGI, sin
+red), con hasta `--concurrency` en vuelo. Una fracción `--retries` son
+reintentos de Twilio (un MessageSid ya enviado). Se mide:
+
+- antes: el handler anterior, que llama a process_whatsapp_message.delay en el
+  event loop, construye un MessagingResponse por petición y no deduplica,
+- después: el webhook actual (firma validada, deduplicación por MessageSid en
+  Redis, .delay en un hilo y TwiML estático).
+
+La publicación en el broker de Celery se simula con una espera bloqueante de
+`--broker-ms` (un ida y vuelta a Redis); se cuentan las tareas encoladas.
+
+Desde backend/ (con --fake-redis no hace falta un Redis):
+    python -m scripts.bench_webhook --requests 5000 --concurrency 100 --broker-ms 2
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+from typing import List
+import httpx
+from fastapi import FastAPI, Request, Response
+from twilio.request_validator import RequestValidator
+from twilio.twiml.messaging_response import MessagingResponse
+from app.api import webhook
+from app.core import redis as app_redis
+from app.core.config import settings
+from app.main import fastapi_app
+
+URL = "http://api/webhook/twilio"
+
+def _old_app(delay) -> FastAPI:
+    """El webhook antes del cambio (solo la parte de Celery)."""
+    app = FastAPI()
+
+    @app.post("/webhook/twilio")
+    async def webhook_twilio(request: Request):
+        try:
+            form = await request.form()
+            message_data = {"from": form.get("From"), "body": form.get("Body")}
+            webhook.logger.info(f"🔵 WEBHOOK: Mensaje recibido: '{message_data['body']}' de {message_data['from']}")
+            result = delay(message_data)
+            webhook.logger.info(f"🔵 WEBHOOK: Tarea encolada con ID: {result.id}")
+            return Response(content=str(MessagingResponse()), media_type="application/xml")
+        except Exception as e:
+            webhook.logger.error(f"🔴 WEBHOOK ERROR: {e}", exc_info=True)
+            return Response(content=str(MessagingResponse()), media_type="application/xml")
+
+    return app
+
+def _requests(count: int, retries: float) -> List[dict]:
+    """Formularios firmados; una fracción `retries` repite un MessageSid anterior."""
+    validator = RequestValidator(settings.TWILIO_AUTH_TOKEN)
+    forms = []
+    for i in range(count):
+        if forms and random.random() < retries:
+            forms.append(random.choice(forms))
+            continue
+        form = {"MessageSid": f"SM{uuid.uuid4().hex}", "From": f"whatsapp:+502{i % 1000:08d}", "Body": "hola"}
+        forms.append({"form": form, "headers": {"X-Twilio-Signature": validator.compute_signature(URL, form)}})
+    return forms
+
+async def _run(app, forms: List[dict], concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://api") as client:
+        async def send(request: dict) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/webhook/twilio", data=request["form"], headers=request["headers"])
+                latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"respuesta {response.status_code}")
+        await asyncio.gather(*(send(request) for request in forms))
+    return latencies
+
+async def main(args) -> None:
+    if args.fake_redis:
+        import fakeredis.aioredis
+        app_redis._async_redis = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    settings.TWILIO_AUTH_TOKEN = settings.TWILIO_AUTH_TOKEN or "bench-token"
+    settings.TWILIO_VALIDATE_SIGNATURE = True
+    settings.TWILIO_WEBHOOK_BASE_URL = ""
+    settings.MESSAGE_PIPELINE = "celery"
+    webhook._validator.cache_clear()
+    logging.getLogger(webhook.__name__).setLevel(logging.WARNING)
+
+    enqueued = []
+    def delay(message_data: dict):
+        # Publicación bloqueante en el broker
+        time.sleep(args.broker_ms / 1000)
+        enqueued.append(message_data)
+        return SimpleNamespace(id=uuid.uuid4().hex)
+    webhook.process_whatsapp_message.delay = delay
+
+    forms = _requests(args.requests, args.retries)
+    unique = len({request["form"]["MessageSid"] for request in forms})
+    print(f"{args.requests} webhooks ({unique} MessageSid distintos), {args.concurrency} concurrentes, "
+          f"broker {args.broker_ms} ms\n")
+    print(f"{'webhook':<10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'tareas':>8}")
+    for name, app in [("antes", _old_app(delay)), ("después", fastapi_app)]:
+        enqueued.clear()
+        started = time.perf_counter()
+        latencies = sorted(await _run(app, forms, args.concurrency))
+        elapsed = time.perf_counter() - started
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{name:<10} {len(forms) / elapsed:>9.0f} {statistics.median(latencies):>9.1f} {p99:>9.1f} "
+              f"{len(enqueued):>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--broker-ms", type=float, default=2)
+    parser.add_argument("--retries", type=float, default=0.1, help="Fracción de reintentos de Twilio")
+    parser.add_argument("--fake-redis", action="store_true", help="Redis en memoria en lugar de REDIS_URL")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,135 @@
+"""
+Benchmark del reparto de eventos a WebSockets en un proceso (ws_broker).
+
+Conecta `--sockets` WebSockets simulados a una conversación; cada envío tarda
+`--send-ms` y `--slow` de ellos se quedan colgados. Compara el bucle anterior
+(send_json de uno en uno, serializando para cada cliente) con deliver_local
+(serializa una vez y encola en la cola de cada cliente) y mide:
+
+- tiempo de reparto: del evento a que lo tienen todos los clientes sanos,
+- memoria por conexión (tracemalloc) y RSS máximo del proceso.
+
+Desde backend/:
+    python -m scripts.bench_ws_fanout --sockets 10000 --events 20
+"""
+import argparse
+import asyncio
+import gc
+import json
+import resource
+import statistics
+import time
+import tracemalloc
+from typing import List
+from app.core import ws_broker
+from app.core.config import settings
+
+CONVERSATION_ID = 1
+
+class SimulatedWebSocket:
+    """Cliente con latencia de envío fija; los lentos no terminan nunca su envío."""
+
+    def __init__(self, send_seconds: float, slow: bool, done: "Progress"):
+        self.send_seconds = send_seconds
+        self.slow = slow
+        self.done = done
+
+    async def _send(self) -> None:
+        if self.slow:
+            await asyncio.Event().wait()
+        if self.send_seconds:
+            await asyncio.sleep(self.send_seconds)
+        self.done.tick()
+
+    async def send_text(self, data: str) -> None:
+        await self._send()
+
+    async def send_json(self, data: dict) -> None:
+        json.dumps(data)
+        await self._send()
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+class Progress:
+    """Cuenta entregas y avisa cuando llegan las esperadas."""
+
+    def __init__(self):
+        self.count = 0
+        self.target = 0
+        self.reached = asyncio.Event()
+
+    def expect(self, deliveries: int) -> None:
+        self.count, self.target = 0, deliveries
+        self.reached.clear()
+
+    def tick(self) -> None:
+        self.count += 1
+        if self.count >= self.target:
+            self.reached.set()
+
+async def _before(sockets: List[SimulatedWebSocket], payload: dict, timeout: float) -> None:
+    """notify_new_message antes del cambio: un send_json detrás de otro."""
+    for websocket in sockets:
+        try:
+            await asyncio.wait_for(websocket.send_json(payload), timeout)
+        except Exception:
+            pass
+
+def _report(name: str, timings: List[float]) -> None:
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<12} {statistics.median(timings):>10.1f} {p99:>10.1f}")
+
+async def main(args) -> None:
+    settings.WS_SEND_TIMEOUT_SECONDS = args.timeout
+    progress = Progress()
+    healthy = args.sockets - args.slow
+    sockets = [
+        SimulatedWebSocket(args.send_ms / 1000, slow=i < args.slow, done=progress)
+        for i in range(args.sockets)
+    ]
+    payload = {"type": "new_message", "message": {"id": 1, "content": "hola " * 40}}
+
+    gc.collect()
+    tracemalloc.start()
+    before_connect = tracemalloc.get_traced_memory()[0]
+    for websocket in sockets:
+        await ws_broker.connect(CONVERSATION_ID, websocket)
+    per_connection = (tracemalloc.get_traced_memory()[0] - before_connect) / args.sockets
+    tracemalloc.stop()
+    print(f"{args.sockets} sockets ({args.slow} colgados), envío {args.send_ms} ms, timeout {args.timeout} s")
+    print(f"memoria por conexión: {per_connection / 1024:.1f} KiB\n")
+    print(f"{'reparto':<12} {'p50 ms':>10} {'p99 ms':>10}")
+
+    if not args.skip_before:
+        timings = []
+        for _ in range(min(args.events, 3)):
+            progress.expect(healthy)
+            started = time.perf_counter()
+            await _before(sockets, payload, args.timeout)
+            timings.append((time.perf_counter() - started) * 1000)
+        _report("antes", timings)
+
+    timings = []
+    for seq in range(args.events):
+        progress.expect(healthy)
+        started = time.perf_counter()
+        ws_broker.deliver_local(CONVERSATION_ID, json.dumps({**payload, "seq": seq}))
+        await progress.reached.wait()
+        timings.append((time.perf_counter() - started) * 1000)
+    _report("después", timings)
+
+    await asyncio.sleep(args.timeout + 0.5)
+    print(f"\nconectados al final: {len(ws_broker.active_connections.get(CONVERSATION_ID, {}))} de {args.sockets}")
+    print(f"RSS máximo: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=10_000)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--send-ms", type=float, default=0.0)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=1.0, help="WS_SEND_TIMEOUT_SECONDS")
+    parser.add_argument("--skip-before", action="store_true", help="No medir el bucle anterior")
+    asyncio.run(main(parser.parse_args()))
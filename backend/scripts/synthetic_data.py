@@ -0,0 +1,126 @@
+"""
+Datos sintéticos de clientes, conversaciones y mensajes para los benchmarks.
+
+Carga en la base de DATABASE_URL (ya migrada en Postgres; en SQLite se crean
+las tablas) y deja al día el resumen desnormalizado de cada conversación
+(último mensaje, contadores), como lo mantiene append_message.
+
+En Postgres las filas se generan en el servidor con generate_series; en
+SQLite por lotes desde Python.
+
+Desde backend/:
+    python -m scripts.synthetic_data --conversations 100000 --messages 5000000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, insert, select, text
+from app.core.database import Base, engine
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.models.message import Message, SenderType
+import app.models  # noqa: F401  (registra todas las tablas en Base.metadata)
+
+WORDS = [
+    "hola", "laptop", "lenovo", "hp", "dell", "garantía", "envío", "precio", "cargador",
+    "pantalla", "batería", "factura", "tienda", "pedido", "devolución", "teclado", "mouse",
+    "monitor", "oferta", "crédito", "tarjeta", "efectivo", "horario", "sucursal", "gracias",
+    "ayuda", "problema", "reparación", "disponible", "modelo", "memoria", "disco", "impresora",
+]
+WORDS_PER_MESSAGE = 8
+PHONE_PREFIX = "whatsapp:+bench"
+BATCH_SIZE = 10_000
+
+# Resumen desnormalizado de cada conversación a partir de sus mensajes (Postgres y SQLite)
+_REFRESH_SUMMARY = """
+UPDATE conversations
+SET message_count = s.n,
+    last_message_at = s.last_at,
+    updated_at = s.last_at,
+    last_activity_at = s.last_at,
+    last_message_preview = substr(m.content, 1, 200)
+FROM (
+    SELECT conversation_id, count(*) AS n, max(id) AS last_id, max(created_at) AS last_at
+    FROM messages GROUP BY conversation_id
+) s
+JOIN messages m ON m.id = s.last_id
+WHERE conversations.id = s.conversation_id
+"""
+
+def _seed_postgres(conn, messages: int, conversations: int) -> None:
+    conn.execute(text(
+        "INSERT INTO customers (phone_number) "
+        "SELECT :prefix || g FROM generate_series(1, :n) g"
+    ), {"prefix": PHONE_PREFIX, "n": conversations})
+    conn.execute(text(
+        "INSERT INTO conversations (customer_id, status) "
+        "SELECT id, (ARRAY['BOT', 'HUMAN', 'ENDED']::conversationstatus[])[1 + id % 3] "
+        "FROM customers WHERE phone_number LIKE :prefix || '%'"
+    ), {"prefix": PHONE_PREFIX})
+    first_id, last_id = conn.execute(
+        select(func.min(Conversation.id), func.max(Conversation.id))
+        .join(Customer, Customer.id == Conversation.customer_id)
+        .where(Customer.phone_number.like(f"{PHONE_PREFIX}%"))
+    ).one()
+    word = f"(CAST(:words AS text[]))[1 + floor(random() * {len(WORDS)})::int]"
+    content = " || ' ' || ".join([word] * WORDS_PER_MESSAGE)
+    # Los IDs crecen con la fecha, como en producción
+    conn.execute(text(
+        "INSERT INTO messages (conversation_id, sender, content, created_at) "
+        f"SELECT :first_id + g % (:last_id - :first_id + 1), "
+        f"(ARRAY['CUSTOMER', 'BOT', 'HUMAN']::sendertype[])[1 + g % 3], {content}, "
+        "now() - (:n - g) * interval '1 second' "
+        "FROM generate_series(1, :n) g"
+    ), {"words": WORDS, "first_id": first_id, "last_id": last_id, "n": messages})
+
+def _seed_sqlite(conn, messages: int, conversations: int) -> None:
+    Base.metadata.create_all(conn)
+    conn.execute(insert(Customer), [{"phone_number": f"{PHONE_PREFIX}{i}"} for i in range(conversations)])
+    customer_ids = conn.execute(
+        select(Customer.id).where(Customer.phone_number.like(f"{PHONE_PREFIX}%"))
+    ).scalars().all()
+    statuses = list(ConversationStatus)
+    conn.execute(insert(Conversation), [
+        {"customer_id": cid, "status": statuses[cid % 3]} for cid in customer_ids
+    ])
+    conversation_ids = conn.execute(
+        select(Conversation.id)
+        .join(Customer, Customer.id == Conversation.customer_id)
+        .where(Customer.phone_number.like(f"{PHONE_PREFIX}%"))
+    ).scalars().all()
+    senders = list(SenderType)
+    now = datetime.now(timezone.utc)
+    for start in range(0, messages, BATCH_SIZE):
+        conn.execute(insert(Message), [
+            {
+                "conversation_id": conversation_ids[i % len(conversation_ids)],
+                "sender": senders[i % 3],
+                "content": " ".join(random.choices(WORDS, k=WORDS_PER_MESSAGE)),
+                "created_at": now - timedelta(seconds=messages - i),
+            }
+            for i in range(start, min(start + BATCH_SIZE, messages))
+        ])
+
+def seed(messages: int, conversations: int) -> None:
+    """Carga `conversations` conversaciones con `messages` mensajes repartidos entre ellas."""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            _seed_postgres(conn, messages, conversations)
+        else:
+            _seed_sqlite(conn, messages, conversations)
+        conn.execute(text(_REFRESH_SUMMARY))
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE"))
+    print(f"📥 {conversations} conversaciones y {messages} mensajes cargados en {time.perf_counter() - started:.1f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=100_000)
+    parser.add_argument("--messages", type=int, default=5_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    seed(args.messages, args.conversations)
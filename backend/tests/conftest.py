@@ -0,0 +1,45 @@
+"""
+Configuración común de las pruebas.
+
+Las pruebas usan Redis en memoria (fakeredis, con Lua) y una base SQLite en un
+fichero temporal. Las que necesitan Postgres (planes de consulta) usan
+TEST_POSTGRES_URL y se saltan si no está definida.
+
+Instalar dependencias y ejecutar desde backend/:
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import tempfile
+
+# Antes de importar la app: los motores y los ajustes se crean al importar
+_db_dir = tempfile.mkdtemp(prefix="asistente-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from app.core import redis as app_redis
+from app.core.database import Base, async_engine, engine
+import app.models  # noqa: F401  (registra todas las tablas en Base.metadata)
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Redis en memoria compartido por los clientes síncrono y asíncrono."""
+    server = fakeredis.FakeServer()
+    sync_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    async_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(app_redis, "_redis", sync_client)
+    monkeypatch.setattr(app_redis, "_async_redis", async_client)
+    return async_client
+
+@pytest.fixture
+async def db_tables():
+    """Tablas vacías en la base SQLite de pruebas."""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield
+    # Cada prueba corre en su propio event loop: no reutilizar conexiones async
+    await async_engine.dispose()
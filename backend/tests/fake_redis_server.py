@@ -0,0 +1,89 @@
+"""
+Redis en memoria (fakeredis) accesible por TCP, para pruebas con varios procesos.
+
+fakeredis solo se comparte dentro de un proceso; este servidor expone un
+FakeServer en localhost hablando RESP2 para que réplicas lanzadas como
+procesos aparte usen el mismo Redis con un REDIS_URL normal.
+"""
+import queue
+import socketserver
+import threading
+import fakeredis
+import redis
+from fakeredis._fakesocket import FakeSocket
+
+_CLOSED = object()
+
+def _encode(value) -> bytes:
+    if isinstance(value, redis.ResponseError):
+        return b"-" + str(value).replace("\r\n", " ").encode() + b"\r\n"
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, float):
+        value = repr(value).encode()
+    if isinstance(value, str):
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    raise TypeError(f"Respuesta de fakeredis no soportada: {value!r}")
+
+class _ConnectionHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        fake_socket = FakeSocket(self.server.fake_server, db=0)
+        responses = fake_socket.responses
+        # Las respuestas (y los mensajes de pub/sub) salen por su propio hilo
+        writer = threading.Thread(target=self._write, args=(responses,), daemon=True)
+        writer.start()
+        try:
+            while True:
+                data = self.request.recv(65536)
+                if not data:
+                    break
+                fake_socket.sendall(data)
+        except OSError:
+            pass
+        finally:
+            responses.put(_CLOSED)
+            fake_socket.close()
+            writer.join()
+
+    def _write(self, responses: queue.Queue) -> None:
+        while True:
+            response = responses.get()
+            if response is _CLOSED:
+                return
+            try:
+                self.request.sendall(_encode(response))
+            except OSError:
+                return
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class FakeRedisServer:
+    """Arranca en un puerto libre de localhost; `url` sirve como REDIS_URL."""
+
+    def __init__(self):
+        self._server = _ThreadingServer(("127.0.0.1", 0), _ConnectionHandler)
+        self._server.fake_server = fakeredis.FakeServer()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __enter__(self) -> "FakeRedisServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
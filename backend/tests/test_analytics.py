@@ -0,0 +1,102 @@
+"""Analítica por hora: percentiles de los histogramas y volcado idempotente de Redis a stats_hourly."""
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select
+from app.core.database import SessionLocal
+from app.core.redis import get_redis
+from app.models.stats import StatsHourly
+from app.services import analytics
+
+def test_percentile_interpolates_within_bucket():
+    # 100 latencias en (250, 500]: el p50 cae a mitad del bucket
+    assert analytics._percentile({"500": 100}, 0.5) == 375.0
+    assert analytics._percentile({"250": 50, "500": 50}, 0.5) == 250.0
+    assert analytics._percentile({"250": 50, "500": 50}, 0.9) == 450.0
+
+def test_percentile_empty_and_overflow():
+    assert analytics._percentile({}, 0.5) is None
+    assert analytics._percentile({"inf": 10}, 0.99) == float(analytics.LATENCY_BOUNDS_MS[-1])
+
+def test_latency_summary():
+    values = {"bot_response_ms:le:1000": 3, "bot_response_ms:count": 3, "bot_response_ms:sum": 2100}
+    summary = analytics._latency_summary(values, analytics.BOT_RESPONSE)
+    assert summary["count"] == 3
+    assert summary["avg"] == 700
+    assert summary["p50"] == 750.0
+
+@pytest.fixture
+def stats(fake_redis, db_tables):
+    def read():
+        db = SessionLocal()
+        try:
+            return {row.metric: row.value for row in db.execute(select(StatsHourly)).scalars()}
+        finally:
+            db.close()
+    return read
+
+async def test_flush_moves_counters_to_stats_hourly(stats):
+    for seconds in (0.2, 0.4, 1.5):
+        await analytics.record_bot_response(seconds)
+    await analytics.record_handoff_async(7)
+
+    db = SessionLocal()
+    try:
+        assert analytics.flush_pending(db) == 6
+        now = datetime.now(timezone.utc)
+        series = analytics.analytics_series(db, now - timedelta(hours=1), now + timedelta(hours=1))
+    finally:
+        db.close()
+
+    assert stats()["bot_response_ms:count"] == 3
+    assert series["summary"]["handoffs"] == 1
+    assert series["summary"]["bot_response_ms"]["count"] == 3
+    assert not get_redis().exists(analytics.PENDING_KEY, analytics.FLUSHING_KEY)
+
+async def test_flush_retried_after_crash_is_not_applied_twice(stats, monkeypatch):
+    await analytics.record_bot_response(0.2)
+    redis = get_redis()
+
+    # Cae tras el commit y antes de borrar el hash en Redis
+    delete = redis.delete
+
+    def crash(*keys):
+        monkeypatch.setattr(redis, "delete", delete)
+        raise ConnectionError("redis caído")
+
+    monkeypatch.setattr(redis, "delete", crash)
+    db = SessionLocal()
+    try:
+        with pytest.raises(ConnectionError):
+            analytics.flush_pending(db)
+    finally:
+        db.close()
+    assert redis.exists(analytics.FLUSHING_KEY)
+
+    db = SessionLocal()
+    try:
+        assert analytics.flush_pending(db) == 0
+    finally:
+        db.close()
+    assert stats()["bot_response_ms:count"] == 1
+    assert not redis.exists(analytics.FLUSHING_KEY)
+
+    # Lo registrado después sí se suma
+    await analytics.record_bot_response(0.3)
+    db = SessionLocal()
+    try:
+        analytics.flush_pending(db)
+    finally:
+        db.close()
+    assert stats()["bot_response_ms:count"] == 2
+
+async def test_flush_skips_while_another_holds_the_lock(stats):
+    await analytics.record_bot_response(0.2)
+    get_redis().set(analytics.FLUSH_LOCK_KEY, "otro-proceso")
+
+    db = SessionLocal()
+    try:
+        assert analytics.flush_pending(db) == 0
+    finally:
+        db.close()
+    assert stats() == {}
+    assert get_redis().exists(analytics.PENDING_KEY)
@@ -0,0 +1,148 @@
+"""Worker asyncio: orden por cliente, concurrencia entre clientes y recuperación tras caídas."""
+import asyncio
+import json
+from collections import defaultdict
+import pytest
+from app.core.config import settings
+from app.workers import async_worker
+
+PARTITIONS = 4
+
+@pytest.fixture
+def worker_settings(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "ASYNC_WORKER_PARTITIONS", PARTITIONS)
+    monkeypatch.setattr(settings, "MESSAGE_DEBOUNCE_MS", 0)
+    monkeypatch.setattr(settings, "ASYNC_WORKER_QUEUE", "test_incoming")
+    return fake_redis
+
+class FakePipeline:
+    """Sustituye la BD: registra el orden de ingesta y de respuesta por cliente."""
+
+    def __init__(self):
+        self.ingested = defaultdict(list)
+        self.replied = defaultdict(list)
+        self.release_replies = asyncio.Event()
+        self.release_replies.set()
+        self.reply_latency = 0.0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._next_id = 0
+
+    async def ingest(self, data):
+        # Ceder el loop para que las particiones se intercalen de verdad
+        await asyncio.sleep(0)
+        self._next_id += 1
+        self.ingested[data["from"]].append(data["body"])
+        return {"conversation_id": hash(data["from"]) % 1000, "message_id": self._next_id, "from": data["from"]}
+
+    async def reply(self, conversation_id, message_id, from_number):
+        await self.release_replies.wait()
+        # Simula la llamada a la IA: las respuestas de clientes distintos deben solaparse
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.reply_latency)
+        self.in_flight -= 1
+        self.replied[from_number].append(message_id)
+        return {"status": "success"}
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    pipeline = FakePipeline()
+    monkeypatch.setattr(async_worker, "ingest_incoming_message", pipeline.ingest)
+    monkeypatch.setattr(async_worker, "reply_to_turn", pipeline.reply)
+    return pipeline
+
+CONCURRENCY = 10
+
+async def _run_partitions(stop: asyncio.Event):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    return [
+        asyncio.create_task(async_worker._consume_partition(p, "test-owner", stop, semaphore))
+        for p in range(PARTITIONS)
+    ]
+
+async def _wait_until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("tiempo de espera agotado")
+        await asyncio.sleep(0.01)
+
+async def test_interleaved_bursts_keep_per_customer_order(worker_settings, fake_pipeline):
+    senders = ["whatsapp:+50211111111", "whatsapp:+50222222222", "whatsapp:+50233333333"]
+    # Ráfagas de tres clientes intercaladas, como llegan del webhook
+    expected = defaultdict(list)
+    for i in range(10):
+        for sender in senders:
+            body = f"{sender[-4:]}-{i}"
+            expected[sender].append(body)
+            await async_worker.enqueue_incoming_message({"from": sender, "body": body})
+
+    stop = asyncio.Event()
+    tasks = await _run_partitions(stop)
+    await _wait_until(lambda: sum(len(v) for v in fake_pipeline.replied.values()) == 30)
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    assert dict(fake_pipeline.ingested) == dict(expected)
+    for partition in range(PARTITIONS):
+        assert await worker_settings.llen(async_worker._queue_key(partition)) == 0
+        assert await worker_settings.llen(async_worker._processing_key(partition)) == 0
+        assert not await worker_settings.exists(async_worker._ingested_key(partition))
+
+async def test_slow_replies_run_concurrently_up_to_the_limit(worker_settings, fake_pipeline):
+    fake_pipeline.reply_latency = 0.2
+    senders = [f"whatsapp:+502{i:08d}" for i in range(2 * CONCURRENCY)]
+    for sender in senders:
+        await async_worker.enqueue_incoming_message({"from": sender, "body": "hola"})
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stop = asyncio.Event()
+    tasks = await _run_partitions(stop)
+    await _wait_until(lambda: sum(len(v) for v in fake_pipeline.replied.values()) == len(senders))
+    elapsed = loop.time() - started
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    # Dos tandas de CONCURRENCY respuestas, no una detrás de otra
+    assert fake_pipeline.max_in_flight == CONCURRENCY
+    assert elapsed < len(senders) * fake_pipeline.reply_latency / 4
+
+async def test_message_stays_in_processing_until_replied(worker_settings, fake_pipeline):
+    sender = "whatsapp:+50244444444"
+    partition = async_worker.partition_for(sender)
+    fake_pipeline.release_replies.clear()
+    await async_worker.enqueue_incoming_message({"from": sender, "body": "hola"})
+
+    stop = asyncio.Event()
+    tasks = await _run_partitions(stop)
+    await _wait_until(lambda: fake_pipeline.ingested[sender])
+    # Guardado pero sin responder: sigue en 'processing' con su turno apuntado
+    assert await worker_settings.llen(async_worker._processing_key(partition)) == 1
+    assert await worker_settings.hlen(async_worker._ingested_key(partition)) == 1
+
+    fake_pipeline.release_replies.set()
+    await _wait_until(lambda: fake_pipeline.replied[sender])
+    stop.set()
+    await asyncio.gather(*tasks)
+    assert await worker_settings.llen(async_worker._processing_key(partition)) == 0
+
+async def test_recovered_message_is_not_ingested_twice(worker_settings, fake_pipeline):
+    sender = "whatsapp:+50255555555"
+    partition = async_worker.partition_for(sender)
+    raw = json.dumps({"from": sender, "body": "hola"})
+    # Estado que deja un worker que cayó tras guardar el mensaje y antes de responder
+    await worker_settings.rpush(async_worker._processing_key(partition), raw)
+    turn = {"conversation_id": 7, "message_id": 42, "from": sender}
+    await worker_settings.hset(async_worker._ingested_key(partition), raw, json.dumps(turn))
+
+    stop = asyncio.Event()
+    tasks = await _run_partitions(stop)
+    await _wait_until(lambda: fake_pipeline.replied[sender])
+    stop.set()
+    await asyncio.gather(*tasks)
+
+    assert fake_pipeline.ingested[sender] == []
+    assert fake_pipeline.replied[sender] == [42]
+    assert await worker_settings.llen(async_worker._processing_key(partition)) == 0
@@ -0,0 +1,91 @@
+"""Registro y login: bcrypt en su pool acotado, sin ocupar el threadpool de los endpoints."""
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from app.api.deps import get_current_active_user
+from app.core import security
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.main import fastapi_app
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.user import User
+
+HASH_SECONDS = 0.3
+
+@pytest.fixture
+async def api(db_tables):
+    transport = httpx.ASGITransport(app=fastapi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+        yield client
+    fastapi_app.dependency_overrides.clear()
+
+@pytest.fixture
+def slow_bcrypt(monkeypatch):
+    """bcrypt lento que registra el hilo y cuántos hashes corren a la vez."""
+    calls = {"threads": set(), "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+
+    def slow(result):
+        def run(*args):
+            with lock:
+                calls["threads"].add(threading.current_thread().name)
+                calls["in_flight"] += 1
+                calls["max_in_flight"] = max(calls["max_in_flight"], calls["in_flight"])
+            time.sleep(HASH_SECONDS)
+            with lock:
+                calls["in_flight"] -= 1
+            return result
+        return run
+
+    monkeypatch.setattr(security, "verify_password", slow(False))
+    monkeypatch.setattr(security, "get_password_hash", slow("hash"))
+    return calls
+
+async def test_register_and_login(api):
+    registered = await api.post("/auth/register", json={"username": "ana", "email": "ana@example.com", "password": "secreta"})
+    assert registered.status_code == 200
+    assert "hashed_password" not in registered.json()
+
+    login = await api.post("/auth/login", data={"username": "ana", "password": "secreta"})
+    assert login.status_code == 200
+    assert login.json()["token_type"] == "bearer"
+
+    wrong = await api.post("/auth/login", data={"username": "ana", "password": "otra"})
+    assert wrong.status_code == 401
+
+async def test_bcrypt_runs_in_its_own_bounded_pool(api, slow_bcrypt):
+    await api.post("/auth/register", json={"username": "ana", "email": "ana@example.com", "password": "secreta"})
+
+    responses = await asyncio.gather(*(api.post("/auth/login", data={"username": "ana", "password": "x"})
+                                       for _ in range(settings.PASSWORD_HASH_WORKERS * 3)))
+
+    assert {response.status_code for response in responses} == {401}
+    assert slow_bcrypt["max_in_flight"] == settings.PASSWORD_HASH_WORKERS
+    assert all(name.startswith("bcrypt") for name in slow_bcrypt["threads"])
+
+async def test_logins_do_not_starve_db_endpoints(api, slow_bcrypt):
+    await api.post("/auth/register", json={"username": "ana", "email": "ana@example.com", "password": "secreta"})
+    db = SessionLocal()
+    try:
+        conversation = Conversation(customer=Customer(phone_number="whatsapp:+50212345678"))
+        db.add(conversation)
+        db.commit()
+        conversation_id = conversation.id
+    finally:
+        db.close()
+    fastapi_app.dependency_overrides[get_current_active_user] = lambda: User(id=1, email="agente@test", is_active=True)
+
+    # Muchos logins en cola de bcrypt; el endpoint síncrono (threadpool) responde sin esperarlos
+    logins = asyncio.gather(*(api.post("/auth/login", data={"username": "ana", "password": "x"})
+                              for _ in range(settings.PASSWORD_HASH_WORKERS * 5)))
+    await asyncio.sleep(0.05)
+    started = time.perf_counter()
+    header = await api.get(f"/conversations/{conversation_id}")
+    elapsed = time.perf_counter() - started
+    await logins
+
+    assert header.status_code == 200
+    assert elapsed < HASH_SECONDS
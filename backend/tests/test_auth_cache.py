@@ -0,0 +1,152 @@
+"""Caché de autenticación: tokens verificados, usuarios en memoria y Redis, y token_version."""
+import time
+from collections import OrderedDict
+from datetime import timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from app.api import deps
+from app.core import auth_cache
+from app.core.config import settings
+from app.core.database import SessionLocal, async_engine
+from app.core.security import create_access_token
+from app.models.user import User
+from app.services.user_service import deactivate_user
+
+@pytest.fixture
+def caches(monkeypatch, fake_redis):
+    """Cachés vacías de este proceso; devuelve una función que las vacía (como otra réplica)."""
+    monkeypatch.setattr(auth_cache, "_tokens", OrderedDict())
+    monkeypatch.setattr(auth_cache, "_users", {})
+    return lambda: auth_cache._users.clear()
+
+@pytest.fixture
+def user(caches, db_tables):
+    db = SessionLocal()
+    try:
+        user = User(username="ana", email="ana@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        db.expunge(user)
+        return user
+    finally:
+        db.close()
+
+@pytest.fixture
+def queries():
+    """Cuenta las consultas del motor asíncrono (el que usa get_current_user)."""
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+
+def _token(user, version=None, expires=timedelta(minutes=5)):
+    version = user.token_version if version is None else version
+    return create_access_token({"sub": user.username, "uid": user.id, "ver": version}, expires)
+
+def _data(user_id=1, version=0, active=True):
+    return {"id": user_id, "username": "ana", "email": "ana@example.com", "is_active": active, "token_version": version}
+
+def test_token_payload_is_cached_until_it_expires(caches):
+    auth_cache.remember_token("vigente", {"sub": "ana", "exp": time.time() + 60})
+    auth_cache.remember_token("caducado", {"sub": "ana", "exp": time.time() - 1})
+
+    assert auth_cache.get_token_payload("vigente")["sub"] == "ana"
+    assert auth_cache.get_token_payload("caducado") is None
+    assert "caducado" not in auth_cache._tokens
+    assert auth_cache.get_token_payload("desconocido") is None
+
+def test_token_cache_evicts_least_recently_used(caches, monkeypatch):
+    monkeypatch.setattr(auth_cache, "TOKEN_CACHE_MAX_ENTRIES", 2)
+    payload = {"sub": "ana", "exp": time.time() + 60}
+    auth_cache.remember_token("a", payload)
+    auth_cache.remember_token("b", payload)
+    auth_cache.get_token_payload("a")
+
+    auth_cache.remember_token("c", payload)
+
+    assert list(auth_cache._tokens) == ["a", "c"]
+
+async def test_user_is_shared_between_replicas_through_redis(caches, fake_redis):
+    await auth_cache.remember_user(User(**_data(version=2)))
+    assert await auth_cache.get_user(1) == _data(version=2)
+
+    # Otra réplica: sin caché en memoria, lo lee de Redis
+    caches()
+    assert await auth_cache.get_user(1) == _data(version=2)
+    ttl = await fake_redis.ttl("auth:users:1")
+    assert 0 < ttl <= settings.AUTH_USER_CACHE_REDIS_TTL_SECONDS
+
+async def test_local_entry_expires_after_its_ttl(caches, monkeypatch):
+    monkeypatch.setattr(settings, "AUTH_USER_CACHE_TTL_SECONDS", -1)
+    auth_cache._remember_local(_data())
+    assert await auth_cache.get_user(1) is None
+
+async def test_older_token_version_never_overwrites_a_newer_one(caches):
+    # Una petición que leyó al usuario antes de desactivarlo llega tarde
+    await auth_cache.remember_user(User(**_data(version=3, active=False)))
+    await auth_cache.remember_user(User(**_data(version=2)))
+
+    assert await auth_cache.get_user(1) == _data(version=3, active=False)
+    caches()
+    assert await auth_cache.get_user(1) == _data(version=3, active=False)
+
+async def test_redis_errors_fall_back_to_the_database(caches, monkeypatch):
+    class Down:
+        async def hget(self, *args):
+            raise ConnectionError("redis caído")
+        async def eval(self, *args):
+            raise ConnectionError("redis caído")
+    monkeypatch.setattr(auth_cache, "get_async_redis", lambda: Down())
+
+    assert await auth_cache.get_user(1) is None
+    assert await auth_cache.remember_user(User(**_data())) == _data()
+
+async def test_repeated_requests_do_not_query_the_database(user, queries):
+    token = _token(user)
+
+    first = await deps.get_current_user(token)
+    after_first = len(queries)
+    second = await deps.get_current_user(token)
+
+    assert first.id == second.id == user.id
+    assert after_first == 1
+    assert len(queries) == after_first
+    assert token in auth_cache._tokens
+
+async def test_deactivation_rejects_tokens_of_the_old_version(user, queries):
+    old_token = _token(user)
+    await deps.get_current_user(old_token)
+
+    db = SessionLocal()
+    try:
+        deactivate_user(db, db.get(User, user.id))
+    finally:
+        db.close()
+
+    with pytest.raises(HTTPException) as rejected:
+        await deps.get_current_user(old_token)
+    assert rejected.value.status_code == 401
+    # El token nuevo pasa la autenticación, pero el usuario está inactivo
+    current = await deps.get_current_user(_token(user, version=1))
+    assert current.is_active is False
+    with pytest.raises(HTTPException):
+        deps.get_current_active_user(current)
+
+async def test_tokens_without_uid_are_resolved_by_username(user, queries):
+    token = create_access_token({"sub": user.username}, timedelta(minutes=5))
+
+    assert (await deps.get_current_user(token)).id == user.id
+    await deps.get_current_user(token)
+    # Sin uid no hay caché de usuario: una consulta por petición
+    assert len(queries) == 2
+
+async def test_invalid_tokens_are_rejected(user):
+    with pytest.raises(HTTPException):
+        await deps.get_current_user("no-es-un-jwt")
+    with pytest.raises(HTTPException):
+        await deps.get_current_user(_token(user, expires=timedelta(seconds=-1)))
+    assert auth_cache._tokens == OrderedDict()
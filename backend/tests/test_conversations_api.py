@@ -0,0 +1,159 @@
+"""Bandeja de conversaciones, cabecera con ETag, marcado como leída por POST y envío de agente."""
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from app.api import conversations as conversations_api
+from app.api.deps import get_current_active_user
+from app.core.database import SessionLocal
+from app.main import fastapi_app
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.models.message import DeliveryStatus, Message, SenderType
+from app.models.user import User
+from app.services import twilio_service
+
+@pytest.fixture
+def client(db_tables):
+    fastapi_app.dependency_overrides[get_current_active_user] = lambda: User(id=1, email="agente@test", is_active=True)
+    # Sin `with`: no arranca el lifespan (bus de eventos, suscriptores)
+    yield TestClient(fastapi_app)
+    fastapi_app.dependency_overrides.clear()
+
+@pytest.fixture
+def conversation_id(db_tables):
+    db = SessionLocal()
+    try:
+        conversation = Conversation(customer=Customer(phone_number="whatsapp:+50212345678"), unread_count=3)
+        db.add(conversation)
+        db.commit()
+        return conversation.id
+    finally:
+        db.close()
+
+def _unread(conversation_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.get(Conversation, conversation_id).unread_count
+    finally:
+        db.close()
+
+def test_get_does_not_mark_as_read(client, conversation_id):
+    response = client.get(f"/conversations/{conversation_id}")
+
+    assert response.status_code == 200
+    assert response.json()["unread_count"] == 3
+    assert _unread(conversation_id) == 3
+
+    # Sin cambios: 304 y tampoco escribe
+    cached = client.get(f"/conversations/{conversation_id}", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+    assert _unread(conversation_id) == 3
+
+def test_post_read_resets_unread_and_changes_etag(client, conversation_id):
+    etag = client.get(f"/conversations/{conversation_id}").headers["ETag"]
+
+    response = client.post(f"/conversations/{conversation_id}/read")
+
+    assert response.status_code == 200
+    assert _unread(conversation_id) == 0
+    refreshed = client.get(f"/conversations/{conversation_id}", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.json()["unread_count"] == 0
+
+def test_read_unknown_conversation(client, db_tables):
+    assert client.post("/conversations/999/read").status_code == 404
+
+@pytest.fixture
+def inbox(db_tables):
+    """Cinco conversaciones; la 2 tuvo actividad (updated_at) y las demás no. Devuelve los IDs."""
+    t0 = datetime(2026, 10, 1, 12, 0, 0)
+    db = SessionLocal()
+    try:
+        conversations = [
+            Conversation(
+                customer=Customer(phone_number=f"whatsapp:+5020000000{i}"),
+                status=ConversationStatus.HUMAN if i % 2 else ConversationStatus.BOT,
+                created_at=t0 + timedelta(minutes=i),
+                last_message_preview=f"mensaje {i}",
+                message_count=i,
+            )
+            for i in range(5)
+        ]
+        conversations[2].updated_at = t0 + timedelta(hours=1)
+        db.add_all(conversations)
+        db.commit()
+        return [conversation.id for conversation in conversations]
+    finally:
+        db.close()
+
+def test_inbox_orders_by_activity_and_uses_summary_columns(client, inbox):
+    items = client.get("/conversations/").json()
+
+    assert [item["id"] for item in items] == [inbox[2], inbox[4], inbox[3], inbox[1], inbox[0]]
+    assert items[0]["last_message"] == "mensaje 2"
+    assert items[0]["message_count"] == 2
+    assert items[0]["customer_phone"] == "whatsapp:+50200000002"
+
+def test_inbox_cursor_walks_every_conversation_once(client, inbox):
+    seen, params = [], {"limit": 2}
+    while True:
+        response = client.get("/conversations/", params=params)
+        seen.extend(item["id"] for item in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params = {"limit": 2, "cursor": response.headers["X-Next-Cursor"]}
+
+    assert seen == [inbox[2], inbox[4], inbox[3], inbox[1], inbox[0]]
+
+def test_inbox_status_filter(client, inbox):
+    items = client.get("/conversations/", params={"status": "human"}).json()
+    assert [item["id"] for item in items] == [inbox[3], inbox[1]]
+
+def test_inbox_rejects_bad_cursor(client, inbox):
+    assert client.get("/conversations/", params={"cursor": "no-es-un-cursor"}).status_code == 400
+
+@pytest.fixture
+def agent_send(client, conversation_id, fake_redis, monkeypatch):
+    """Envío de agente sin Celery ni Twilio: registra lo encolado y cualquier llamada HTTP a Twilio."""
+    enqueued, twilio_calls = [], []
+    monkeypatch.setattr(conversations_api, "enqueue_delivery", enqueued.append)
+    monkeypatch.setattr(twilio_service, "_async_http", httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: twilio_calls.append(request) or httpx.Response(201, json={}))
+    ))
+    return enqueued, twilio_calls
+
+def test_agent_send_persists_and_enqueues_without_calling_twilio(client, conversation_id, agent_send):
+    enqueued, twilio_calls = agent_send
+
+    response = client.post(f"/conversations/{conversation_id}/messages", json={"content": "hola", "sender": "bot"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["delivery_status"] == DeliveryStatus.QUEUED.value
+    assert enqueued == [body["id"]]
+    assert twilio_calls == []
+    db = SessionLocal()
+    try:
+        message = db.get(Message, body["id"])
+        assert message.sender == SenderType.HUMAN
+        assert db.get(Conversation, conversation_id).unread_count == 0
+    finally:
+        db.close()
+
+def test_agent_send_survives_enqueue_failure(client, conversation_id, agent_send, monkeypatch):
+    def broker_down(message_id):
+        raise ConnectionError("broker caído")
+    monkeypatch.setattr(conversations_api, "enqueue_delivery", broker_down)
+
+    response = client.post(f"/conversations/{conversation_id}/messages", json={"content": "hola", "sender": "human"})
+
+    # Guardado y en QUEUED: requeue_stale_deliveries lo volverá a encolar
+    assert response.status_code == 200
+    assert response.json()["delivery_status"] == DeliveryStatus.QUEUED.value
+
+def test_agent_send_to_unknown_conversation(client, agent_send, db_tables):
+    enqueued, _ = agent_send
+    response = client.post("/conversations/999/messages", json={"content": "hola", "sender": "human"})
+    assert response.status_code == 404
+    assert enqueued == []
@@ -0,0 +1,80 @@
+"""Bus de eventos sobre Redis Streams: reproducción al reconectar y reclamo de pendientes de réplicas caídas."""
+import pytest
+from app.core import event_bus
+from app.core.config import settings
+
+@pytest.fixture
+def stream(monkeypatch, fake_redis):
+    monkeypatch.setattr(settings, "EVENT_STREAM", "test:events")
+    # Páginas pequeñas para recorrer el stream en varias vueltas
+    monkeypatch.setattr(event_bus, "REPLAY_PAGE_SIZE", 3)
+    return fake_redis
+
+async def test_replay_returns_later_events_of_the_conversation(stream):
+    first = await event_bus.publish_async(event_bus.NEW_MESSAGE, 1, {"id": 1, "content": "hola"})
+    for i in range(7):
+        # Eventos de otras conversaciones en medio: la réplica tiene que pasar de página
+        await event_bus.publish_async(event_bus.NEW_MESSAGE, 2, {"id": 100 + i})
+    second = event_bus.publish(event_bus.STATUS_CHANGE, 1, {"status": "HUMAN"})
+    await event_bus.publish_async(event_bus.NEW_MESSAGE, 2, {"id": 200})
+
+    events = await event_bus.replay(1, first)
+
+    assert events == [{"type": event_bus.STATUS_CHANGE, "conversation_id": 1, "event_id": second, "status": "HUMAN"}]
+    assert [event["id"] for event in await event_bus.replay(2, first)] == list(range(100, 107)) + [200]
+
+async def test_replay_expands_batched_status_changes(stream):
+    start = await event_bus.publish_async(event_bus.NEW_MESSAGE, 1, {"id": 1})
+    batch = await event_bus.publish_async(event_bus.STATUS_CHANGE_BATCH, 0, {"status": "ENDED", "conversation_ids": [1, 3]})
+
+    assert await event_bus.replay(1, start) == [
+        {"type": event_bus.STATUS_CHANGE, "conversation_id": 1, "event_id": batch, "status": "ENDED"}
+    ]
+    assert await event_bus.replay(2, start) == []
+
+async def test_replay_respects_the_limit(stream):
+    start = await event_bus.publish_async(event_bus.NEW_MESSAGE, 1, {"id": 0})
+    for i in range(1, 8):
+        await event_bus.publish_async(event_bus.NEW_MESSAGE, 1, {"id": i})
+
+    assert [event["id"] for event in await event_bus.replay(1, start, limit=4)] == [1, 2, 3, 4]
+
+async def test_pending_events_of_a_dead_replica_are_claimed(stream, monkeypatch):
+    await stream.xgroup_create(settings.EVENT_STREAM, event_bus.CONSUMER_GROUP, id="$", mkstream=True)
+    # Más de una página de XAUTOCLAIM (100)
+    for i in range(150):
+        await event_bus.publish_async(event_bus.NEW_MESSAGE, 1, {"id": i})
+    # La réplica caída leyó los eventos pero no llegó a confirmarlos
+    await stream.xreadgroup(event_bus.CONSUMER_GROUP, "dead", {settings.EVENT_STREAM: ">"}, count=200)
+    assert (await stream.xpending(settings.EVENT_STREAM, event_bus.CONSUMER_GROUP))["pending"] == 150
+
+    handled = []
+    async def handler(event):
+        handled.append(event["id"])
+
+    # Aún recientes: no se reclaman
+    await event_bus._claim_pending(stream, handler, "alive")
+    assert handled == []
+
+    monkeypatch.setattr(event_bus, "CLAIM_MIN_IDLE_MS", 0)
+    await event_bus._claim_pending(stream, handler, "alive")
+    assert handled == list(range(150))
+    assert (await stream.xpending(settings.EVENT_STREAM, event_bus.CONSUMER_GROUP))["pending"] == 0
+
+async def test_events_are_acked_even_if_delivery_fails(stream):
+    await stream.xgroup_create(settings.EVENT_STREAM, event_bus.CONSUMER_GROUP, id="$", mkstream=True)
+    for i in range(3):
+        await event_bus.publish_async(event_bus.NEW_MESSAGE, 1, {"id": i})
+    [(_, entries)] = await stream.xreadgroup(event_bus.CONSUMER_GROUP, "api-1", {settings.EVENT_STREAM: ">"}, count=10)
+    # Recortado por MAXLEN antes de procesarse: llega sin campos
+    entries[2] = (entries[2][0], {})
+
+    handled = []
+    async def handler(event):
+        handled.append(event["id"])
+        raise RuntimeError("socket roto")
+
+    await event_bus._handle_batch(stream, handler, entries)
+
+    assert handled == [0, 1]
+    assert (await stream.xpending(settings.EVENT_STREAM, event_bus.CONSUMER_GROUP))["pending"] == 0
@@ -0,0 +1,121 @@
+"""Cierre por inactividad con reloj simulado (run_once con `close` inyectable)."""
+from typing import Dict, List
+import pytest
+from app.core.config import settings
+from app.services import conversation_expiry
+from app.workers import expiry_scheduler
+
+T0 = 1_800_000_000.0
+TIMEOUT = settings.INACTIVITY_TIMEOUT_MINUTES * 60
+
+class FakeConversations:
+    """Sustituye la tabla: last_activity_at (epoch) de cada conversación activa."""
+
+    def __init__(self):
+        self.now = T0
+        # Desfase del reloj de la BD respecto al de la app (segundos)
+        self.db_offset = 0.0
+        self.checks = 0
+        self.last_activity: Dict[int, float] = {}
+        self.closed: List[int] = []
+
+    def touch(self, conversation_id: int, at: float) -> None:
+        self.last_activity[conversation_id] = at
+
+    async def close(self, conversation_ids: List[int]):
+        # Misma condición que close_expired, con el reloj simulado de la BD
+        self.checks += 1
+        limit = self.now + self.db_offset - TIMEOUT + expiry_scheduler.CLOCK_TOLERANCE_SECONDS
+        closed = [cid for cid in conversation_ids if cid in self.last_activity and self.last_activity[cid] < limit]
+        for cid in closed:
+            del self.last_activity[cid]
+        self.closed.extend(closed)
+        return closed, {cid: self.last_activity[cid] for cid in conversation_ids if cid in self.last_activity}
+
+    async def run_once(self, now: float) -> int:
+        self.now = now
+        return await expiry_scheduler.run_once(now, close=self.close)
+
+@pytest.fixture
+def conversations(fake_redis, monkeypatch):
+    notified = []
+
+    async def fake_notify(conversation_ids, status):
+        notified.append((list(conversation_ids), status))
+
+    monkeypatch.setattr(expiry_scheduler, "notify_status_change_batch", fake_notify)
+    fake = FakeConversations()
+    fake.notified = notified
+    return fake
+
+async def _deadline(redis, conversation_id: int):
+    return await redis.zscore(conversation_expiry.EXPIRY_KEY, str(conversation_id))
+
+async def test_closes_exactly_at_deadline(conversations, fake_redis):
+    conversations.touch(1, T0)
+    await conversation_expiry.schedule_expiry_async(1, clock=lambda: T0)
+
+    assert await conversations.run_once(T0 + TIMEOUT - 1) == 0
+    assert await conversations.run_once(T0 + TIMEOUT) == 1
+    assert conversations.closed == [1]
+    assert conversations.notified == [([1], "ended")]
+    assert await _deadline(fake_redis, 1) is None
+
+async def test_activity_reschedules_through_schedule_expiry(conversations, fake_redis):
+    conversations.touch(1, T0)
+    await conversation_expiry.schedule_expiry_async(1, clock=lambda: T0)
+    conversations.touch(1, T0 + 60)
+    await conversation_expiry.schedule_expiry_async(1, clock=lambda: T0 + 60)
+
+    assert await conversations.run_once(T0 + TIMEOUT) == 0
+    assert await conversations.run_once(T0 + 60 + TIMEOUT) == 1
+
+async def test_unscheduled_activity_reschedules_from_last_activity(conversations, fake_redis):
+    # Actividad que llegó a la BD pero no a Redis (p. ej. Redis caído en ese momento)
+    conversations.touch(1, T0)
+    await conversation_expiry.schedule_expiry_async(1, clock=lambda: T0)
+    conversations.touch(1, T0 + 120)
+
+    assert await conversations.run_once(T0 + TIMEOUT) == 0
+    # Se reprograma al vencimiento real, no a now + CLOCK_TOLERANCE_SECONDS
+    assert await _deadline(fake_redis, 1) == T0 + 120 + TIMEOUT
+
+    # En medio no vuelve a consultarse la BD
+    assert await conversations.run_once(T0 + TIMEOUT + 60) == 0
+    assert conversations.closed == []
+    assert await conversations.run_once(T0 + 120 + TIMEOUT) == 1
+
+async def test_clock_skew_retries_after_tolerance(conversations, fake_redis):
+    # El reloj de la BD va 10 s por detrás del de la app
+    conversations.db_offset = -10
+    conversations.touch(1, T0)
+    await conversation_expiry.schedule_expiry_async(1, clock=lambda: T0)
+
+    now = T0 + TIMEOUT
+    while not await conversations.run_once(now):
+        deadline = await _deadline(fake_redis, 1)
+        assert deadline == now + expiry_scheduler.CLOCK_TOLERANCE_SECONDS
+        now = deadline
+    assert now == T0 + TIMEOUT + 10
+    assert conversations.checks == 6
+
+async def test_retry_never_moves_a_later_deadline_earlier(conversations, fake_redis):
+    await conversation_expiry.schedule_expiry_async(1, clock=lambda: T0 + 60)
+    await conversation_expiry.retry_later({1: T0 + TIMEOUT})
+    assert await _deadline(fake_redis, 1) == T0 + 60 + TIMEOUT
+
+async def test_ended_conversations_are_dropped(conversations, fake_redis):
+    await conversation_expiry.schedule_expiry_async(2, clock=lambda: T0)
+
+    assert await conversations.run_once(T0 + TIMEOUT) == 0
+    assert await _deadline(fake_redis, 2) is None
+
+async def test_processes_all_batches(conversations, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "INACTIVITY_SWEEP_BATCH_SIZE", 3)
+    for cid in range(1, 11):
+        conversations.touch(cid, T0)
+        await conversation_expiry.schedule_expiry_async(cid, clock=lambda: T0)
+
+    assert await conversations.run_once(T0 + TIMEOUT) == 10
+    assert sorted(conversations.closed) == list(range(1, 11))
+    assert len(conversations.notified) == 4
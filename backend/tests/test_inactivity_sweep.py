@@ -0,0 +1,82 @@
+"""Barrido periódico de inactividad (SQLite): UPDATE por lotes y un evento por lote."""
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.workers import tasks
+
+STALE = datetime.now(timezone.utc) - timedelta(minutes=settings.INACTIVITY_TIMEOUT_MINUTES + 10)
+FRESH = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+@pytest.fixture
+def notified(monkeypatch, db_tables):
+    batches = []
+    monkeypatch.setattr(tasks, "notify_status_change_batch_sync", lambda ids, status: batches.append((list(ids), status)))
+    monkeypatch.setattr(settings, "INACTIVITY_SWEEP_BATCH_SIZE", 2)
+    return batches
+
+def _conversations(*rows):
+    """Crea conversaciones (estado, last_activity_at); devuelve sus IDs en orden."""
+    db = SessionLocal()
+    try:
+        conversations = [
+            Conversation(customer=Customer(phone_number=f"whatsapp:+502{i:08d}"), status=status, last_activity_at=at)
+            for i, (status, at) in enumerate(rows)
+        ]
+        db.add_all(conversations)
+        db.commit()
+        return [conversation.id for conversation in conversations]
+    finally:
+        db.close()
+
+def _state(conversation_id):
+    db = SessionLocal()
+    try:
+        conversation = db.get(Conversation, conversation_id)
+        return conversation.status, conversation.last_activity_at.replace(tzinfo=timezone.utc)
+    finally:
+        db.close()
+
+def test_closes_stale_conversations_in_batches(notified):
+    stale = _conversations(*[(ConversationStatus.BOT, STALE - timedelta(minutes=i)) for i in range(3)],
+                           (ConversationStatus.HUMAN, STALE), (ConversationStatus.BOT, STALE))
+
+    assert tasks.close_inactive_conversations() == 5
+
+    # Lotes de INACTIVITY_SWEEP_BATCH_SIZE, un evento por lote
+    assert [len(ids) for ids, _ in notified] == [2, 2, 1]
+    assert sorted(cid for ids, _ in notified for cid in ids) == sorted(stale)
+    assert {status for _, status in notified} == {ConversationStatus.ENDED.value}
+    assert all(_state(cid)[0] == ConversationStatus.ENDED for cid in stale)
+
+def test_leaves_recent_and_ended_conversations_alone(notified):
+    fresh, ended = _conversations((ConversationStatus.BOT, FRESH), (ConversationStatus.ENDED, STALE))
+
+    assert tasks.close_inactive_conversations() == 0
+
+    assert notified == []
+    assert _state(fresh)[0] == ConversationStatus.BOT
+    assert _state(ended)[0] == ConversationStatus.ENDED
+
+def test_closing_is_not_activity(notified):
+    [conversation_id] = _conversations((ConversationStatus.HUMAN, STALE))
+
+    tasks.close_inactive_conversations()
+
+    status, last_activity_at = _state(conversation_id)
+    assert status == ConversationStatus.ENDED
+    assert abs(last_activity_at - STALE) < timedelta(seconds=1)
+
+def test_oldest_conversations_close_first(notified):
+    newest, oldest, older = _conversations(
+        (ConversationStatus.BOT, STALE),
+        (ConversationStatus.BOT, STALE - timedelta(hours=2)),
+        (ConversationStatus.HUMAN, STALE - timedelta(hours=1)),
+    )
+
+    tasks.close_inactive_conversations()
+
+    assert sorted(notified[0][0]) == sorted([oldest, older])
+    assert notified[1][0] == [newest]
@@ -0,0 +1,74 @@
+"""Clasificador de intenciones: qué se contesta con plantilla y qué pasa a la IA o a un humano."""
+import pytest
+from app.services.ai_service import BUSINESS_CONFIG
+from app.services.intent_router import classify, templated_answer
+
+# Preguntas frecuentes que se contestan con plantilla
+FAQ = [
+    ("¿A qué hora abren?", "hours"),
+    ("cuál es su horario", "hours"),
+    ("¿Hacen envíos a domicilio?", "shipping"),
+    ("¿Cuánto cuesta el envío?", "shipping"),
+    ("¿Aceptan tarjeta?", "payment"),
+    ("¿Puedo pagar contra entrega?", "payment"),
+    ("¿Qué garantía tienen las laptops?", "warranty"),
+    ("¿Cómo hago una devolución?", "returns"),
+    ("¿Cuál es su teléfono?", "contact"),
+]
+
+# Ni plantilla ni derivación: los decide la IA
+NOT_FAQ = [
+    # Quejas o casos concretos: la política general no los responde
+    "no me llega el pedido",
+    "Mi pedido todavía no llega",
+    "la entrega llegó tarde y la caja venía mal",
+    "ya pagué con tarjeta y no aparece mi pago",
+    # Verbos sueltos que no son una pregunta de envíos
+    "quiero enviar una foto del producto",
+    "te voy a enviar el comprobante por aquí",
+    # Varios temas a la vez
+    "¿Hacen envíos y aceptan tarjeta?",
+    # Demasiado largo para una respuesta fija
+    "hola buenas tardes quería saber si el envío a Quetzaltenango tiene algún costo extra por ser fuera de la capital",
+    # Palabras clave dentro de otras ("hora" en "ahora", "pago" en "apagó")
+    "ahora se apagó la laptop",
+    "hola, ¿tienen laptops Lenovo?",
+]
+
+HANDOFF = [
+    "quiero hablar con un humano",
+    "no me llega el pedido, quiero hablar con alguien sobre enviar una devolución",
+    "tengo una queja",
+    "¿me comunica con un asesor?",
+]
+
+@pytest.mark.parametrize("message,intent", FAQ)
+def test_faq_is_answered_with_template(message, intent):
+    result = classify(message)
+    assert result.name == intent
+    assert result.answerable
+    assert templated_answer(result, BUSINESS_CONFIG)
+
+@pytest.mark.parametrize("message", NOT_FAQ)
+def test_not_faq_goes_to_the_ai(message):
+    result = classify(message)
+    assert result.name != "handoff"
+    assert not result.answerable
+    assert templated_answer(result, BUSINESS_CONFIG) is None
+
+@pytest.mark.parametrize("message", HANDOFF)
+def test_handoff_wins(message):
+    result = classify(message)
+    assert result.name == "handoff"
+    assert not result.answerable
+
+def test_overlapping_keywords_count_once():
+    # "contra entrega" es pago; no cuenta también como envío por "entrega"
+    assert classify("contra entrega").scores == {"payment": 1}
+
+def test_template_precision_over_corpus():
+    # Ninguna plantilla para un mensaje cuya respuesta correcta no es esa plantilla
+    corpus = [(message, intent) for message, intent in FAQ] + [(message, None) for message in NOT_FAQ + HANDOFF]
+    templated = [(message, expected, classify(message)) for message, expected in corpus]
+    wrong = [message for message, expected, result in templated if result.answerable and result.name != expected]
+    assert wrong == []
@@ -0,0 +1,81 @@
+"""Búsqueda en el historial sobre la tabla FTS5 de SQLite: filtros y paginación keyset."""
+from datetime import datetime, timedelta
+import pytest
+from app.core.database import AsyncSessionLocal, SessionLocal
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.models.message import Message, SenderType
+from app.services.message_search import HIGHLIGHT_START, HIGHLIGHT_STOP, search_messages
+
+T0 = datetime(2026, 10, 1, 12, 0, 0)
+
+@pytest.fixture
+def history(db_tables):
+    """Dos conversaciones (una derivada a humano) con mensajes a horas conocidas; devuelve sus IDs."""
+    db = SessionLocal()
+    try:
+        bot = Conversation(customer=Customer(phone_number="whatsapp:+50211111111"), status=ConversationStatus.BOT)
+        human = Conversation(customer=Customer(phone_number="whatsapp:+50222222222"), status=ConversationStatus.HUMAN)
+        rows = [
+            (bot, SenderType.CUSTOMER, "¿La Lenovo tiene garantía?", 0),
+            (bot, SenderType.BOT, "Sí, la garantía de Lenovo es de un año.", 1),
+            (bot, SenderType.CUSTOMER, "¿Y cuánto cuesta el envío?", 2),
+            (human, SenderType.CUSTOMER, "Quiero hacer válida la garantía de mi HP", 3),
+            (human, SenderType.HUMAN, "Claro, la garantía HP se tramita en tienda.", 4),
+        ]
+        messages = [
+            Message(conversation=conversation, sender=sender, content=content,
+                    created_at=T0 + timedelta(hours=hours))
+            for conversation, sender, content, hours in rows
+        ]
+        db.add_all(messages)
+        db.commit()
+        return [message.id for message in messages]
+    finally:
+        db.close()
+
+async def _search(query: str, **filters):
+    async with AsyncSessionLocal() as db:
+        return await search_messages(db, query, **filters)
+
+async def test_matches_without_accents_newest_first(history):
+    rows = await _search("garantia")
+
+    assert [row.id for row in rows] == [history[4], history[3], history[1], history[0]]
+    assert f"{HIGHLIGHT_START}garantía{HIGHLIGHT_STOP}" in rows[0].snippet
+    assert rows[0].customer_phone == "whatsapp:+50222222222"
+
+async def test_all_terms_must_match(history):
+    rows = await _search("garantía lenovo")
+    assert [row.id for row in rows] == [history[1], history[0]]
+
+async def test_filters(history):
+    assert [row.id for row in await _search("garantía", status=ConversationStatus.HUMAN)] == [history[4], history[3]]
+    assert [row.id for row in await _search("garantía", sender=SenderType.CUSTOMER)] == [history[3], history[0]]
+    rows = await _search("garantía", date_from=T0 + timedelta(hours=1), date_to=T0 + timedelta(hours=4))
+    assert [row.id for row in rows] == [history[3], history[1]]
+
+async def test_keyset_pagination_walks_all_results_once(history):
+    seen, cursor = [], None
+    while True:
+        rows = await _search("garantía", cursor=cursor, limit=3)
+        seen.extend(row.id for row in rows)
+        if len(rows) < 3:
+            break
+        cursor = (rows[-1].created_at, rows[-1].id)
+    assert seen == [history[4], history[3], history[1], history[0]]
+
+async def test_index_follows_updates_and_deletes(history):
+    db = SessionLocal()
+    try:
+        db.get(Message, history[0]).content = "¿La Lenovo viene con cargador?"
+        db.delete(db.get(Message, history[4]))
+        db.commit()
+    finally:
+        db.close()
+
+    assert [row.id for row in await _search("garantía")] == [history[3], history[1]]
+    assert [row.id for row in await _search("cargador")] == [history[0]]
+
+async def test_quotes_in_query_are_literal(history):
+    assert await _search('garantía" OR "envío') == []
@@ -0,0 +1,239 @@
+"""Entrega saliente contra un Twilio falso: límite de ritmo, reintentos y conciliación."""
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from urllib.parse import parse_qs
+import httpx
+import pytest
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.message import DeliveryStatus, Message, SenderType
+from app.services import outbound, twilio_service
+
+PHONE = "whatsapp:+50212345678"
+
+class FakeTwilio:
+    """
+    API de mensajes de Twilio en memoria. `script` son las respuestas de los
+    siguientes POST: un código HTTP, una excepción de httpx, o None para
+    aceptar el mensaje.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.posts = []
+        self.accepted = []
+        self.enqueued = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"messages": list(reversed(self.accepted))})
+        form = {key: values[0] for key, values in parse_qs(request.content.decode()).items()}
+        self.posts.append(form)
+        step = self.script.pop(0) if self.script else None
+        if isinstance(step, Exception):
+            if isinstance(step, httpx.ReadTimeout):
+                # Twilio lo aceptó, pero la respuesta no llegó
+                self._accept(form)
+            raise step
+        if step == 429:
+            return httpx.Response(429, json={"message": "Too Many Requests", "code": 20429},
+                                  headers={"Retry-After": "7"})
+        if step is not None:
+            return httpx.Response(step, json={"message": "error", "code": 20500})
+        return httpx.Response(201, json=self._accept(form))
+
+    def _accept(self, form) -> dict:
+        message = {
+            "sid": f"SM{len(self.accepted):032d}",
+            "to": form["To"],
+            "from": form["From"],
+            "body": form["Body"],
+            "date_created": format_datetime(datetime.now(timezone.utc)),
+        }
+        self.accepted.append(message)
+        return message
+
+@pytest.fixture
+def twilio(monkeypatch, fake_redis, db_tables):
+    fake = FakeTwilio()
+    monkeypatch.setattr(twilio_service, "_async_http", httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)))
+    monkeypatch.setattr(settings, "TWILIO_API_BASE_URL", "http://twilio.test")
+    monkeypatch.setattr(settings, "TWILIO_WHATSAPP_NUMBER", "whatsapp:+14155238886")
+    monkeypatch.setattr(settings, "OUTBOUND_RATE_PER_SECOND", 100.0)
+    monkeypatch.setattr(settings, "OUTBOUND_BURST", 100)
+    monkeypatch.setattr(outbound, "enqueue_delivery", fake.enqueued.append)
+    return fake
+
+def _queue_messages(*contents, phone=PHONE):
+    """Guarda mensajes salientes en QUEUED en una conversación nueva; devuelve sus IDs."""
+    db = SessionLocal()
+    try:
+        customer = Customer(phone_number=phone)
+        db.add(customer)
+        db.flush()
+        conversation = Conversation(customer_id=customer.id)
+        db.add(conversation)
+        db.flush()
+        messages = [
+            Message(conversation_id=conversation.id, sender=SenderType.BOT, content=content,
+                    delivery_status=DeliveryStatus.QUEUED)
+            for content in contents
+        ]
+        db.add_all(messages)
+        db.commit()
+        return [message.id for message in messages]
+    finally:
+        db.close()
+
+def _message(message_id: int) -> Message:
+    db = SessionLocal()
+    try:
+        return db.get(Message, message_id)
+    finally:
+        db.close()
+
+async def test_sends_and_marks_sent(twilio):
+    [message_id] = _queue_messages("Hola")
+
+    assert await outbound.deliver(message_id) is None
+
+    message = _message(message_id)
+    assert message.delivery_status == DeliveryStatus.SENT
+    assert message.twilio_sid == twilio.accepted[0]["sid"]
+    assert twilio.posts[0]["To"] == PHONE
+
+async def test_delivery_is_idempotent(twilio):
+    [message_id] = _queue_messages("Hola")
+
+    await outbound.deliver(message_id)
+    assert await outbound.deliver(message_id) is None
+    assert len(twilio.posts) == 1
+
+async def test_429_retries_after_retry_after(twilio):
+    [message_id] = _queue_messages("Hola")
+    twilio.script = [429]
+
+    retry_in = await outbound.deliver(message_id)
+
+    assert retry_in >= 7
+    message = _message(message_id)
+    assert message.delivery_status == DeliveryStatus.QUEUED
+    assert message.delivery_attempts == 1
+
+    assert await outbound.deliver(message_id) is None
+    assert _message(message_id).delivery_status == DeliveryStatus.SENT
+    assert len(twilio.posts) == 2
+
+async def test_gives_up_after_max_attempts(twilio, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOUND_MAX_ATTEMPTS", 3)
+    [message_id] = _queue_messages("Hola")
+    twilio.script = [503, 503, 503]
+
+    assert await outbound.deliver(message_id) is not None
+    assert await outbound.deliver(message_id) is not None
+    assert await outbound.deliver(message_id) is None
+
+    message = _message(message_id)
+    assert message.delivery_status == DeliveryStatus.FAILED
+    assert message.delivery_attempts == 3
+
+async def test_client_errors_are_not_retried(twilio):
+    [message_id] = _queue_messages("Hola")
+    twilio.script = [400]
+
+    assert await outbound.deliver(message_id) is None
+    assert _message(message_id).delivery_status == DeliveryStatus.FAILED
+
+async def test_token_bucket_throttles_bursts(twilio, monkeypatch):
+    monkeypatch.setattr(settings, "OUTBOUND_RATE_PER_SECOND", 1.0)
+    monkeypatch.setattr(settings, "OUTBOUND_BURST", 2)
+    message_ids = [_queue_messages("Hola", phone=f"whatsapp:+5020000000{i}")[0] for i in range(3)]
+
+    results = [await outbound.deliver(message_id) for message_id in message_ids]
+
+    assert results[:2] == [None, None]
+    assert 0 < results[2] <= 1
+    assert len(twilio.posts) == 2
+    # Esperar turno no cuenta como intento
+    assert _message(message_ids[2]).delivery_attempts == 0
+
+async def test_ambiguous_timeout_is_reconciled_without_resending(twilio):
+    [message_id] = _queue_messages("Hola")
+    twilio.script = [httpx.ReadTimeout("timeout")]
+
+    assert await outbound.deliver(message_id) is not None
+    assert _message(message_id).delivery_status == DeliveryStatus.QUEUED
+
+    assert await outbound.deliver(message_id) is None
+    message = _message(message_id)
+    assert message.delivery_status == DeliveryStatus.SENT
+    assert message.twilio_sid == twilio.accepted[0]["sid"]
+    assert len(twilio.posts) == 1
+
+async def test_ambiguous_failure_not_found_is_resent(twilio):
+    [message_id] = _queue_messages("Hola")
+    # Error tras salir la petición, pero Twilio no llegó a aceptarlo
+    twilio.script = [httpx.RemoteProtocolError("connection closed")]
+
+    assert await outbound.deliver(message_id) is not None
+    assert twilio.accepted == []
+
+    assert await outbound.deliver(message_id) is None
+    assert _message(message_id).delivery_status == DeliveryStatus.SENT
+    assert len(twilio.posts) == 2
+
+async def test_connect_error_is_retried_directly(twilio):
+    [message_id] = _queue_messages("Hola")
+    twilio.script = [httpx.ConnectError("refused")]
+
+    assert await outbound.deliver(message_id) is not None
+    assert await outbound.deliver(message_id) is None
+    assert len(twilio.posts) == 2
+    assert len(twilio.accepted) == 1
+
+async def test_keeps_conversation_order(twilio):
+    first, second = _queue_messages("Primero", "Segundo")
+
+    # El segundo espera mientras el primero siga pendiente
+    assert await outbound.deliver(second) == outbound.ORDER_WAIT_SECONDS
+    assert twilio.posts == []
+
+    assert await outbound.deliver(first) is None
+    assert await outbound.deliver(second) is None
+    assert [post["Body"] for post in twilio.posts] == ["Primero", "Segundo"]
+
+async def test_failed_message_does_not_block_the_next(twilio):
+    first, second = _queue_messages("Primero", "Segundo")
+    twilio.script = [400]
+
+    assert await outbound.deliver(first) is None
+    assert _message(first).delivery_status == DeliveryStatus.FAILED
+    assert await outbound.deliver(second) is None
+    assert _message(second).delivery_status == DeliveryStatus.SENT
+
+async def test_order_wait_backs_off_and_nudges_the_blocking_message(twilio):
+    first, second = _queue_messages("Primero", "Segundo")
+
+    waits = [await outbound.deliver(second) for _ in range(4)]
+
+    assert waits == [1.0, 2.0, 4.0, 8.0]
+    # La tarea del primero pudo perderse: se reencola una vez, no en cada espera
+    assert twilio.enqueued == [first]
+    assert twilio.posts == []
+
+async def test_blocking_message_being_sent_is_not_nudged(twilio, fake_redis):
+    first, second = _queue_messages("Primero", "Segundo")
+    await fake_redis.set(f"outbound:lock:{first}", "otro-worker")
+
+    assert await outbound.deliver(second) == outbound.ORDER_WAIT_SECONDS
+    assert twilio.enqueued == []
+
+async def test_order_wait_resets_once_sent(twilio, fake_redis):
+    first, second = _queue_messages("Primero", "Segundo")
+    await outbound.deliver(second)
+
+    await outbound.deliver(first)
+    assert await outbound.deliver(second) is None
+    assert not await fake_redis.exists(f"outbound:order_wait:{second}")
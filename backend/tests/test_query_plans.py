@@ -0,0 +1,87 @@
+"""
+Las consultas del camino crítico usan sus índices (EXPLAIN en Postgres).
+
+Necesitan una base Postgres vacía de pruebas en TEST_POSTGRES_URL; se crean
+las tablas e índices de los modelos. Con tablas pequeñas el planificador
+prefiere leer la tabla entera, así que se desactiva seq scan: lo que se
+comprueba es que el índice sirve para la consulta.
+"""
+import os
+from datetime import timedelta
+import pytest
+from sqlalchemy import create_engine, desc, func, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from app.core.database import Base
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.models.message import DeliveryStatus, Message
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+pytestmark = pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL no definida")
+
+@pytest.fixture(scope="module")
+def pg():
+    engine = create_engine(POSTGRES_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.connect() as conn:
+        conn.execute(text("ANALYZE"))
+        conn.execute(text("SET enable_seqscan = off"))
+        yield conn
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+def _plan(conn, stmt) -> str:
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    return "\n".join(row[0] for row in conn.execute(text(f"EXPLAIN {sql}")))
+
+def test_conversation_history_uses_index(pg):
+    stmt = (
+        select(Message)
+        .where(Message.conversation_id == 1)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(20)
+    )
+    assert "ix_messages_conversation_id_created_at" in _plan(pg, stmt)
+
+def test_active_conversation_lookup_uses_index(pg):
+    stmt = (
+        select(Conversation)
+        .where(Conversation.customer_id == 1, Conversation.status != ConversationStatus.ENDED)
+        .order_by(Conversation.created_at.desc())
+        .limit(1)
+    )
+    assert "ix_conversations_customer_id_status_created_at" in _plan(pg, stmt)
+
+def test_inactivity_sweep_uses_partial_index(pg):
+    stmt = (
+        select(Conversation.id)
+        .where(
+            Conversation.status.in_([ConversationStatus.BOT, ConversationStatus.HUMAN]),
+            Conversation.last_activity_at < func.now() - timedelta(minutes=5)
+        )
+        .order_by(Conversation.last_activity_at)
+        .limit(1000)
+    )
+    assert "ix_conversations_active_last_activity_at" in _plan(pg, stmt)
+
+def test_inbox_page_uses_index(pg):
+    sort_key = func.coalesce(Conversation.updated_at, Conversation.created_at)
+    stmt = (
+        select(Conversation.id, Customer.phone_number)
+        .outerjoin(Customer, Customer.id == Conversation.customer_id)
+        .where(tuple_(sort_key, Conversation.id) < tuple_(func.now(), 1000))
+        .order_by(desc(sort_key), desc(Conversation.id))
+        .limit(50)
+    )
+    assert "ix_conversations_inbox_order" in _plan(pg, stmt)
+
+def test_stale_deliveries_use_partial_index(pg):
+    stmt = (
+        select(Message.id)
+        .where(Message.delivery_status == DeliveryStatus.QUEUED, Message.created_at < func.now())
+        .order_by(Message.created_at)
+        .limit(1000)
+    )
+    assert "ix_messages_queued_created_at" in _plan(pg, stmt)
@@ -0,0 +1,106 @@
+"""Agregación incremental por hora en stats_hourly (SQLite): marca de agua, retraso y huecos de IDs."""
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select
+from app.api import stats as stats_api
+from app.core.database import SessionLocal
+from app.models.conversation import Conversation, ConversationStatus
+from app.models.customer import Customer
+from app.models.message import Message, SenderType
+from app.models.stats import StatsRollupState
+from app.services import stats_rollup
+
+NOW = datetime.now(timezone.utc).replace(minute=30, second=0, microsecond=0)
+
+@pytest.fixture
+def db(db_tables):
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def conversation(db):
+    conversation = Conversation(customer=Customer(phone_number="whatsapp:+50212345678"), created_at=NOW - timedelta(hours=3))
+    db.add(conversation)
+    db.commit()
+    return conversation
+
+def _add_messages(db, conversation, *senders, at, first_id=None):
+    for i, sender in enumerate(senders):
+        message = Message(conversation_id=conversation.id, sender=sender, content="hola", created_at=at)
+        if first_id is not None:
+            message.id = first_id + i
+        db.add(message)
+    db.commit()
+
+def _totals(db):
+    return {metric: value["total"] for metric, value in stats_rollup.totals(db, stats_rollup.METRICS, NOW).items()}
+
+def test_counts_settled_rows_once(db, conversation):
+    _add_messages(db, conversation, SenderType.CUSTOMER, SenderType.CUSTOMER, SenderType.BOT, at=NOW - timedelta(hours=2))
+
+    stats_rollup.refresh_rollups(db)
+    stats_rollup.refresh_rollups(db)
+
+    assert _totals(db) == {"conversations_created": 1, "messages_customer": 2, "messages_bot": 1, "messages_human": 0}
+    assert stats_rollup.totals(db, ["messages_channel_whatsapp"], NOW)["messages_channel_whatsapp"]["total"] == 3
+
+def test_new_rows_are_added_to_their_hour(db, conversation):
+    _add_messages(db, conversation, SenderType.CUSTOMER, at=NOW - timedelta(hours=2))
+    stats_rollup.refresh_rollups(db)
+    _add_messages(db, conversation, SenderType.CUSTOMER, SenderType.HUMAN, at=NOW - timedelta(hours=1))
+    stats_rollup.refresh_rollups(db)
+
+    points = stats_rollup.series(db, "messages_customer", NOW - timedelta(days=1), NOW + timedelta(hours=1))
+    assert [point["value"] for point in points] == [1, 1]
+    assert _totals(db)["messages_human"] == 1
+
+def test_recent_rows_wait_for_the_lag(db, conversation):
+    _add_messages(db, conversation, SenderType.CUSTOMER, at=datetime.now(timezone.utc))
+
+    stats_rollup.refresh_rollups(db)
+    assert _totals(db)["messages_customer"] == 0
+
+def test_id_gap_larger_than_a_chunk_is_skipped(db, conversation, monkeypatch):
+    monkeypatch.setattr(stats_rollup, "CHUNK_SIZE", 10)
+    _add_messages(db, conversation, SenderType.CUSTOMER, at=NOW - timedelta(hours=2))
+    stats_rollup.refresh_rollups(db)
+    # IDs reservados y nunca usados: el siguiente mensaje queda 100 IDs más allá
+    _add_messages(db, conversation, SenderType.CUSTOMER, SenderType.BOT, at=NOW - timedelta(hours=2), first_id=101)
+
+    stats_rollup.refresh_rollups(db)
+
+    assert _totals(db)["messages_customer"] == 2
+    assert _totals(db)["messages_bot"] == 1
+    state = db.execute(select(StatsRollupState).where(StatsRollupState.source == "messages")).scalar_one()
+    assert state.last_id == 102
+
+def test_daily_series(db, conversation):
+    _add_messages(db, conversation, SenderType.CUSTOMER, at=NOW - timedelta(days=1, hours=2))
+    _add_messages(db, conversation, SenderType.CUSTOMER, SenderType.CUSTOMER, at=NOW - timedelta(hours=2))
+    stats_rollup.refresh_rollups(db)
+
+    points = stats_rollup.series(db, "messages_customer", NOW - timedelta(days=3), NOW + timedelta(hours=1), "day")
+    assert sum(point["value"] for point in points) == 3
+    assert all(point["bucket"].hour == 0 for point in points)
+
+def test_stats_endpoint_reads_the_rollups(db, conversation):
+    db.add_all([
+        Conversation(customer=Customer(phone_number=f"whatsapp:+5020000000{i}"), status=status, created_at=NOW - timedelta(hours=3))
+        for i, status in enumerate([ConversationStatus.HUMAN, ConversationStatus.ENDED])
+    ])
+    db.commit()
+    _add_messages(db, conversation, SenderType.CUSTOMER, SenderType.BOT, SenderType.HUMAN, SenderType.CUSTOMER,
+                  at=NOW - timedelta(hours=2))
+    stats_rollup.refresh_rollups(db)
+
+    assert stats_api.get_stats(db, None) == {
+        "total_conversations": 3,
+        "conversations_by_status": {"bot": 1, "human": 1, "ended": 1},
+        "total_messages": 4,
+        "messages_by_sender": {"customer": 2, "bot": 1, "human": 1},
+        "conversations_last_24h": 3,
+        "avg_messages_per_conversation": 1.33,
+    }
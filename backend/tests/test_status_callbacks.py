@@ -0,0 +1,185 @@
+"""Callbacks de estado de Twilio: agrupación por SID, estados que no retroceden, flusher y reintentos diferidos."""
+import asyncio
+import json
+import pytest
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.conversation import Conversation
+from app.models.customer import Customer
+from app.models.message import DeliveryStatus, Message, SenderType
+from app.services import status_callbacks
+
+T0 = 1_800_000_000.0
+
+@pytest.fixture
+def messages(fake_redis, db_tables):
+    """Crea mensajes salientes con SID y estado dados; devuelve una función que lee su estado."""
+    db = SessionLocal()
+    try:
+        conversation = Conversation(customer=Customer(phone_number="whatsapp:+50212345678"))
+        db.add_all([
+            Message(conversation=conversation, sender=SenderType.BOT, content="Hola",
+                    twilio_sid=sid, delivery_status=status)
+            for sid, status in [("SM1", DeliveryStatus.SENT), ("SM2", DeliveryStatus.DELIVERED),
+                                ("SM3", DeliveryStatus.SENT)]
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    def state(sid: str):
+        db = SessionLocal()
+        try:
+            message = db.query(Message).filter(Message.twilio_sid == sid).one()
+            return message.delivery_status, message.delivery_error
+        finally:
+            db.close()
+    return state
+
+def _callback(sid: str, status: str, error=None, requeues: int = 0) -> dict:
+    return {"sid": sid, "status": status, "error": error, "requeues": requeues}
+
+def test_coalesce_keeps_most_advanced_status_per_sid():
+    latest = status_callbacks._coalesce([
+        _callback("SM1", "DELIVERED"), _callback("SM1", "SENT"), _callback("SM1", "READ"),
+        _callback("SM2", "FAILED", "30008"), _callback("SM2", "SENT"),
+    ])
+    assert latest["SM1"]["status"] == "READ"
+    assert latest["SM2"]["status"] == "FAILED"
+
+async def test_buffer_ignores_untracked_statuses(fake_redis):
+    assert await status_callbacks.buffer_callback({"MessageSid": "SM1", "MessageStatus": "delivered"})
+    assert not await status_callbacks.buffer_callback({"MessageSid": "SM1", "MessageStatus": "queued"})
+    assert not await status_callbacks.buffer_callback({"MessageStatus": "delivered"})
+    assert await fake_redis.llen(status_callbacks.BUFFER_KEY) == 1
+
+async def test_status_never_moves_backwards(messages):
+    updated = await status_callbacks.apply_batch([
+        _callback("SM1", "DELIVERED"),
+        # Tardíos: no pisan un estado más avanzado
+        _callback("SM2", "SENT"),
+        _callback("SM2", "FAILED", "30008"),
+    ])
+
+    assert updated == 1
+    assert messages("SM1") == (DeliveryStatus.DELIVERED, None)
+    assert messages("SM2") == (DeliveryStatus.DELIVERED, None)
+
+async def test_failed_records_the_error_code(messages):
+    assert await status_callbacks.apply_batch([_callback("SM3", "FAILED", "30008")]) == 1
+    assert messages("SM3") == (DeliveryStatus.FAILED, "Twilio error 30008")
+
+async def test_unknown_sid_is_retried_later_with_backoff(messages, fake_redis, monkeypatch):
+    monkeypatch.setattr(status_callbacks.time, "time", lambda: T0)
+    await status_callbacks.apply_batch([_callback("SM9", "DELIVERED")])
+
+    # No vuelve al buffer enseguida sino cuando vence su espera
+    assert await fake_redis.llen(status_callbacks.BUFFER_KEY) == 0
+    [(raw, not_before)] = await fake_redis.zrange(status_callbacks.RETRY_KEY, 0, -1, withscores=True)
+    assert not_before == T0 + settings.STATUS_CALLBACK_RETRY_SECONDS
+    assert await status_callbacks.release_due_retries(T0 + 0.5) == 0
+    assert await status_callbacks.release_due_retries(not_before) == 1
+    assert json.loads(await fake_redis.lpop(status_callbacks.BUFFER_KEY))["requeues"] == 1
+
+    # La espera se duplica con cada reintento
+    await status_callbacks.apply_batch([_callback("SM9", "DELIVERED", requeues=2)])
+    [(_, not_before)] = await fake_redis.zrange(status_callbacks.RETRY_KEY, 0, -1, withscores=True)
+    assert not_before == T0 + settings.STATUS_CALLBACK_RETRY_SECONDS * 4
+
+async def test_unknown_sid_is_dropped_after_max_requeues(messages, fake_redis):
+    await status_callbacks.apply_batch([_callback("SM9", "DELIVERED", requeues=status_callbacks.MAX_REQUEUES)])
+    assert await fake_redis.zcard(status_callbacks.RETRY_KEY) == 0
+
+async def test_known_sid_without_change_is_not_retried(messages, fake_redis):
+    # SM2 ya está en DELIVERED: no se actualiza, pero existe y no se reintenta
+    assert await status_callbacks.apply_batch([_callback("SM2", "DELIVERED")]) == 0
+    assert await fake_redis.zcard(status_callbacks.RETRY_KEY) == 0
+
+@pytest.mark.parametrize("current, incoming, expected", [
+    (DeliveryStatus.SENT, "DELIVERED", DeliveryStatus.DELIVERED),
+    (DeliveryStatus.SENT, "FAILED", DeliveryStatus.FAILED),
+    (DeliveryStatus.DELIVERED, "READ", DeliveryStatus.READ),
+    (DeliveryStatus.DELIVERED, "SENT", DeliveryStatus.DELIVERED),
+    # FAILED es terminal para un envío, pero un "delivered" posterior manda
+    (DeliveryStatus.FAILED, "DELIVERED", DeliveryStatus.DELIVERED),
+    (DeliveryStatus.READ, "FAILED", DeliveryStatus.READ),
+    (DeliveryStatus.READ, "DELIVERED", DeliveryStatus.READ),
+])
+async def test_rank_decides_every_transition(fake_redis, db_tables, current, incoming, expected):
+    db = SessionLocal()
+    try:
+        db.add(Message(conversation=Conversation(customer=Customer(phone_number="whatsapp:+50212345678")),
+                       sender=SenderType.BOT, content="Hola", twilio_sid="SMX", delivery_status=current))
+        db.commit()
+    finally:
+        db.close()
+
+    await status_callbacks.apply_batch([_callback("SMX", incoming)])
+
+    db = SessionLocal()
+    try:
+        assert db.query(Message).filter(Message.twilio_sid == "SMX").one().delivery_status == expected
+    finally:
+        db.close()
+
+def test_coalesce_does_not_depend_on_arrival_order():
+    callbacks = [_callback("SM1", "SENT"), _callback("SM1", "READ"), _callback("SM1", "DELIVERED"),
+                 _callback("SM1", "FAILED", "30008")]
+    for shift in range(len(callbacks)):
+        rotated = callbacks[shift:] + callbacks[:shift]
+        assert status_callbacks._coalesce(rotated)["SM1"]["status"] == "READ"
+        assert status_callbacks._coalesce(list(reversed(rotated)))["SM1"]["status"] == "READ"
+
+async def test_each_error_code_is_kept(messages):
+    # Mismo estado, distinto código: van en UPDATE distintos
+    assert await status_callbacks.apply_batch([
+        _callback("SM1", "FAILED", "30008"), _callback("SM3", "FAILED", "63016"),
+    ]) == 2
+    assert messages("SM1") == (DeliveryStatus.FAILED, "Twilio error 30008")
+    assert messages("SM3") == (DeliveryStatus.FAILED, "Twilio error 63016")
+
+async def test_buffer_maps_twilio_statuses(fake_redis):
+    await status_callbacks.buffer_callback({"MessageSid": "SM1", "MessageStatus": "Undelivered", "ErrorCode": "30005"})
+    assert json.loads(await fake_redis.lpop(status_callbacks.BUFFER_KEY)) == _callback("SM1", "FAILED", "30005")
+
+async def test_flusher_drains_the_buffer_in_batches(messages, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "STATUS_CALLBACK_BATCH_SIZE", 2)
+    monkeypatch.setattr(settings, "STATUS_CALLBACK_FLUSH_MS", 10)
+    batches = []
+    apply_batch = status_callbacks.apply_batch
+    async def spy(callbacks):
+        batches.append(len(callbacks))
+        return await apply_batch(callbacks)
+    monkeypatch.setattr(status_callbacks, "apply_batch", spy)
+    for sid, status in [("SM1", "delivered"), ("SM1", "read"), ("SM3", "delivered"), ("SM3", "sent"), ("SM2", "read")]:
+        await status_callbacks.buffer_callback({"MessageSid": sid, "MessageStatus": status})
+
+    flusher = asyncio.create_task(status_callbacks.run_flusher())
+    try:
+        while await fake_redis.llen(status_callbacks.BUFFER_KEY) or sum(batches) < 5:
+            await asyncio.sleep(0.01)
+    finally:
+        flusher.cancel()
+        await asyncio.gather(flusher, return_exceptions=True)
+
+    assert batches == [2, 2, 1]
+    assert messages("SM1")[0] == DeliveryStatus.READ
+    assert messages("SM2")[0] == DeliveryStatus.READ
+    assert messages("SM3")[0] == DeliveryStatus.DELIVERED
+
+async def test_failed_batch_goes_back_to_the_buffer(fake_redis, monkeypatch):
+    async def db_down(callbacks):
+        raise ConnectionError("BD caída")
+    monkeypatch.setattr(status_callbacks, "apply_batch", db_down)
+    sleeps = []
+    async def stop_on_backoff(seconds):
+        sleeps.append(seconds)
+        raise asyncio.CancelledError
+    await status_callbacks.buffer_callback({"MessageSid": "SM1", "MessageStatus": "delivered"})
+    monkeypatch.setattr(status_callbacks.asyncio, "sleep", stop_on_backoff)
+
+    with pytest.raises(asyncio.CancelledError):
+        await status_callbacks.run_flusher()
+
+    assert sleeps == [1]
+    assert json.loads(await fake_redis.lpop(status_callbacks.BUFFER_KEY))["sid"] == "SM1"
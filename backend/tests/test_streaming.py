@@ -0,0 +1,137 @@
+"""Respuestas de la IA en streaming contra un servidor OpenAI falso (SSE)."""
+import json
+import httpx
+import pytest
+from openai import AsyncOpenAI
+from app.core import event_bus
+from app.core.config import settings
+from app.services import ai_service
+from app.services.notifier import MessageStream
+
+CHUNKS = ["¡Hola! ", "Tenemos laptops ", "HP y Lenovo. ", "¿Te ayudo con algo más?"]
+
+def _sse_body(chunks) -> bytes:
+    events = []
+    for content in chunks:
+        events.append({
+            "id": "chatcmpl-test",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-3.5-turbo",
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+        })
+    events.append({
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "gpt-3.5-turbo",
+        "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+    })
+    lines = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+    return "".join(lines).encode()
+
+class FakeOpenAIServer:
+    """Responde a /chat/completions en streaming y guarda las peticiones."""
+
+    def __init__(self, chunks=CHUNKS, status_code: int = 200):
+        self.chunks = chunks
+        self.status_code = status_code
+        self.requests = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(json.loads(request.content))
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, json={"error": {"message": "boom"}})
+        return httpx.Response(200, content=_sse_body(self.chunks), headers={"content-type": "text/event-stream"})
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    server = FakeOpenAIServer()
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://openai.test/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(server.handler)),
+    )
+    monkeypatch.setattr(ai_service, "async_client", client)
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    return server
+
+@pytest.fixture
+def published(monkeypatch):
+    events = []
+
+    async def fake_publish(event_type, conversation_id, data):
+        events.append((event_type, conversation_id, data))
+        return "0-1"
+
+    monkeypatch.setattr(event_bus, "publish_async", fake_publish)
+    return events
+
+async def test_deltas_arrive_in_order_and_join_to_full_reply(openai_server):
+    deltas = []
+
+    async def on_delta(delta):
+        deltas.append(delta)
+
+    reply = await ai_service.generate_ai_response_async("¿Qué laptops tienen?", on_delta=on_delta)
+
+    assert deltas == CHUNKS
+    assert reply == "".join(CHUNKS)
+    assert openai_server.requests[0]["stream"] is True
+
+async def test_without_on_delta_nothing_is_streamed(openai_server, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        openai_server.requests.append(json.loads(request.content))
+        return httpx.Response(200, json={
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-3.5-turbo",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "Hola"}, "finish_reason": "stop"}],
+        })
+
+    client = AsyncOpenAI(
+        api_key="test", base_url="http://openai.test/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+    )
+    monkeypatch.setattr(ai_service, "async_client", client)
+
+    assert await ai_service.generate_ai_response_async("hola, ¿qué tal?") == "Hola"
+    assert openai_server.requests[0]["stream"] is False
+
+async def test_server_error_falls_back_to_fixed_reply(openai_server):
+    openai_server.status_code = 500
+    deltas = []
+
+    async def on_delta(delta):
+        deltas.append(delta)
+
+    reply = await ai_service.generate_ai_response_async("¿Qué laptops tienen?", on_delta=on_delta)
+
+    assert reply == ai_service._fallback_reply()
+    assert deltas == []
+
+async def test_message_stream_batches_deltas(openai_server, published, monkeypatch):
+    # Con un intervalo enorme todo se agrupa en el evento final
+    monkeypatch.setattr(settings, "STREAM_FLUSH_INTERVAL_MS", 60_000)
+    stream = MessageStream(conversation_id=5)
+
+    reply = await ai_service.generate_ai_response_async("¿Qué laptops tienen?", on_delta=stream.push)
+    await stream.flush(done=True)
+
+    assert len(published) == 1
+    event_type, conversation_id, data = published[0]
+    assert (event_type, conversation_id) == (event_bus.MESSAGE_DELTA, 5)
+    assert data == {"stream_id": stream.stream_id, "delta": reply, "done": True}
+
+async def test_message_stream_flushes_every_interval(openai_server, published, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_FLUSH_INTERVAL_MS", 0)
+    stream = MessageStream(conversation_id=5)
+
+    await ai_service.generate_ai_response_async("¿Qué laptops tienen?", on_delta=stream.push)
+    await stream.flush(done=True)
+
+    deltas = [data["delta"] for _, _, data in published]
+    assert deltas == CHUNKS + [""]
+    assert [data["done"] for _, _, data in published] == [False] * len(CHUNKS) + [True]
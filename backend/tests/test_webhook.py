@@ -0,0 +1,104 @@
+"""Webhook de Twilio: firma, deduplicación por MessageSid, TwiML estático y encolado sin bloquear."""
+import threading
+import httpx
+import pytest
+from twilio.request_validator import RequestValidator
+from app.api import webhook
+from app.core.config import settings
+from app.main import fastapi_app
+
+AUTH_TOKEN = "twilio-test-token"
+URL = "http://api/webhook/twilio"
+
+def _form(sid="SM1", body="hola"):
+    return {"MessageSid": sid, "From": "whatsapp:+50212345678", "Body": body}
+
+def _signed(form, url=URL):
+    return {"X-Twilio-Signature": RequestValidator(AUTH_TOKEN).compute_signature(url, form)}
+
+@pytest.fixture
+async def client(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "TWILIO_AUTH_TOKEN", AUTH_TOKEN)
+    monkeypatch.setattr(settings, "TWILIO_VALIDATE_SIGNATURE", True)
+    monkeypatch.setattr(settings, "TWILIO_WEBHOOK_BASE_URL", "")
+    monkeypatch.setattr(settings, "MESSAGE_PIPELINE", "async")
+    webhook._validator.cache_clear()
+    # En el mismo event loop que fakeredis (TestClient usaría otro)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=fastapi_app), base_url="http://api") as api:
+        yield api
+    webhook._validator.cache_clear()
+
+@pytest.fixture
+def enqueued(monkeypatch):
+    messages = []
+    async def enqueue(message_data):
+        messages.append(message_data)
+    monkeypatch.setattr(webhook, "enqueue_incoming_message", enqueue)
+    return messages
+
+async def test_valid_signature_enqueues_and_returns_static_twiml(client, enqueued, monkeypatch):
+    # El TwiML ya está generado: no se construye un MessagingResponse por petición
+    monkeypatch.setattr(webhook, "MessagingResponse", None)
+
+    response = await client.post("/webhook/twilio", data=_form(), headers=_signed(_form()))
+
+    assert response.status_code == 200
+    assert response.text == webhook.EMPTY_TWIML
+    assert response.headers["content-type"] == "application/xml"
+    assert enqueued == [{"from": "whatsapp:+50212345678", "body": "hola", "sid": "SM1"}]
+
+async def test_invalid_or_missing_signature_is_rejected(client, enqueued):
+    tampered = await client.post("/webhook/twilio", data=_form(body="otro"), headers=_signed(_form()))
+    unsigned = await client.post("/webhook/twilio", data=_form())
+
+    assert tampered.status_code == 403
+    assert unsigned.status_code == 403
+    assert enqueued == []
+
+async def test_signature_uses_public_url_behind_proxy(client, enqueued, monkeypatch):
+    monkeypatch.setattr(settings, "TWILIO_WEBHOOK_BASE_URL", "https://api.example.com/")
+
+    internal = await client.post("/webhook/twilio", data=_form(), headers=_signed(_form()))
+    public = await client.post("/webhook/twilio", data=_form(),
+                          headers=_signed(_form(), "https://api.example.com/webhook/twilio"))
+
+    assert internal.status_code == 403
+    assert public.status_code == 200
+    assert len(enqueued) == 1
+
+async def test_twilio_retries_are_deduplicated(client, enqueued, fake_redis):
+    for _ in range(3):
+        assert (await client.post("/webhook/twilio", data=_form(), headers=_signed(_form()))).status_code == 200
+    await client.post("/webhook/twilio", data=_form("SM2"), headers=_signed(_form("SM2")))
+
+    assert [message["sid"] for message in enqueued] == ["SM1", "SM2"]
+    ttl = await fake_redis.ttl("twilio:seen:SM1")
+    assert 0 < ttl <= settings.WEBHOOK_DEDUPE_TTL_SECONDS
+
+async def test_failed_enqueue_lets_the_retry_through(client, fake_redis, monkeypatch):
+    attempts = []
+    async def flaky(message_data):
+        attempts.append(message_data["sid"])
+        if len(attempts) == 1:
+            raise ConnectionError("redis caído")
+    monkeypatch.setattr(webhook, "enqueue_incoming_message", flaky)
+
+    first = await client.post("/webhook/twilio", data=_form(), headers=_signed(_form()))
+    # Twilio recibe el TwiML igualmente; la marca de visto se borra para aceptar el reintento
+    assert first.status_code == 200
+    assert await fake_redis.exists("twilio:seen:SM1") == 0
+
+    await client.post("/webhook/twilio", data=_form(), headers=_signed(_form()))
+    assert attempts == ["SM1", "SM1"]
+
+async def test_celery_enqueue_runs_off_the_event_loop(client, monkeypatch):
+    monkeypatch.setattr(settings, "MESSAGE_PIPELINE", "celery")
+    threads = []
+    monkeypatch.setattr(webhook.process_whatsapp_message, "delay",
+                        lambda message_data: threads.append(threading.current_thread()))
+
+    assert (await client.post("/webhook/twilio", data=_form(), headers=_signed(_form()))).status_code == 200
+
+    # .delay publica en el broker de forma bloqueante: corre en un hilo, no en el del event loop
+    assert len(threads) == 1
+    assert threads[0] is not threading.current_thread()
@@ -0,0 +1,108 @@
+"""Reparto local de eventos WebSocket: colas acotadas por cliente y desconexión de los lentos o rotos."""
+import asyncio
+import pytest
+from app.core import ws_broker
+from app.core.config import settings
+
+CONVERSATION_ID = 1
+
+class FakeWebSocket:
+    """Lo mínimo de fastapi.WebSocket que usa ws_broker. `block` retiene los envíos hasta soltarlo."""
+
+    def __init__(self, fail: bool = False):
+        self.received = []
+        self.closed_with = None
+        self.fail = fail
+        self.block = asyncio.Event()
+        self.block.set()
+
+    async def send_text(self, data: str) -> None:
+        if self.fail:
+            raise RuntimeError("socket cerrado")
+        await self.block.wait()
+        self.received.append(data)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+@pytest.fixture(autouse=True)
+async def broker(monkeypatch):
+    monkeypatch.setattr(ws_broker, "active_connections", {})
+    monkeypatch.setattr(settings, "WS_SEND_QUEUE_SIZE", 3)
+    monkeypatch.setattr(settings, "WS_SEND_TIMEOUT_SECONDS", 0.2)
+    yield
+    tasks = [client.task for connections in ws_broker.active_connections.values() for client in connections.values()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+async def _connect(*websockets):
+    for websocket in websockets:
+        await ws_broker.connect(CONVERSATION_ID, websocket)
+
+async def _settle(seconds: float = 0.05):
+    await asyncio.sleep(seconds)
+
+def _connected():
+    return set(ws_broker.active_connections.get(CONVERSATION_ID, {}))
+
+async def test_event_reaches_every_client_in_order():
+    sockets = [FakeWebSocket() for _ in range(3)]
+    await _connect(*sockets)
+
+    ws_broker.deliver_local(CONVERSATION_ID, '{"seq": 1}')
+    ws_broker.deliver_local(CONVERSATION_ID, '{"seq": 2}')
+    await _settle()
+
+    assert all(ws.received == ['{"seq": 1}', '{"seq": 2}'] for ws in sockets)
+
+async def test_full_queue_drops_only_the_slow_client():
+    slow, fast = FakeWebSocket(), FakeWebSocket()
+    slow.block.clear()
+    await _connect(slow, fast)
+
+    # El envío en curso más una cola de WS_SEND_QUEUE_SIZE: el siguiente ya no cabe
+    for seq in range(settings.WS_SEND_QUEUE_SIZE + 2):
+        ws_broker.deliver_local(CONVERSATION_ID, str(seq))
+        await asyncio.sleep(0)
+    await _settle()
+
+    assert _connected() == {fast}
+    assert slow.closed_with == 1013
+    assert len(fast.received) == settings.WS_SEND_QUEUE_SIZE + 2
+
+async def test_send_timeout_drops_the_client():
+    stuck, healthy = FakeWebSocket(), FakeWebSocket()
+    stuck.block.clear()
+    await _connect(stuck, healthy)
+
+    ws_broker.deliver_local(CONVERSATION_ID, "hola")
+    await _settle(settings.WS_SEND_TIMEOUT_SECONDS + 0.1)
+
+    assert _connected() == {healthy}
+    assert stuck.closed_with == 1013
+    assert healthy.received == ["hola"]
+
+async def test_failed_send_prunes_the_dead_socket():
+    dead, alive = FakeWebSocket(fail=True), FakeWebSocket()
+    await _connect(dead, alive)
+
+    ws_broker.deliver_local(CONVERSATION_ID, "hola")
+    await _settle()
+
+    assert _connected() == {alive}
+    # Un evento posterior ya no intenta el socket muerto
+    ws_broker.deliver_local(CONVERSATION_ID, "adiós")
+    await _settle()
+    assert alive.received == ["hola", "adiós"]
+
+async def test_last_disconnect_removes_the_conversation():
+    websocket = FakeWebSocket()
+    await _connect(websocket)
+    client = ws_broker.active_connections[CONVERSATION_ID][websocket]
+
+    await ws_broker.disconnect(CONVERSATION_ID, websocket)
+    await _settle()
+
+    assert CONVERSATION_ID not in ws_broker.active_connections
+    assert client.task.cancelled()
@@ -0,0 +1,14 @@
+"""Reparto de eventos WebSocket entre dos réplicas (procesos) sobre un Redis compartido."""
+from tests.ws_fanout_harness import measure
+
+# Cota holgada para CI: el objetivo es detectar entregas que se atascan, no afinar
+MAX_P99_SECONDS = 2.0
+
+def test_two_replicas_deliver_to_1k_subscribers():
+    result = measure(replicas=2, subscribers=1000, events=5)
+
+    assert result.subscribers == 1000
+    assert result.complete
+    assert result.delivered == 1000 * 5
+    assert result.in_order
+    assert result.percentile(99) < MAX_P99_SECONDS
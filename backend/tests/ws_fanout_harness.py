@@ -0,0 +1,146 @@
+"""
+Reparto de eventos WebSocket entre réplicas de la API, con procesos de verdad.
+
+Levanta un Redis en memoria por TCP (FakeRedisServer) y N procesos réplica;
+cada uno conecta su parte de los suscriptores a ws_broker con WebSockets
+falsos y corre run_subscriber. El proceso principal publica los eventos y
+cada réplica devuelve la latencia publicación -> send_text de cada entrega.
+
+Desde backend/:
+    python -m tests.ws_fanout_harness --replicas 2 --subscribers 1000 --events 20
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+import redis
+from tests.fake_redis_server import FakeRedisServer
+
+CONVERSATIONS = 10
+# Pausa entre eventos: medir el reparto, no una cola acumulada
+PUBLISH_INTERVAL_SECONDS = 0.01
+TIMEOUT_SECONDS = 30.0
+
+class _RecordingWebSocket:
+    """Lo mínimo de fastapi.WebSocket que usa ws_broker: guarda qué recibe y cuándo."""
+
+    def __init__(self, latencies: List[float]):
+        self.latencies = latencies
+        self.sequence: List[int] = []
+
+    async def send_text(self, data: str) -> None:
+        event = json.loads(data)
+        self.latencies.append(time.time() - event["sent_at"])
+        self.sequence.append(event["seq"])
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+async def _replica(conversation_ids: List[int], expected: int) -> dict:
+    from app.core import ws_broker
+
+    latencies: List[float] = []
+    sockets = []
+    for conversation_id in conversation_ids:
+        websocket = _RecordingWebSocket(latencies)
+        await ws_broker.connect(conversation_id, websocket)
+        sockets.append(websocket)
+    subscriber = asyncio.create_task(ws_broker.run_subscriber())
+
+    deadline = time.monotonic() + TIMEOUT_SECONDS
+    while len(latencies) < expected * len(sockets) and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    subscriber.cancel()
+    await asyncio.gather(subscriber, return_exceptions=True)
+    return {
+        "subscribers": len(sockets),
+        "latencies": latencies,
+        "in_order": all(ws.sequence == list(range(len(ws.sequence))) for ws in sockets),
+        "complete": all(len(ws.sequence) == expected for ws in sockets),
+    }
+
+def _run_replica(redis_url: str, conversation_ids: List[int], expected: int, results) -> None:
+    # Proceso nuevo (spawn): la configuración se lee al importar la app
+    os.environ["REDIS_URL"] = redis_url
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    results.put(asyncio.run(_replica(conversation_ids, expected)))
+
+@dataclass
+class FanoutResult:
+    subscribers: int
+    events: int
+    delivered: int
+    in_order: bool
+    complete: bool
+    latencies: List[float] = field(repr=False)
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+def measure(replicas: int = 2, subscribers: int = 1000, events: int = 20) -> FanoutResult:
+    """Publica `events` eventos en cada conversación y reúne las entregas de todas las réplicas."""
+    from app.core import ws_broker
+
+    ctx = multiprocessing.get_context("spawn")
+    with FakeRedisServer() as server:
+        results = ctx.Queue()
+        # Suscriptores repartidos por conversación y réplica
+        assignments: Dict[int, List[int]] = {replica: [] for replica in range(replicas)}
+        for i in range(subscribers):
+            assignments[i % replicas].append(i // replicas % CONVERSATIONS)
+        processes = [
+            ctx.Process(target=_run_replica, args=(server.url, assignments[replica], events, results))
+            for replica in range(replicas)
+        ]
+        for process in processes:
+            process.start()
+
+        client = redis.Redis.from_url(server.url)
+        channels = [ws_broker._channel(cid) for cid in range(CONVERSATIONS)]
+        deadline = time.monotonic() + TIMEOUT_SECONDS
+        # Esperar a que cada réplica esté suscrita a todos los canales
+        while any(count < replicas for _, count in client.pubsub_numsub(*channels)):
+            if time.monotonic() > deadline:
+                raise TimeoutError("las réplicas no se suscribieron a tiempo")
+            time.sleep(0.05)
+
+        for seq in range(events):
+            for channel in channels:
+                client.publish(channel, json.dumps({"seq": seq, "sent_at": time.time()}))
+            time.sleep(PUBLISH_INTERVAL_SECONDS)
+
+        replica_results = [results.get(timeout=TIMEOUT_SECONDS * 2) for _ in processes]
+        for process in processes:
+            process.join()
+        client.close()
+
+    latencies = [latency for result in replica_results for latency in result["latencies"]]
+    return FanoutResult(
+        subscribers=sum(result["subscribers"] for result in replica_results),
+        events=events,
+        delivered=len(latencies),
+        in_order=all(result["in_order"] for result in replica_results),
+        complete=all(result["complete"] for result in replica_results),
+        latencies=latencies,
+    )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replicas", type=int, default=2)
+    parser.add_argument("--subscribers", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=20)
+    args = parser.parse_args()
+
+    result = measure(args.replicas, args.subscribers, args.events)
+    print(f"{result.delivered} entregas a {result.subscribers} suscriptores en {args.replicas} réplicas "
+          f"(completo: {result.complete}, en orden: {result.in_order})")
+    print(f"latencia p50 {result.percentile(50) * 1000:.1f} ms, "
+          f"p99 {result.percentile(99) * 1000:.1f} ms, "
+          f"media {statistics.mean(result.latencies) * 1000:.1f} ms")
@@ -6,6 +6,9 @@ export default function ConversationDetail() {
   const { id } = useParams();
   const navigate = useNavigate();
   const [conversation, setConversation] = useState(null);
+  const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(undefined);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [newMessage, setNewMessage] = useState('');
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
@@ -13,15 +16,37 @@ export default function ConversationDetail() {
   const [error, setError] = useState('');
 
   useEffect(() => {
+    setMessages([]);
+    setOlderCursor(undefined);
     fetchConversation();
     const interval = setInterval(fetchConversation, 5000);
     return () => clearInterval(interval);
   }, [id]);
 
+  // Une mensajes por id y los ordena del más antiguo al más reciente
+  const mergeMessages = (current, incoming) => {
+    const byId = new Map(current.map((msg) => [msg.id, msg]));
+    incoming.forEach((msg) => byId.set(msg.id, msg));
+    return [...byId.values()].sort(
+      (a, b) => new Date(a.created_at) - new Date(b.created_at) || a.id - b.id
+    );
+  };
+
   const fetchConversation = async () => {
     try {
-      const res = await api.get(`/conversations/${id}`);
-      setConversation(res.data);
+      // Cabecera + página más reciente; si no cambiaron, el navegador recibe 304 y usa su caché
+      const [headerRes, messagesRes] = await Promise.all([
+        api.get(`/conversations/${id}`),
+        api.get(`/conversations/${id}/messages`),
+      ]);
+      setConversation(headerRes.data);
+      setMessages((prev) => mergeMessages(prev, messagesRes.data));
+      if (headerRes.data.unread_count > 0) {
+        // Marcar como leída aparte: el GET de la cabecera no escribe
+        await api.post(`/conversations/${id}/read`);
+      }
+      // El cursor de mensajes anteriores solo se toma en la primera carga
+      setOlderCursor((prev) => (prev === undefined ? messagesRes.headers['x-next-cursor'] || null : prev));
       setError('');
     } catch (error) {
       console.error('Error:', error);
@@ -31,6 +56,21 @@ export default function ConversationDetail() {
     }
   };
 
+  const loadOlder = async () => {
+    if (!olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const res = await api.get(`/conversations/${id}/messages`, { params: { cursor: olderCursor } });
+      setMessages((prev) => mergeMessages(prev, res.data));
+      setOlderCursor(res.headers['x-next-cursor'] || null);
+    } catch (error) {
+      console.error('Error cargando mensajes anteriores:', error);
+      setError('No se pudieron cargar los mensajes anteriores');
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const takeControl = async () => {
     try {
       await api.post(`/conversations/${id}/take-control`);
@@ -99,7 +139,7 @@ export default function ConversationDetail() {
           <div className="px-4 py-5 sm:px-6 flex justify-between items-center">
             <div>
               <h2 className="text-lg leading-6 font-medium text-gray-900">
-                Conversación con {conversation.customer?.phone_number || `Cliente #${conversation.customer_id}`}
+                Conversación con {conversation.customer_phone || `Cliente #${conversation.customer_id}`}
               </h2>
               <p className="mt-1 max-w-2xl text-sm text-gray-500">
                 Estado: {conversation.status === 'bot' ? 'Bot' : conversation.status === 'human' ? 'Humano' : 'Cerrada'}
@@ -140,7 +180,18 @@ export default function ConversationDetail() {
 
           <div className="border-t border-gray-200">
             <div className="p-4 h-96 overflow-y-auto bg-gray-50">
-              {conversation.messages.map((msg) => (
+              {olderCursor && (
+                <div className="mb-3 text-center">
+                  <button
+                    onClick={loadOlder}
+                    disabled={loadingOlder}
+                    className="text-sm text-indigo-600 hover:text-indigo-800 disabled:text-gray-400"
+                  >
+                    {loadingOlder ? 'Cargando...' : 'Cargar mensajes anteriores'}
+                  </button>
+                </div>
+              )}
+              {messages.map((msg) => (
                 <div
                   key={msg.id}
                   className={`mb-3 flex ${